@@ -0,0 +1,135 @@
+# aero_fit.py
+"""
+Ajustement du CdA et du Crr sur les données d'une sortie, par la méthode de
+l'élévation virtuelle : sur chaque segment, le bilan d'énergie
+
+    Σ P dt - Δ(½ m v²) = m g Δh_virtuelle + Crr m g Σ v dt + CdA Σ ½ ρ v³ dt
+
+donne un dénivelé "virtuel" à comparer au dénivelé mesuré. Sans capteur de
+puissance, seuls les segments en roue libre (cadence nulle, P = 0) sont
+utilisés. Le résidu est linéaire en (Crr, CdA) : une grille de candidats est
+évaluée en un calcul (broadcasting), puis resserrée autour du meilleur point.
+"""
+import numpy as np
+import pandas as pd
+
+from climb_processing import run_length_encode, range_sums, as_float
+from power_estimator import GRAVITY, power_terms
+
+CRR_BOUNDS = (0.002, 0.012)
+CDA_BOUNDS = (0.15, 0.60)
+GRID_POINTS = 41 # Candidats par paramètre et par passe
+REFINE_PASSES = 4 # Passes de resserrement autour du meilleur point
+MIN_SPEED_MS = 4.0 # En dessous, l'aérodynamique ne se distingue plus du roulement
+MIN_SEGMENT_S = 8 # Durée min. d'un segment
+MAX_SEGMENT_S = 30 # Les longues portions sont coupées : plus d'équations, moins de dérive d'altitude
+MAX_GAP_S = 3 # Un trou d'enregistrement plus long coupe le segment
+MIN_SEGMENTS = 5
+
+
+def _segment_bounds(seconds, eligible):
+    """Segments [début, fin) de points éligibles consécutifs, coupés aux trous et tous les MAX_SEGMENT_S."""
+    n = len(seconds)
+    if n == 0: return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    gap = np.diff(seconds, prepend=seconds[0]) > MAX_GAP_S
+    new_run = np.r_[True, ~eligible[:-1]] | gap
+    run_first = np.maximum.accumulate(np.where(new_run, np.arange(n), 0))
+    # Clé par morceau : (portion, tranche de MAX_SEGMENT_S) ; -1 hors portion
+    piece = (seconds - seconds[run_first]) // MAX_SEGMENT_S
+    key = np.where(eligible, np.cumsum(new_run) * (n + 1) + piece, -1)
+    starts, ends, values = run_length_encode(key)
+    keep = (values >= 0) & (seconds[ends - 1] - seconds[starts] >= MIN_SEGMENT_S)
+    return starts[keep], ends[keep]
+
+
+def ride_segments(df, total_weight_kg):
+    """
+    Termes du bilan d'énergie de chaque segment exploitable de la sortie :
+    ((c, d, a), source, erreur) avec, pour chaque segment, le résidu
+    d'élévation r = c - Crr * d - CdA * a (en m). source : 'puissance'
+    (capteur) ou 'roue libre'.
+    """
+    required_cols = ['altitude', 'distance', 'speed']
+    missing_cols = [col for col in required_cols if col not in df.columns]
+    if missing_cols: return None, None, f"Colonnes manquantes pour l'ajustement : {', '.join(missing_cols)}."
+    if not isinstance(df.index, pd.DatetimeIndex) or len(df) < 2: return None, None, "Données insuffisantes pour l'ajustement."
+
+    seconds = np.asarray((df.index - df.index[0]) / pd.Timedelta(seconds=1))
+    altitude, distance, speed = (as_float(df[col]) for col in required_cols)
+    temperature = as_float(df['temperature']) if 'temperature' in df.columns else np.full(len(df), np.nan)
+    _, _, aero_term = power_terms(seconds, altitude, distance, speed, temperature) # ½ ρ v²
+
+    # Capteur de puissance si présent, sinon roue libre (cadence nulle, P = 0)
+    power = as_float(df['power']) if 'power' in df.columns else np.full(len(df), np.nan)
+    if np.mean(~np.isnan(power)) > 0.5:
+        source = 'puissance'; eligible = ~np.isnan(power)
+    elif 'cadence' in df.columns:
+        source = 'roue libre'; cadence = as_float(df['cadence'])
+        eligible = cadence == 0; power = np.zeros(len(df))
+    else:
+        return None, None, "Ni puissance ni cadence : pas de segment exploitable pour l'ajustement."
+    eligible &= (speed >= MIN_SPEED_MS) & ~np.isnan(altitude) & ~np.isnan(aero_term)
+
+    starts, ends = _segment_bounds(seconds, eligible)
+    if len(starts) < MIN_SEGMENTS:
+        return None, source, f"Pas assez de segments exploitables ({len(starts)} < {MIN_SEGMENTS}) pour l'ajustement."
+
+    # Sommes sur les intervalles (début, fin] de chaque segment : dt de chaque point depuis le précédent
+    delta_time = np.diff(seconds, prepend=seconds[0])
+    mg = total_weight_kg * GRAVITY; last = ends - 1
+    work = range_sums(power * delta_time, starts + 1, ends)
+    rolled = range_sums(speed * delta_time, starts + 1, ends)
+    aero = range_sums(aero_term * speed * delta_time, starts + 1, ends)
+    kinetic = 0.5 * total_weight_kg * (speed[last] ** 2 - speed[starts] ** 2)
+    c = (work - kinetic) / mg - (altitude[last] - altitude[starts])
+    return (c, rolled, aero / mg), source, None
+
+
+def fit_segments(segments, crr_bounds=CRR_BOUNDS, cda_bounds=CDA_BOUNDS):
+    """
+    (Crr, CdA, résidu RMS en m) minimisant la somme des |résidus d'élévation|
+    (robuste aux segments aberrants) : grille de GRID_POINTS² candidats
+    évaluée d'un coup, puis REFINE_PASSES resserrements autour du meilleur.
+    """
+    c, d, a = segments
+    crr_low, crr_high = crr_bounds; cda_low, cda_high = cda_bounds
+    for _ in range(REFINE_PASSES + 1):
+        crrs = np.linspace(crr_low, crr_high, GRID_POINTS); cdas = np.linspace(cda_low, cda_high, GRID_POINTS)
+        residuals = c - crrs[:, None, None] * d - cdas[None, :, None] * a # (Crr, CdA, segments)
+        i, j = np.unravel_index(np.argmin(np.abs(residuals).sum(axis=-1)), (GRID_POINTS, GRID_POINTS))
+        crr_step = crrs[1] - crrs[0]; cda_step = cdas[1] - cdas[0]
+        crr_low, crr_high = max(crr_bounds[0], crrs[i] - crr_step), min(crr_bounds[1], crrs[i] + crr_step)
+        cda_low, cda_high = max(cda_bounds[0], cdas[j] - cda_step), min(cda_bounds[1], cdas[j] + cda_step)
+    best = residuals[i, j]
+    return float(crrs[i]), float(cdas[j]), float(np.sqrt(np.mean(best ** 2)))
+
+
+def fit_cda_crr(df, total_weight_kg):
+    """
+    Ajuste Crr et CdA sur une sortie. Retourne (résultat, erreur) : résultat
+    {'crr', 'cda', 'residu_m', 'nb_segments', 'source'} ou None avec le message d'erreur.
+    """
+    segments, source, error = ride_segments(df, total_weight_kg)
+    if error: return None, error
+    crr, cda, rms = fit_segments(segments)
+    return {'crr': crr, 'cda': cda, 'residu_m': rms, 'nb_segments': len(segments[0]), 'source': source}, None
+
+
+def fit_cda_crr_batch(rides, total_weight_kg):
+    """
+    Ajustement sur plusieurs sorties (itérable de (nom, DataFrame)) :
+    (tableau d'une ligne par sortie, ajustement commun sur tous les segments
+    ou None). L'ajustement commun suppose le même vélo et la même position.
+    """
+    rows = []; pooled = []
+    for name, df in rides:
+        segments, source, error = ride_segments(df, total_weight_kg)
+        row = {'sortie': name, 'crr': np.nan, 'cda': np.nan, 'residu_m': np.nan, 'nb_segments': 0, 'source': source, 'erreur': error}
+        if segments is not None:
+            row['crr'], row['cda'], row['residu_m'] = fit_segments(segments)
+            row['nb_segments'] = len(segments[0]); pooled.append(segments)
+        rows.append(row)
+    if not pooled: return pd.DataFrame(rows), None
+    segments = tuple(np.concatenate(parts) for parts in zip(*pooled))
+    crr, cda, rms = fit_segments(segments)
+    return pd.DataFrame(rows), {'crr': crr, 'cda': cda, 'residu_m': rms, 'nb_segments': len(segments[0])}
@@ -6,25 +6,34 @@ import plotly.colors
 import io 
 import pydeck as pdk 
 import streamlit.components.v1 as components 
+import os
+import multiprocessing
+import threading
 import time
+import uuid
 
 try:
-    from data_loader import load_and_clean_data
-    from power_estimator import estimate_power
-    from climb_processing import (
-        calculate_derivatives,
-        identify_and_filter_initial_climbs,
-        group_and_merge_climbs,
-        calculate_climb_summary
-    )
+    from data_loader import load_ride
+    from analysis_warnings import capture_warnings
+    from ride_cache import content_key
+    from pipeline import AnalysisPipeline
+    from aero_fit import fit_cda_crr
+    from summary_processor import power_summary, calculate_global_summary, BEST_EFFORTS_MIN
+    from ride_store import RideStore
+    from climb_matching import ClimbCatalogue, climb_traces
+    from diagnostics import StageMonitor, DIAGNOSTICS_LOG
+    from batch_analysis import iter_analyses
+    from power_curves import season_envelope
+    from climb_processing import format_climbs
+    from sprint_detector import format_sprints
     # 1. On garde les graphiques classiques dans plotting
-    from plotting import create_climb_figure, create_sprint_figure
+    from plotting import create_climb_figure, create_sprint_figure, create_mean_max_figure
     
     # 2. CORRECTION ICI : On importe la carte depuis map_plotter !
-    from map_plotter import create_map_figure 
+    from map_plotter import build_map_figure, set_map_style 
     
-    from profile_plotter import create_full_ride_profile
-    from map_3d_engine import create_pydeck_chart 
+    from profile_plotter import create_full_ride_profile, set_distance_marker
+    from map_3d_engine import build_distance_index, nearest_position, build_static_layers, create_replay_deck
     
     # Importation du composant d'animation
     from anim_slider.anim_slider import anim_slider 
@@ -32,6 +41,88 @@ except ImportError as e:
     st.error(f"Erreur d'importation : {e}")
     st.stop()
 
+# --- Chargement mis en cache (les modules de calcul n'importent pas Streamlit) ---
+# Décodage effectif pendant l'appel : chaque session exécute le script dans son propre thread, et la
+# fonction en cache n'est exécutée (dans le thread appelant) qu'en l'absence de résultat en cache
+LOAD_STATE = threading.local()
+
+@st.cache_data
+def load_ride_cached(file_buffer):
+    """load_ride et ses avertissements, pour les réafficher à chaque exécution."""
+    LOAD_STATE.computed = True
+    with capture_warnings() as messages:
+        result = load_ride(file_buffer)
+    return result, messages
+
+def show_warnings(messages):
+    for message in messages: st.warning(message)
+
+# --- Plusieurs fichiers : analyse concurrente (batch_analysis.py) et vue d'ensemble ---
+RIDE_SET_COLUMNS = ['fichier', 'debut', 'dist_totale_km', 'd_plus', 'temps_deplacement_str', 'vitesse_moy_kmh',
+                    'avg_hr', 'power_avg_est', 'power_np_est', 'cda_ajuste', 'crr_ajuste', 'nb_montees', 'nb_sprints', 'duree_analyse_s', 'erreur']
+
+def _ride_set_table(results):
+    """Résumés des sorties déjà analysées, dans l'ordre du chargement."""
+    rows = pd.DataFrame([result[0] for result in results if result is not None])
+    return rows[[col for col in RIDE_SET_COLUMNS if col in rows.columns]]
+
+def show_ride_set(uploaded_files, params, monitor, fit_aero=False):
+    """
+    Onglet Ensemble : les fichiers pas encore analysés avec ces réglages le
+    sont sur un pool de processus (iter_analyses, même chaîne que
+    batch_analysis.py) ; le tableau se complète à chaque sortie terminée,
+    puis la vue combinée (totaux, montées, sprints, enveloppe) s'affiche.
+    params porte le CdA et le Crr estimés (pas ceux ajustés sur la sortie
+    affichée) ; avec fit_aero, chaque sortie reçoit son propre ajustement.
+    """
+    st.header("Ensemble des Sorties")
+    params_key = (tuple(sorted(params.items())), fit_aero)
+    files = [(f.name, f.getvalue()) for f in uploaded_files]
+    keys = [(content_key(raw_bytes), params_key) for _, raw_bytes in files]
+    # Résultats en session par (contenu, réglages) ; ceux d'anciens fichiers ou réglages sont oubliés
+    cache = {key: result for key, result in st.session_state.get('ride_set', {}).items() if key in keys}
+    st.session_state['ride_set'] = cache
+    results = [cache.get(key) for key in keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    progress = st.progress(1 - len(pending) / len(files), text=f"{len(files) - len(pending)}/{len(files)} sorties analysées")
+    table = st.empty()
+    table.dataframe(_ride_set_table(results), use_container_width=True, hide_index=True)
+    if pending:
+        with monitor.stage('iter_analyses', rows_in=len(pending)) as entry:
+            workers = min(len(pending), os.cpu_count() or 1)
+            # 'spawn' : pas de fork du serveur Streamlit, multithread
+            analyses = iter_analyses([files[i] for i in pending], params, workers, fit_aero, multiprocessing.get_context('spawn'))
+            for done, (position, result) in enumerate(analyses, 1):
+                i = pending[position]; results[i] = cache[keys[i]] = result
+                progress.progress((len(files) - len(pending) + done) / len(files), text=f"{len(files) - len(pending) + done}/{len(files)} sorties analysées")
+                table.dataframe(_ride_set_table(results), use_container_width=True, hide_index=True)
+            entry['lignes_sortie'] = len(pending)
+    else: monitor.record('iter_analyses', 'cache', rows_out=len(files))
+    progress.empty()
+
+    done = [result for result in results if result[1] is not None]
+    if not done: st.warning("Aucune sortie n'a pu être analysée."); return
+    summaries = _ride_set_table(results)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Sorties", f"{len(done)} / {len(results)}")
+    col2.metric("Distance Totale", f"{pd.to_numeric(summaries.get('dist_totale_km'), errors='coerce').sum():.1f} km")
+    col3.metric("Dénivelé Positif", f"{pd.to_numeric(summaries.get('d_plus'), errors='coerce').sum():.0f} m")
+
+    # Montées et sprints de toutes les sorties (index numériques, colonnes fichier et n°)
+    for title, position in (("Montées", 1), ("Sprints", 2)):
+        frames = [result[position] for result in done if not result[position].empty]
+        st.subheader(f"{title} ({sum(len(frame) for frame in frames)})")
+        if not frames: continue
+        segments = pd.concat(frames, ignore_index=True).drop(columns=['start', 'end'], errors='ignore')
+        st.dataframe(segments.round(dict.fromkeys(segments.select_dtypes('number').columns, 1)), use_container_width=True, hide_index=True)
+
+    # Enveloppe : meilleure valeur de l'ensemble par durée, et la sortie qui la détient
+    st.subheader("Meilleures Moyennes de l'Ensemble")
+    envelope = season_envelope((row['fichier'], ride_curves.drop(columns='fichier').set_index('duree_s')) for row, _, _, ride_curves, _ in done)
+    if envelope.empty: st.info("Pas de courbe puissance-durée.")
+    else: st.plotly_chart(create_mean_max_figure(envelope), use_container_width=True, key="ride_set_curves")
+
 # --- Fonction simplifiée pour estimer Crr ---
 def estimate_crr_from_width(width_mm):
     base_crr = 0.004
@@ -54,7 +145,13 @@ def main_app():
     # --- INPUT UTILISATEUR (Sidebar) ---
     with st.sidebar:
         st.header("1. Fichier")
-        uploaded_file = st.file_uploader("Choisissez un fichier .fit", type="fit")
+        uploaded_files = st.file_uploader("Choisissez un ou plusieurs fichiers .fit", type="fit", accept_multiple_files=True) or []
+        uploaded_file = None
+        if len(uploaded_files) > 1:
+            # Détail d'une sortie dans les onglets habituels, toutes les sorties dans l'onglet Ensemble
+            shown = st.selectbox("Sortie affichée", range(len(uploaded_files)), format_func=lambda i: uploaded_files[i].name, key="shown_ride")
+            uploaded_file = uploaded_files[shown]
+        elif uploaded_files: uploaded_file = uploaded_files[0]
         with st.expander("2. Physique", expanded=True):
             cyclist_weight_kg = st.number_input("Poids du Cycliste (kg)", 30.0, 150.0, 68.0, 0.5)
             bike_weight_kg = st.number_input("Poids du Vélo + Équipement (kg)", 3.0, 25.0, 9.0, 0.1)
@@ -66,6 +163,8 @@ def main_app():
             wheel_size_options = ["700c (Route/Gravel)", "650b (Gravel/VTT)", "26\" (VTT ancien)", "29\" (VTT moderne)"]
             selected_wheel_size = st.selectbox("Taille des Roues", options=wheel_size_options)
             cda_value = 0.38; st.markdown(f"**Position :** Cocottes (CdA estimé : {cda_value} m²)")
+            fit_aero = st.checkbox("Ajuster CdA et Crr sur la sortie", value=False,
+                                   help="Élévation virtuelle sur les portions en roue libre (ou avec capteur de puissance).")
         with st.expander("3. Montées", expanded=False):
             min_climb_distance = st.slider("Longueur min. (m)", 100, 1000, 400, 50, key="climb_dist")
             min_pente = st.slider("Pente min. (%)", 1.0, 5.0, 3.0, 0.5, key="climb_pente")
@@ -78,42 +177,90 @@ def main_app():
             min_gradient_sprint, max_gradient_sprint = slope_range_sprint
             max_gap_distance_sprint = st.slider("Fusion gap (m)", 10, 200, 50, 10, key="sprint_gap_dist")
             sprint_rewind_sec = st.slider("Secondes 'Montée en Puissance'", 0, 20, 10, 1, key="sprint_rewind")
+        with st.expander("5. Diagnostics", expanded=False):
+            show_diagnostics = st.checkbox("Afficher le panneau de diagnostic", value=False, key="show_diagnostics")
+            trace_memory = st.checkbox("Mesurer le pic mémoire (plus lent)", value=False, key="trace_memory", disabled=not show_diagnostics)
 
     # --- AFFICHAGE PRINCIPAL (Inchangé) ---
     if uploaded_file is None:
         st.info("Veuillez charger un fichier .fit pour commencer l'analyse.")
         st.stop()
 
+    # Mesures de chaque étape de cette exécution (diagnostics.py) : panneau optionnel et journal JSON lines
+    session_id = st.session_state.setdefault('diagnostics_session', uuid.uuid4().hex[:12])
+    monitor = StageMonitor(trace_memory=show_diagnostics and trace_memory, session=session_id, fichier=uploaded_file.name)
+    monitor.start()
+
     # --- TRAITEMENT DES DONNÉES (Inchangé) ---
     with st.spinner("Analyse du fichier en cours..."):
         df_analyzed = None; resultats_df = pd.DataFrame(); sprints_df_full = pd.DataFrame()
-        analysis_error = None; sprint_error = None; montees_grouped = None; resultats_montées = []
-        df, session_data, error_msg = load_and_clean_data(uploaded_file)
-        if df is None: st.error(f"Erreur chargement : {error_msg}"); st.stop()
-        df_power_est = estimate_power(df, total_weight_kg, crr_value, cda_value)
-        df = df.join(df_power_est)
-        df_analyzed = calculate_derivatives(df.copy())
+        analysis_error = None; sprint_error = None; resultats_montées = []; curves = None; climb_trace_data = None
+        climbs_index = pd.DataFrame(columns=['start', 'end']); sprints_index = pd.DataFrame(columns=['start', 'end'])
+        LOAD_STATE.computed = False
+        with monitor.stage('load_ride') as entry:
+            (df, session_data, laps_df, events_df, error_msg), load_warnings = load_ride_cached(uploaded_file)
+            entry['statut'] = 'calcul' if LOAD_STATE.computed else 'cache'; entry['lignes_sortie'] = len(df) if df is not None else None
+        if df is None:
+            monitor.stop(); monitor.write_log()
+            st.error(f"Erreur chargement : {error_msg}"); st.stop()
+        show_warnings(load_warnings)
+
+        # Graphe d'étapes en cache (pipeline.py) : un réglage ne recalcule que ce qui en dépend
+        pipeline = st.session_state.setdefault('analysis_pipeline', AnalysisPipeline())
+        ride_key = content_key(uploaded_file.getvalue())
+        monitor.context.update(cle=ride_key, points=len(df))
+        aero_result = None; estimated_aero = {'crr': crr_value, 'cda': cda_value} # Avant ajustement, pour l'onglet Ensemble
+        if fit_aero:
+            aero_key = (ride_key, total_weight_kg)
+            aero_cache = st.session_state.get('aero_fit')
+            if aero_cache is None or aero_cache[0] != aero_key:
+                aero_cache = (aero_key, *monitor.call('fit_cda_crr', fit_cda_crr, df, total_weight_kg, rows_in=len(df))); st.session_state['aero_fit'] = aero_cache
+            else: monitor.record('fit_cda_crr', 'cache')
+            _, aero_result, aero_error = aero_cache
+            if aero_error: st.warning(f"Ajustement CdA/Crr impossible, valeurs estimées conservées : {aero_error}")
+            else: crr_value, cda_value = aero_result['crr'], aero_result['cda']
+        params = {'total_weight_kg': total_weight_kg, 'crr': crr_value, 'cda': cda_value,
+                  'min_pente': min_pente, 'max_gap_climb': max_gap_climb, 'min_climb_distance': min_climb_distance,
+                  'min_speed_kmh': min_peak_speed_sprint, 'min_gradient': min_gradient_sprint, 'max_gradient': max_gradient_sprint,
+                  'min_duration_sec': min_sprint_duration, 'max_gap_distance_m': max_gap_distance_sprint, 'rewind_sec': sprint_rewind_sec}
+        df_ride = df; stage_status = {}; stage_warnings = []
+        def run_stages(*targets):
+            try: return pipeline.run(ride_key, df_ride, params, targets, monitor=monitor)
+            finally: stage_status.update(pipeline.last_run); stage_warnings.extend(pipeline.warnings)
+
+        results = run_stages('power', 'analysed')
+        df = results['power']; df_analyzed = results['analysed']
         try:
-            df_analyzed_climbs = identify_and_filter_initial_climbs(df_analyzed, min_pente)
-            montees_grouped, df_blocs, bloc_map = group_and_merge_climbs(df_analyzed_climbs, max_gap_climb)
-            resultats_montées = calculate_climb_summary(montees_grouped, min_climb_distance)
+            climbs_index = run_stages('climbs')['climbs']
+            resultats_montées = format_climbs(climbs_index)
             resultats_df = pd.DataFrame(resultats_montées)
+            climb_trace_data = monitor.call('climb_traces', climb_traces, df_analyzed, climbs_index, rows_in=len(climbs_index))
         except Exception as e: analysis_error = f"Erreur analyse montées : {e}"; resultats_df = pd.DataFrame()
         try:
-            # Note: assure-toi que le fichier sprint_processing.py existe si tu utilises ceci
-            try:
-                from sprint_processing import detect_sprints 
-                sprint_results = detect_sprints(df_analyzed, min_peak_speed_sprint, min_gradient_sprint, max_gradient_sprint, min_sprint_duration, max_gap_distance_sprint, sprint_rewind_sec)
-                sprints_df_full = pd.DataFrame(sprint_results)
-            except ImportError: pass
+            sprints_index = run_stages('sprints')['sprints']
+            sprints_df_full = pd.DataFrame(format_sprints(sprints_index))
         except Exception as e: sprint_error = f"Erreur détection sprints : {e}"
+        try: curves = run_stages('curves')['curves']
+        except Exception as e: stage_warnings.append(f"Erreur courbes puissance-durée : {e}")
+        show_warnings(dict.fromkeys(stage_warnings))
+
+    with st.sidebar:
+        if aero_result is not None:
+            st.caption(f"Ajusté ({aero_result['source']}, {aero_result['nb_segments']} segments) : "
+                       f"CdA {cda_value:.3f} m², Crr {crr_value:.4f}, écart d'altitude {aero_result['residu_m']:.1f} m")
+        with st.expander("Étapes de calcul", expanded=False):
+            st.dataframe(pd.DataFrame([{'Étape': name, 'Statut': status, 'Durée (ms)': round(seconds * 1000, 1)}
+                                       for name, (status, seconds) in stage_status.items()]),
+                         hide_index=True, use_container_width=True)
+        diagnostics_panel = st.empty() if show_diagnostics else None # Rempli en fin d'exécution, figures comprises
     
     alt_col_to_use = 'altitude'
     if df_analyzed is not None and 'altitude_lisse' in df_analyzed.columns and not df_analyzed['altitude_lisse'].isnull().all():
             alt_col_to_use = 'altitude_lisse'
 
     # --- STRUCTURE PAR ONGLETS ---
-    tab_summary, tab_profile, tab_climbs, tab_sprints, tab_3d_map = st.tabs(["Résumé", "Profil 2D", "Montées", "Sprints", "Carte 3D"])
+    tab_names = ["Résumé", "Profil 2D", "Montées", "Sprints", "Carte 3D", "Historique"] + (["Ensemble"] if len(uploaded_files) > 1 else [])
+    tab_summary, tab_profile, tab_climbs, tab_sprints, tab_3d_map, tab_history, *tab_ride_set = st.tabs(tab_names)
     
     with tab_summary:
         st.header("Résumé de la Sortie")
@@ -136,8 +283,14 @@ def main_app():
             selected_style_name = st.radio("Style de la carte :", options=list(map_style_options.keys()), horizontal=True, key="map_style")
             map_style_id = map_style_options[selected_style_name]
             if 'df_analyzed' in locals() and 'position_lat' in df_analyzed.columns:
-                # Cette fonction doit être dans plotting.py
-                map_fig = create_map_figure(df_analyzed, map_style_id) 
+                # Géométrie construite une fois par sortie et par réglage de puissance : le choix du style ne change que le fond
+                map_key = (ride_key, total_weight_kg, crr_value, cda_value)
+                route_map = st.session_state.get('route_map')
+                if route_map is None or route_map[0] != map_key:
+                    route_map = (map_key, monitor.call('build_map_figure', build_map_figure, df_analyzed, cache_key=ride_key, rows_in=len(df_analyzed)))
+                    st.session_state['route_map'] = route_map
+                else: monitor.record('build_map_figure', 'cache')
+                map_fig = set_map_style(route_map[1], map_style_id) 
                 st.plotly_chart(map_fig, use_container_width=True)
             else:
                 st.warning("Données GPS (position_lat/long) non trouvées.")
@@ -157,10 +310,28 @@ def main_app():
             
             st.subheader("Analyse de Puissance (Estimée)")
             if 'estimated_power' in df.columns and not df['estimated_power'].isnull().all():
-                power_avg_est = df['estimated_power'].mean(); power_max_est = df['estimated_power'].max()
-                col1d, col2d = st.columns(2)
-                col1d.metric("Puissance Estimée Moyenne", f"{power_avg_est:.0f} W"); col2d.metric("Puissance Estimée Max", f"{power_max_est:.0f} W")
+                power_stats = monitor.call('power_summary', power_summary, df, rows_in=len(df))
+                col1d, col2d, col3d = st.columns(3)
+                col1d.metric("Puissance Estimée Moyenne", f"{power_stats['power_avg_est']:.0f} W"); col2d.metric("Puissance Estimée Max", f"{power_stats['power_max_est']:.0f} W")
+                col3d.metric("Puissance Normalisée Est.", f"{power_stats['power_np_est']:.0f} W")
+                for col, minutes in zip(st.columns(len(BEST_EFFORTS_MIN)), BEST_EFFORTS_MIN):
+                    best = power_stats[f'power_{minutes}min_est']
+                    col.metric(f"Meilleure {minutes} min (Est.)", f"{best:.0f} W" if pd.notna(best) else "N/A")
             else: st.info("Aucune donnée de puissance estimée à afficher.")
+            if curves is not None and not curves.empty:
+                # Courbes en cache dans le pipeline (étape 'curves') : recalculées seulement si la sortie ou la puissance change
+                st.plotly_chart(monitor.call('create_mean_max_figure', create_mean_max_figure, curves, rows_in=len(curves)), use_container_width=True)
+
+            if laps_df is not None and len(laps_df) > 1:
+                st.subheader("Tours")
+                laps_view = pd.DataFrame({
+                    'Début': laps_df.get('start_time'),
+                    'Distance (km)': laps_df.get('total_distance', pd.Series(dtype=float)) / 1000,
+                    'Durée': pd.to_timedelta(laps_df.get('total_timer_time', laps_df.get('total_elapsed_time')), unit='s'),
+                    'Vitesse Moy (km/h)': laps_df.get('avg_speed', pd.Series(dtype=float)) * 3.6,
+                    'FC Moy (bpm)': laps_df.get('avg_heart_rate'),
+                })
+                st.dataframe(laps_view.dropna(axis=1, how='all'), use_container_width=True)
         except Exception as e:
             st.warning(f"Impossible d'afficher le résumé : {e}")
             
@@ -169,7 +340,7 @@ def main_app():
         st.info("Survolez le graphique pour voir les détails (pente, vitesse, puissance) à chaque point.")
         if 'df_analyzed' in locals() and not df_analyzed.empty:
             try:
-                fig_profile = create_full_ride_profile(df_analyzed) # Appel sans distance
+                fig_profile = monitor.call('create_full_ride_profile', create_full_ride_profile, df_analyzed, cache_key=ride_key, rows_in=len(df_analyzed)) # Appel sans distance
                 st.plotly_chart(fig_profile, use_container_width=True)
             except Exception as e:
                 st.error(f"Erreur lors de la création du profil complet : {e}")
@@ -182,20 +353,27 @@ def main_app():
         if analysis_error: st.error(analysis_error)
         elif resultats_df.empty: st.warning(f"Aucune ascension ({min_climb_distance}m+, {min_pente}%+) trouvée.")
         else: st.dataframe(resultats_df.drop(columns=['index'], errors='ignore'), use_container_width=True)
+        if climb_trace_data is not None and not resultats_df.empty:
+            # Montées déjà grimpées (climb_matching.py) : catalogue de l'historique gardé en session tant que la base ne change pas
+            try:
+                with RideStore() as store:
+                    catalogue_key = (store.path, store.counts()['traces_montees'])
+                    if st.session_state.get('climb_catalogue', (None, None))[0] != catalogue_key:
+                        st.session_state['climb_catalogue'] = (catalogue_key, monitor.call('ClimbCatalogue.from_store', ClimbCatalogue.from_store, store))
+                    else: monitor.record('ClimbCatalogue.from_store', 'cache')
+                matches = monitor.call('ClimbCatalogue.match', st.session_state['climb_catalogue'][1].match, *climb_trace_data, rows_in=len(climbs_index))
+                matches = matches[matches['cle'] != ride_key].drop(columns=['cle'])
+                st.subheader("Passages précédents")
+                if matches.empty: st.caption("Aucune de ces montées n'a été trouvée dans l'historique.")
+                else: st.dataframe(matches.rename(columns={'montee': 'Montée', 'n': 'n° dans la sortie'}), use_container_width=True, hide_index=True)
+            except Exception as e: st.warning(f"Comparaison avec l'historique indisponible : {e}")
         st.header("Profils Détaillés des Montées")
-        if montees_grouped is not None and not resultats_df.empty:
-            processed_results_count = 0; montee_ids = list(montees_grouped.groups.keys()); valid_climb_data = []
-            for nom_bloc in montee_ids:
-                segment = montees_grouped.get_group(nom_bloc)
-                if 'delta_distance' not in df_analyzed.columns: st.error("Colonne 'delta_distance' manquante."); break
-                distance_segment = df_analyzed.loc[segment.index, 'delta_distance'].sum()
-                if distance_segment >= min_climb_distance:
-                    if processed_results_count < len(resultats_montées):
-                        valid_climb_data.append((processed_results_count, segment)); processed_results_count += 1
-                    else: st.warning(f"Incohérence détectée (montées)."); break
-            for index_resultat, df_climb_original in valid_climb_data:
+        if not resultats_df.empty:
+            # Index des montées : positions [start, end) dans df_analyzed, une ligne par résultat
+            for index_resultat, (start, end) in enumerate(zip(climbs_index['start'], climbs_index['end'])):
                 try:
-                    fig = create_climb_figure(df_climb_original.copy(), alt_col_to_use, chunk_distance_m, resultats_montées, index_resultat)
+                    fig = monitor.call('create_climb_figure', create_climb_figure, df_analyzed.iloc[start:end].copy(), alt_col_to_use, chunk_distance_m,
+                                       resultats_montées, index_resultat, rows_in=end - start)
                     st.plotly_chart(fig, use_container_width=True, key=f"climb_chart_{index_resultat}")
                 except Exception as e: st.error(f"Erreur création graphique ascension {index_resultat+1}."); st.exception(e)
         elif not analysis_error: st.info("Aucun profil de montée à afficher.")
@@ -215,18 +393,11 @@ def main_app():
         if not sprints_df_full.empty:
             for index, sprint_info in sprints_df_full.iterrows():
                 try:
-                    start_timestamp = sprint_info['Début']
-                    if not isinstance(start_timestamp, pd.Timestamp): st.warning(f"Format début incorrect sprint {index+1}."); continue
-                    try: duration_float = float(sprint_info['Durée (s)'])
-                    except (ValueError, TypeError): st.warning(f"Format durée incorrect sprint {index+1}."); continue
-                    end_timestamp = start_timestamp + pd.Timedelta(seconds=duration_float)
-                    if start_timestamp in df_analyzed.index and end_timestamp <= df_analyzed.index[-1]:
-                        df_sprint_segment = df_analyzed.loc[start_timestamp:end_timestamp]
-                    elif start_timestamp in df_analyzed.index:
-                        df_sprint_segment = df_analyzed.loc[start_timestamp:]
-                    else: df_sprint_segment = pd.DataFrame()
+                    # Lignes exactes du sprint (V-min -> fin officielle) via les positions de l'index
+                    df_sprint_segment = df_analyzed.iloc[sprints_index['start'].iat[index]:sprints_index['end'].iat[index]]
                     if not df_sprint_segment.empty:
-                        fig_sprint = create_sprint_figure(df_sprint_segment.copy(), sprint_info, index, st.session_state.sprint_display_mode)
+                        fig_sprint = monitor.call('create_sprint_figure', create_sprint_figure, df_sprint_segment.copy(), sprint_info, index,
+                                                  st.session_state.sprint_display_mode, rows_in=len(df_sprint_segment))
                         st.plotly_chart(fig_sprint, use_container_width=True, key=f"sprint_chart_{index}")
                     else: st.warning(f"Segment vide pour sprint {index+1}.")
                 except KeyError as ke: st.error(f"Erreur (KeyError) sprint {index+1}: Clé {ke}."); st.exception(e)
@@ -252,6 +423,23 @@ def main_app():
                     st.error("Colonne 'distance' manquante.")
                     return
                 max_distance = int(df_analyzed['distance'].max())
+
+                # Éléments fixes de la relecture, construits une fois par sortie (par jeu de segments et
+                # par réglage de puissance, affichée au survol du profil) : index du curseur, couches de la carte et profil de base
+                scene_key = (ride_key, tuple(zip(climbs_index['start'], climbs_index['end'])),
+                             tuple(zip(sprints_index['start'], sprints_index['end'])), total_weight_kg, crr_value, cda_value)
+                scene = st.session_state.get('replay_scene')
+                if scene is None or scene['key'] != scene_key:
+                    climb_segments = [df_analyzed.iloc[start:end] for start, end in scene_key[1]]
+                    sprint_segments = [df_analyzed.iloc[start:end] for start, end in scene_key[2]]
+                    try: profile = monitor.call('create_full_ride_profile', create_full_ride_profile, df_analyzed, cache_key=ride_key, rows_in=len(df_analyzed))
+                    except Exception: profile = None
+                    scene = {'key': scene_key, 'cursor': monitor.call('build_distance_index', build_distance_index, df_analyzed, rows_in=len(df_analyzed)),
+                             'layers': monitor.call('build_static_layers', build_static_layers, df_analyzed, climb_segments, sprint_segments,
+                                                    st.secrets["MAPBOX_API_KEY"], cache_key=ride_key, rows_in=len(df_analyzed)),
+                             'profile': profile}
+                    st.session_state['replay_scene'] = scene
+                else: monitor.record('replay_scene', 'cache')
                 st.write("---")
                 st.info(f"DEBUG : Tentative d'affichage du bouton (Max dist: {max_distance})")
                 # 2. Le Slider (Input)
@@ -260,9 +448,9 @@ def main_app():
                     key="animation_player"
                 )
                 
-                # 3. Calculs (Uniquement pour la carte)
-                closest_index = (df_analyzed['distance'] - selected_distance).abs().idxmin()
-                selected_point_data = df_analyzed.loc[closest_index]
+                # 3. Curseur : recherche binaire dans l'index des distances
+                position = nearest_position(scene['cursor'], selected_distance)
+                selected_point_data = df_analyzed.iloc[position] if position is not None else None
 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -272,34 +460,14 @@ def main_app():
                 
                 st.info(f"Position : {selected_distance:.0f} m")
 
-                # 4. Affichage Carte
-                climb_segments_to_plot = []
-                if show_climbs and montees_grouped is not None:
-                      processed_results_count = 0
-                      for nom_bloc in list(montees_grouped.groups.keys()):
-                        segment = montees_grouped.get_group(nom_bloc)
-                        dist_seg = df_analyzed.loc[segment.index, 'delta_distance'].sum()
-                        if dist_seg >= min_climb_distance:
-                            if processed_results_count < len(resultats_montées):
-                                climb_segments_to_plot.append(segment)
-                                processed_results_count += 1
-                
-                sprint_segments_to_plot = []
-                if show_sprints and not sprints_df_full.empty:
-                    # (Logique simple pour les sprints)
-                    for _, s_info in sprints_df_full.iterrows():
-                        try:
-                            end = s_info['Début'] + pd.Timedelta(seconds=float(s_info['Durée (s)']))
-                            sprint_segments_to_plot.append(df_analyzed.loc[s_info['Début']:end])
-                        except: pass
-
-                # Création et affichage Pydeck
+                # 4. Affichage Carte : seuls le point cycliste et la caméra changent
                 try:
-                    deck = create_pydeck_chart(
-                        df_analyzed, 
-                        climb_segments_to_plot, 
-                        sprint_segments_to_plot, 
-                        selected_point_data=selected_point_data
+                    deck = monitor.call(
+                        'create_replay_deck', create_replay_deck,
+                        scene['layers'], 
+                        st.secrets["MAPBOX_API_KEY"], 
+                        selected_point_data=selected_point_data,
+                        show_climbs=show_climbs, show_sprints=show_sprints
                     )
                     
                     if deck:
@@ -310,11 +478,12 @@ def main_app():
                 except Exception as e:
                     st.error(f"Erreur Pydeck : {e}")
 
-                # 5. Profil 2D sous la carte
-                try:
-                    fig_2d = create_full_ride_profile(df_analyzed, selected_distance=selected_distance)
+                # 5. Profil 2D sous la carte : profil de base en cache, seule la ligne verticale bouge
+                if scene['profile'] is not None:
+                    fig_2d = monitor.call('set_distance_marker', set_distance_marker, scene['profile'], selected_distance)
                     st.plotly_chart(fig_2d, use_container_width=True, key="profile_3d_view")
-                except: pass
+                # Relecture seule (fragment) : le reste de l'exécution ne tourne pas, ses mesures sont écrites ici
+                monitor.write_log()
 
             # --- APPEL DE LA FONCTION ISOLEE ---
             afficher_carte_interactive()
@@ -322,6 +491,49 @@ def main_app():
         else:
             st.warning("Données GPS non trouvées.")
 
+    with tab_history:
+        st.header("Historique des Sorties")
+        try:
+            # Base SQLite locale (ride_store.py) : une connexion par exécution du script
+            with RideStore() as store:
+                if store.has_ride(ride_key): st.caption("Cette sortie est déjà dans l'historique (l'enregistrer à nouveau remplace ses lignes).")
+                if st.button("Enregistrer cette sortie dans l'historique", key="store_ride"):
+                    summary, summary_error = monitor.call('calculate_global_summary', calculate_global_summary, df, session_data, rows_in=len(df))
+                    if summary_error: st.warning(summary_error)
+                    monitor.call('RideStore.add_ride', store.add_ride, ride_key, uploaded_file.name, df_analyzed.index[0], summary, climbs_index, sprints_index, climb_trace_data)
+                counts = store.counts()
+                st.caption(f"{counts['sorties']} sorties, {counts['montees']} montées, {counts['sprints']} sprints enregistrés.")
+
+                col1h, col2h = st.columns(2)
+                period = col1h.date_input("Période", value=(), key="history_period")
+                since, until = (period[0], period[-1] + pd.Timedelta(days=1)) if period else (None, None)
+                history_min_pente = col2h.slider("Pente min. des montées (%)", 0.0, 15.0, 6.0, 0.5, key="history_pente")
+                st.subheader("Montées")
+                st.dataframe(store.climbs(min_pente=history_min_pente, since=since, until=until, limit=500), use_container_width=True, hide_index=True)
+                st.subheader("Sprints")
+                history_min_speed = st.slider("Vitesse max. min. des sprints (km/h)", 25.0, 80.0, 40.0, 1.0, key="history_speed")
+                st.dataframe(store.sprints(min_speed_kmh=history_min_speed, since=since, until=until, limit=500), use_container_width=True, hide_index=True)
+                st.subheader("Sorties")
+                st.dataframe(store.rides(since=since, until=until), use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.warning(f"Historique indisponible : {e}")
+
+    for tab in tab_ride_set:
+        with tab:
+            try: show_ride_set(uploaded_files, {**params, **estimated_aero}, monitor, fit_aero)
+            except Exception as e: st.warning(f"Analyse de l'ensemble impossible : {e}")
+
+    monitor.stop(); monitor.write_log()
+    if diagnostics_panel is not None:
+        with diagnostics_panel.container():
+            with st.expander("Diagnostics", expanded=True):
+                diagnostics = monitor.summary()
+                st.caption(f"{diagnostics['duree_ms'].sum():.0f} ms mesurés sur {len(diagnostics)} étapes"
+                           + ("" if monitor.trace_memory else " (pic mémoire non mesuré)") + f". Journal : {DIAGNOSTICS_LOG or 'désactivé'}")
+                st.dataframe(diagnostics.rename(columns={'etape': 'Étape', 'statut': 'Statut', 'appels': 'Appels', 'duree_ms': 'Durée (ms)',
+                                                         'pic_memoire_mo': 'Pic mémoire (Mo)', 'lignes_entree': 'Lignes (entrée)', 'lignes_sortie': 'Lignes (sortie)'}).round(1),
+                             hide_index=True, use_container_width=True)
+
 # Point d'entrée
 if __name__ == "__main__":
     main_app()
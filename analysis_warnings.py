@@ -0,0 +1,45 @@
+# analysis_warnings.py
+"""
+Avertissements des modules de calcul. Ils n'importent pas Streamlit : un
+problème non bloquant est signalé par warn(), et c'est l'interface (ou le
+traitement en lot) qui le récupère et l'affiche.
+
+Les messages sont recueillis dans une liste propre au contexte d'exécution
+(contextvars) : chaque session Streamlit tourne dans son propre thread, donc
+deux sessions qui calculent en même temps ne mélangent pas leurs messages.
+L'état global du module warnings n'est pas modifié.
+"""
+import contextlib
+import contextvars
+import warnings
+
+_collector = contextvars.ContextVar('analysis_warnings', default=None) # Liste du capture_warnings en cours
+
+
+class AnalysisWarning(UserWarning):
+    """Problème non bloquant rencontré pendant l'analyse (colonne manquante...)."""
+
+
+def warn(message):
+    """
+    Ajoute le message à la liste du capture_warnings en cours ; hors capture,
+    émet un AnalysisWarning attribué à l'appelant du module de calcul.
+    """
+    messages = _collector.get()
+    if messages is not None: messages.append(str(message))
+    else: warnings.warn(message, AnalysisWarning, stacklevel=3)
+
+
+@contextlib.contextmanager
+def capture_warnings():
+    """
+    Récupère les messages de warn() appelés dans le bloc, y compris les
+    répétitions, dans la liste rendue (remplie au fil du bloc). Un bloc
+    imbriqué garde ses messages pour lui.
+    """
+    messages = []
+    token = _collector.set(messages)
+    try:
+        yield messages
+    finally:
+        _collector.reset(token)
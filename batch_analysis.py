@@ -0,0 +1,220 @@
+# batch_analysis.py
+"""
+Analyse en lot d'une archive de fichiers .fit, sans interface : même chaîne que
+l'application (chargement, puissance estimée, dérivées, montées, sprints,
+résumé), répartie sur un pool de processus. Écrit cinq fichiers Parquet :
+resumes.parquet (une ligne par sortie), montees.parquet, sprints.parquet,
+courbes.parquet (meilleures moyennes par durée de chaque sortie) et
+enveloppe.parquet (meilleure valeur de l'archive par durée, et sa sortie).
+Avec --ajuster-aero, chaque résumé reçoit aussi le CdA et le Crr ajustés sur la sortie.
+Avec --base, résumés, montées (et leurs tracés GPS, pour la reconnaissance
+des montées de climb_matching.py) et sprints sont aussi importés en lot dans
+la base SQLite de l'historique (ride_store.py).
+
+    python batch_analysis.py archive/ "equipe/**/*.fit" -o resultats -j 8 --min-pente 4
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from data_loader import read_ride
+from pipeline import AnalysisPipeline, DEFAULT_PARAMS
+from aero_fit import fit_cda_crr
+from summary_processor import calculate_global_summary
+from power_curves import season_envelope
+from ride_cache import content_key
+from ride_store import RideStore
+from climb_matching import climb_traces
+
+
+def analyse_ride(df, session_data, params=DEFAULT_PARAMS):
+    """
+    Chaîne d'analyse d'une sortie déjà chargée (étapes de pipeline.py) :
+    (résumé, index des montées, index des sprints, courbes, tracés des montées,
+    erreurs, avertissements). Une étape en échec n'empêche pas les suivantes,
+    son erreur est rendue.
+    """
+    errors = []; messages = []
+    pipeline = AnalysisPipeline(max_entries=1)
+    df_power = pipeline.run('ride', df, params, targets=('power',))['power']
+    messages += pipeline.warnings
+
+    results = {'climbs': pd.DataFrame(), 'sprints': pd.DataFrame(), 'curves': pd.DataFrame()}
+    for target, label in (('climbs', "Erreur analyse montées"), ('sprints', "Erreur détection sprints"),
+                          ('curves', "Erreur courbes puissance-durée")):
+        try: results[target] = pipeline.run('ride', df, params, targets=(target,))[target]
+        except Exception as e: errors.append(f"{label} : {e}")
+        messages += pipeline.warnings
+    traces = None
+    if not results['climbs'].empty: # Sortie analysée déjà en cache dans le pipeline
+        traces = climb_traces(pipeline.run('ride', df, params, targets=('analysed',))['analysed'], results['climbs'])
+
+    summary, summary_error = calculate_global_summary(df_power, session_data)
+    if summary_error: errors.append(summary_error)
+    return summary, results['climbs'], results['sprints'], results['curves'], traces, errors, list(dict.fromkeys(messages))
+
+
+def aero_columns(df, total_weight_kg):
+    """Colonnes du résumé pour l'ajustement CdA/Crr (aero_fit.py), NaN si impossible."""
+    fit, _ = fit_cda_crr(df, total_weight_kg)
+    if fit is None: return {'cda_ajuste': float('nan'), 'crr_ajuste': float('nan'), 'residu_ajustement_m': float('nan'), 'nb_segments_ajustement': 0}
+    return {'cda_ajuste': fit['cda'], 'crr_ajuste': fit['crr'], 'residu_ajustement_m': fit['residu_m'], 'nb_segments_ajustement': fit['nb_segments']}
+
+
+def analyse_bytes(raw_bytes, name, params=DEFAULT_PARAMS, fit_aero=False):
+    """
+    Tâche d'un processus du pool : analyse le contenu d'un .fit (name : valeur
+    de la colonne fichier), ne lève jamais. Retourne (résumé, montées, sprints,
+    courbes, tracés des montées), None à la place des tables en cas d'erreur.
+    """
+    start = time.perf_counter()
+    row = {'fichier': name}
+    try:
+        row['cle'] = content_key(raw_bytes)
+        df, session_data, _, _, error_msg = read_ride(raw_bytes)
+        if df is None:
+            row['erreur'] = error_msg
+            return row, None, None, None, None
+        summary, climbs, sprints, curves, traces, errors, messages = analyse_ride(df, session_data, params)
+        if fit_aero: summary = {**summary, **aero_columns(df, params.get('total_weight_kg', DEFAULT_PARAMS['total_weight_kg']))}
+    except Exception as e:
+        row['erreur'] = f"Erreur traitement : {e}"
+        return row, None, None, None, None
+
+    row.update({'debut': df.index[0], 'nb_records': len(df), **summary,
+                'nb_montees': len(climbs), 'nb_sprints': len(sprints),
+                'erreur': ' | '.join(errors) or None, 'avertissements': ' | '.join(messages) or None,
+                'duree_analyse_s': time.perf_counter() - start})
+    # Index numériques des segments (positions start/end dans la sortie analysée)
+    climbs, sprints = (frame.assign(**{'n°': range(1, len(frame) + 1)}).assign(fichier=name)[['fichier', 'n°', *frame.columns]]
+                       for frame in (climbs, sprints))
+    curves = curves.reset_index().assign(fichier=name)
+    return row, climbs, sprints, curves[['fichier', *curves.columns[:-1]]], traces
+
+
+def analyse_file(path, params=DEFAULT_PARAMS, fit_aero=False):
+    """Tâche d'un processus du pool : lit et analyse un fichier (analyse_bytes), ne lève jamais."""
+    try:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+    except OSError as e:
+        return {'fichier': path, 'erreur': f"Erreur traitement : {e}"}, None, None, None, None
+    return analyse_bytes(raw_bytes, path, params, fit_aero)
+
+
+def iter_analyses(files, params=DEFAULT_PARAMS, workers=None, fit_aero=False, mp_context=None):
+    """
+    Analyse concurrente (analyse_bytes) de fichiers déjà lus, liste de (nom,
+    octets), sur un pool de processus : rend (position dans files, résultat)
+    dès que chaque analyse se termine. Si l'itération s'arrête avant la fin,
+    les analyses pas encore commencées sont annulées. Depuis un processus
+    multithread (serveur Streamlit), passer mp_context = contexte 'spawn' :
+    un processus créé par fork peut y rester bloqué sur un verrou tenu par
+    un autre thread.
+    """
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+    try:
+        futures = {executor.submit(analyse_bytes, raw_bytes, name, params, fit_aero): i for i, (name, raw_bytes) in enumerate(files)}
+        for future in as_completed(futures): yield futures[future], future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def collect_files(inputs):
+    """Dossiers (parcourus récursivement), motifs glob ou fichiers -> liste triée de .fit."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*')
+            paths.update(p for p in glob.glob(pattern, recursive=True) if p.lower().endswith('.fit'))
+        elif glob.has_magic(item):
+            paths.update(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+        elif os.path.isfile(item):
+            paths.add(item)
+        else:
+            print(f"Introuvable : {item}", file=sys.stderr)
+    return sorted(paths)
+
+
+def _concat(frames):
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def run_batch(paths, output_dir, params=DEFAULT_PARAMS, workers=None, progress=True, fit_aero=False, store_path=None):
+    """Analyse les fichiers sur un pool de processus et écrit les fichiers Parquet (et la base SQLite si store_path)."""
+    rows, climbs, sprints, curves, stored = [], [], [], [], []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(analyse_file, path, params, fit_aero) for path in paths]
+        for done, future in enumerate(as_completed(futures), 1):
+            row, ride_climbs, ride_sprints, ride_curves, ride_traces = future.result()
+            rows.append(row)
+            if ride_climbs is not None:
+                climbs.append(ride_climbs); sprints.append(ride_sprints); curves.append(ride_curves)
+                stored.append({'cle': row['cle'], 'fichier': row['fichier'], 'debut': row['debut'], 'resume': row, 'montees': ride_climbs, 'sprints': ride_sprints, 'traces': ride_traces})
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"\r{done}/{len(paths)} sorties - {done / elapsed:.1f} sorties/s", end='', file=sys.stderr, flush=True)
+    elapsed = time.perf_counter() - start
+    if progress: print(file=sys.stderr)
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = {'resumes': pd.DataFrame(rows), 'montees': _concat(climbs), 'sprints': _concat(sprints), 'courbes': _concat(curves)}
+    # Enveloppe depuis les courbes déjà calculées, sans relire les enregistrements
+    ride_curves = outputs['courbes'].groupby('fichier', sort=False) if not outputs['courbes'].empty else ()
+    outputs['enveloppe'] = season_envelope((path, frame.drop(columns='fichier').set_index('duree_s')) for path, frame in ride_curves).reset_index()
+    for name, frame in outputs.items():
+        if 'fichier' in frame.columns: frame = frame.sort_values(['fichier'] + [col for col in ('n°', 'duree_s') if col in frame.columns], kind='stable')
+        frame.to_parquet(os.path.join(output_dir, f"{name}.parquet"), index=False)
+    if store_path:
+        with RideStore(store_path) as store: store.add_rides(stored) # Une transaction pour toute l'archive
+    return outputs['resumes'], elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help="Dossiers, motifs glob ou fichiers .fit")
+    parser.add_argument('-o', '--output', default='resultats', help="Dossier de sortie (défaut : resultats)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="Nombre de processus (défaut : nb de cœurs)")
+    physics = parser.add_argument_group("Physique")
+    physics.add_argument('--poids', dest='total_weight_kg', type=float, default=DEFAULT_PARAMS['total_weight_kg'], help="Poids total cycliste + vélo (kg)")
+    physics.add_argument('--crr', type=float, default=DEFAULT_PARAMS['crr'])
+    physics.add_argument('--cda', type=float, default=DEFAULT_PARAMS['cda'])
+    physics.add_argument('--ajuster-aero', dest='fit_aero', action='store_true', help="Ajuste aussi CdA et Crr sur chaque sortie (aero_fit.py)")
+    climbs = parser.add_argument_group("Montées")
+    climbs.add_argument('--min-distance', dest='min_climb_distance', type=float, default=DEFAULT_PARAMS['min_climb_distance'], help="Longueur min. (m)")
+    climbs.add_argument('--min-pente', type=float, default=DEFAULT_PARAMS['min_pente'], help="Pente min. (%%)")
+    climbs.add_argument('--gap-montee', dest='max_gap_climb', type=float, default=DEFAULT_PARAMS['max_gap_climb'], help="Fusion gap (m)")
+    sprints = parser.add_argument_group("Sprints")
+    sprints.add_argument('--vitesse-sprint', dest='min_speed_kmh', type=float, default=DEFAULT_PARAMS['min_speed_kmh'], help="Vitesse min. (km/h)")
+    sprints.add_argument('--duree-sprint', dest='min_duration_sec', type=float, default=DEFAULT_PARAMS['min_duration_sec'], help="Durée min. (s)")
+    sprints.add_argument('--pente-sprint', nargs=2, type=float, metavar=('MIN', 'MAX'),
+                         default=(DEFAULT_PARAMS['min_gradient'], DEFAULT_PARAMS['max_gradient']), help="Plage de pente (%%)")
+    sprints.add_argument('--gap-sprint', dest='max_gap_distance_m', type=float, default=DEFAULT_PARAMS['max_gap_distance_m'], help="Fusion gap (m)")
+    sprints.add_argument('--rembobinage', dest='rewind_sec', type=float, default=DEFAULT_PARAMS['rewind_sec'], help="Secondes 'Montée en Puissance'")
+    parser.add_argument('--base', dest='store_path', help="Base SQLite où importer résumés, montées et sprints (historique de l'application)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Sans barre de progression")
+    args = parser.parse_args(argv)
+
+    params = {key: getattr(args, key) for key in DEFAULT_PARAMS if hasattr(args, key)}
+    params['min_gradient'], params['max_gradient'] = args.pente_sprint
+
+    paths = collect_files(args.inputs)
+    if not paths: parser.error("Aucun fichier .fit trouvé.")
+
+    resumes, elapsed = run_batch(paths, args.output, params, args.workers, progress=not args.quiet, fit_aero=args.fit_aero, store_path=args.store_path)
+    n_errors = int(resumes['erreur'].notna().sum()) if 'erreur' in resumes.columns else 0
+    print(f"{len(paths)} sorties en {elapsed:.1f} s ({len(paths) / elapsed:.1f} sorties/s), "
+          f"{n_errors} avec erreur -> {os.path.abspath(args.output)}")
+    if args.fit_aero and resumes.get('cda_ajuste', pd.Series(dtype=float)).notna().any():
+        print(f"Ajustement aéro ({int(resumes['cda_ajuste'].notna().sum())} sorties) : CdA médian {resumes['cda_ajuste'].median():.3f} m², "
+              f"Crr médian {resumes['crr_ajuste'].median():.4f}")
+
+
+if __name__ == '__main__':
+    main()
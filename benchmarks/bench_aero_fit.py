@@ -0,0 +1,51 @@
+# benchmarks/bench_aero_fit.py
+"""
+Durée de l'ajustement CdA/Crr (aero_fit.py) par sortie : extraction des
+segments (bilans d'énergie) puis grille + resserrement, et ajustement commun
+sur toutes les sorties données.
+
+    python benchmarks/bench_aero_fit.py sortie1.fit [sortie2.fit ...] [--poids 77] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_ride  # noqa: E402
+from aero_fit import ride_segments, fit_segments, fit_cda_crr_batch  # noqa: E402
+
+
+def timed(func, repeat):
+    """(résultat, durée moyenne en ms) sur repeat appels."""
+    start = time.perf_counter()
+    for _ in range(repeat): result = func()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--poids', type=float, default=77.0, help="Poids total cycliste + vélo (kg)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rides = []
+    print(f"{'fichier':<30} {'points':>8} {'segments':>9} {'segments (ms)':>14} {'grille (ms)':>12} {'CdA':>6} {'Crr':>7}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        df, _, _, _, error_msg = read_ride(raw_bytes)
+        if df is None: print(f"{os.path.basename(path):<30} {error_msg}"); continue
+        rides.append((os.path.basename(path), df))
+        (segments, _, error), segments_ms = timed(lambda: ride_segments(df, args.poids), args.repeat)
+        if error: print(f"{os.path.basename(path):<30} {len(df):>8} {error}"); continue
+        (crr, cda, _), fit_ms = timed(lambda: fit_segments(segments), args.repeat)
+        print(f"{os.path.basename(path):<30} {len(df):>8} {len(segments[0]):>9} {segments_ms:>14.1f} {fit_ms:>12.1f} {cda:>6.3f} {crr:>7.4f}")
+
+    (_, pooled), batch_ms = timed(lambda: fit_cda_crr_batch(rides, args.poids), args.repeat)
+    if pooled: print(f"Lot de {len(rides)} sorties : {batch_ms:.0f} ms, commun CdA {pooled['cda']:.3f} Crr {pooled['crr']:.4f} ({pooled['nb_segments']} segments)")
+
+
+if __name__ == '__main__':
+    main()
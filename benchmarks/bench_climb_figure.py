@@ -0,0 +1,56 @@
+# benchmarks/bench_climb_figure.py
+"""
+Microbenchmark de create_climb_figure selon la longueur de la montée, sur des
+montées synthétiques régulières (1 point par seconde à ~15 km/h, pente variable).
+
+    python benchmarks/bench_climb_figure.py [--longueurs 1 5 10 20] [--chunk 100] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plotting import create_climb_figure  # noqa: E402
+
+
+def synthetic_climb(length_km, seed=0):
+    """Montée de length_km : DataFrame horodaté avec les colonnes lues par create_climb_figure."""
+    rng = np.random.default_rng(seed)
+    speed = np.clip(4.2 + rng.normal(0, 0.3, int(length_km * 1000 / 4.2)), 1, None)
+    distance = np.cumsum(speed)
+    pente = 7 + 3 * np.sin(distance / 700) + rng.normal(0, 0.5, len(speed))
+    altitude = 500 + np.cumsum(speed * pente / 100)
+    index = pd.date_range('2024-05-01 08:00', periods=len(speed), freq='s')
+    return pd.DataFrame({'distance': distance, 'altitude': altitude, 'speed': speed, 'pente': pente,
+                         'heart_rate': rng.integers(140, 180, len(speed)).astype(float),
+                         'cadence': rng.integers(60, 90, len(speed)).astype(float),
+                         'estimated_power': 250 + rng.normal(0, 30, len(speed))}, index=index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--longueurs', nargs='+', type=float, default=[1, 5, 10, 20], help="Longueurs de montée (km)")
+    parser.add_argument('--chunk', type=float, default=100, help="Fenêtre des tronçons (m)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    infos = [{'Début (km)': '0.0', 'Distance (m)': '0', 'Dénivelé (m)': '0', 'Pente (%)': '0'}]
+    print(f"{'longueur (km)':>13} {'points':>8} {'tronçons':>9} {'traces':>7} {'étiquettes':>11} {'figure (ms)':>12}")
+    for length_km in args.longueurs:
+        df_climb = synthetic_climb(length_km)
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fig = create_climb_figure(df_climb.copy(), 'altitude', args.chunk, infos, 0)
+            times.append(time.perf_counter() - start)
+        n_chunks = int(df_climb['distance'].iloc[-1] - df_climb['distance'].iloc[0]) // int(args.chunk) + 1
+        print(f"{length_km:>13g} {len(df_climb):>8} {n_chunks:>9} {len(fig.data):>7} {len(fig.layout.annotations):>11} {min(times) * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
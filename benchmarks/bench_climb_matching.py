@@ -0,0 +1,71 @@
+# benchmarks/bench_climb_matching.py
+"""
+Reconnaissance des montées : recherche par cases de climb_matching.py contre
+une comparaison avec toutes les montées du catalogue. Le catalogue est
+synthétique : les montées de chaque sortie, déplacées au hasard dans un carré
+de 1° (autres routes), et une sur --repetitions laissée en place avec un bruit
+GPS de quelques mètres (passages répétés, qui doivent être retrouvés).
+
+    python benchmarks/bench_climb_matching.py sortie1.fit [sortie2.fit ...] --efforts 30000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_ride  # noqa: E402
+from pipeline import AnalysisPipeline, DEFAULT_PARAMS  # noqa: E402
+from climb_matching import ClimbCatalogue, climb_traces, trace_distance, MATCH_TOLERANCE_M  # noqa: E402
+
+
+def synthetic_catalogue(traces, lengths, efforts, repetitions, seed=0):
+    """Tracés, longueurs et efforts du catalogue synthétique (voir l'en-tête)."""
+    rng = np.random.default_rng(seed)
+    pick = rng.integers(0, len(traces), efforts)
+    shift = rng.uniform(-0.5, 0.5, (efforts, 1, 2))
+    shift[::repetitions] = rng.normal(0, 3e-5, (len(shift[::repetitions]), 1, 2)) # ~3 m
+    frame = pd.DataFrame({'cle': [f"synthetique-{i // 10}" for i in range(efforts)], 'n': np.arange(efforts) % 10 + 1,
+                          'debut': pd.Timestamp('2024-01-01'), 'duree_s': np.nan, 'vitesse_kmh': np.nan, 'power_moy': np.nan})
+    return traces[pick] + shift, lengths[pick], frame
+
+
+def brute_force(catalogue_traces, traces, chunk=2000):
+    """Avant : chaque montée comparée à tout le catalogue (par paquets, pour la mémoire)."""
+    return sum(int((trace_distance(trace, catalogue_traces[i:i + chunk]) <= MATCH_TOLERANCE_M).sum())
+               for trace in traces for i in range(0, len(catalogue_traces), chunk))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--efforts', type=int, default=30000, help="Taille du catalogue")
+    parser.add_argument('--repetitions', type=int, default=50, help="Une montée du catalogue sur N est un passage répété")
+    args = parser.parse_args()
+
+    print(f"{'fichier':<30} {'montées':>8} {'catalogue':>10} {'index (ms)':>11} {'recherche (ms)':>15} {'tout comparer (ms)':>19} {'trouvées':>9}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        df, _, _, _, error_msg = read_ride(raw_bytes)
+        if df is None: print(f"{os.path.basename(path):<30} {error_msg}"); continue
+        results = AnalysisPipeline().run(path, df, DEFAULT_PARAMS, targets=('analysed', 'climbs'))
+        traces, lengths = climb_traces(results['analysed'], results['climbs'])
+        keep = ~np.isnan(lengths); traces, lengths = traces[keep], lengths[keep]
+        if len(traces) == 0: print(f"{os.path.basename(path):<30} pas de montée avec GPS"); continue
+
+        catalogue_traces, catalogue_lengths, efforts = synthetic_catalogue(traces, lengths, args.efforts, args.repetitions)
+        catalogue = ClimbCatalogue()
+        start = time.perf_counter()
+        catalogue.add(catalogue_traces, catalogue_lengths, efforts); catalogue.match(traces[:0], lengths[:0]) # Construction de l'index
+        index_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter(); matches = catalogue.match(traces, lengths); match_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter(); brute_force(catalogue_traces, traces); brute_ms = (time.perf_counter() - start) * 1000
+        print(f"{os.path.basename(path):<30} {len(traces):>8} {len(catalogue):>10} {index_ms:>11.0f} {match_ms:>15.1f} {brute_ms:>19.0f} {len(matches):>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_fit_decoder.py
+"""
+Compare la lecture des 'record' : boucle fitparse (un dict par ligne) contre
+le décodeur colonnaire de fit_decoder. La dernière colonne donne le temps de la
+passe unique record + session + lap + event (read_fit_messages).
+
+    python benchmarks/bench_fit_decoder.py sortie1.fit [sortie2.fit ...] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_records_fitparse  # noqa: E402
+from fit_decoder import read_record_frame, read_fit_messages, FitDecodeUnsupported  # noqa: E402
+
+
+def best_time(func, data, repeat):
+    best = float('inf'); result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'fichier':<30} {'records':>8} {'fitparse (s)':>13} {'colonnaire (s)':>15} {'gain':>7} {'passe unique (s)':>17}  identique")
+    for path in args.files:
+        with open(path, 'rb') as f: data = f.read()
+        t_ref, df_ref = best_time(read_records_fitparse, data, args.repeat)
+        try:
+            t_new, df_new = best_time(read_record_frame, data, args.repeat)
+            t_all, _ = best_time(read_fit_messages, data, args.repeat)
+        except FitDecodeUnsupported as e:
+            print(f"{os.path.basename(path):<30} {len(df_ref):>8} {t_ref:>13.3f} {'repli fitparse':>15}  ({e})")
+            continue
+
+        if 'timestamp' in df_ref.columns:
+            df_ref['timestamp'] = pd.to_datetime(df_ref['timestamp']).astype('datetime64[ns]')
+        try:
+            pd.testing.assert_frame_equal(df_ref, df_new, check_like=True); same = "oui"
+        except AssertionError as e:
+            same = f"NON : {str(e).splitlines()[0]}"
+        print(f"{os.path.basename(path):<30} {len(df_new):>8} {t_ref:>13.3f} {t_new:>15.4f} {t_ref / t_new:>6.0f}x {t_all:>17.4f}  {same}")
+
+
+if __name__ == '__main__':
+    main()
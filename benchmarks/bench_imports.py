@@ -0,0 +1,72 @@
+# benchmarks/bench_imports.py
+"""
+Coût d'import des modules de calcul et démarrage des processus du pool.
+Chaque mesure se fait dans un interpréteur neuf ; le pool utilise le mode
+'spawn' (celui de macOS et Windows), où chaque processus réimporte tout.
+
+    python benchmarks/bench_imports.py [--repeat 5] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CORE_MODULES = ['data_loader', 'power_estimator', 'climb_processing', 'sprint_detector', 'summary_processor']
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {modules}
+print(time.perf_counter() - start, 'streamlit' in sys.modules)
+"""
+
+
+def import_time(modules):
+    """(secondes, streamlit importé ?) pour importer modules dans un interpréteur neuf."""
+    out = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT.format(modules=', '.join(modules))],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), out[1] == 'True'
+
+
+def _import_worker_modules():
+    import batch_analysis  # noqa: F401  (ce qu'importe un processus de batch_analysis)
+
+
+def _busy(_):
+    time.sleep(0.05)  # Occupe le processus : chaque tâche part sur un processus différent
+    return os.getpid()
+
+
+def pool_startup(workers):
+    """Temps jusqu'à ce que chaque processus du pool ait importé batch_analysis et répondu."""
+    context = multiprocessing.get_context('spawn')
+    start = time.perf_counter()
+    with context.Pool(workers, initializer=_import_worker_modules) as pool:
+        pool.map(_busy, range(workers), chunksize=1)
+    return time.perf_counter() - start - 0.05
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    for label, modules in [('modules de calcul', CORE_MODULES), ('streamlit seul', ['streamlit'])]:
+        times = []
+        for _ in range(args.repeat):
+            seconds, has_streamlit = import_time(modules)
+            times.append(seconds)
+        print(f"import {label:<20} {min(times) * 1000:>8.0f} ms  (streamlit chargé : {'oui' if has_streamlit else 'non'})")
+
+    best = min(pool_startup(args.workers) for _ in range(args.repeat))
+    print(f"démarrage pool spawn ({args.workers} processus) {best * 1000:>8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_power.py
+"""
+Estimation de puissance : un appel (estimate_power) et un balayage de
+réglages (masse x Crr x CdA), en un calcul (estimate_power_batch) ou en
+un appel par combinaison.
+
+    python benchmarks/bench_power.py sortie1.fit [sortie2.fit ...] [--grille 9 7 9] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_ride  # noqa: E402
+from power_estimator import estimate_power, estimate_power_batch  # noqa: E402
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter(); func(); times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--grille', nargs=3, type=int, default=[9, 7, 9], metavar=('MASSES', 'CRR', 'CDA'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    masses = np.linspace(60, 100, args.grille[0]); crrs = np.linspace(0.003, 0.006, args.grille[1]); cdas = np.linspace(0.25, 0.45, args.grille[2])
+    n_combos = len(masses) * len(crrs) * len(cdas)
+    print(f"{'fichier':<30} {'points':>8} {'1 appel (ms)':>13} {f'{n_combos} appels (ms)':>18} {'batch (ms)':>11}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        df, _, _, _, error_msg = read_ride(raw_bytes)
+        if df is None: print(f"{os.path.basename(path):<30} {error_msg}"); continue
+
+        single = best_time(lambda: estimate_power(df, 77.0, 0.0043, 0.38), args.repeat)
+        loop = best_time(lambda: [estimate_power(df, m, c, d) for m in masses for c in crrs for d in cdas], 1)
+        batch = best_time(lambda: estimate_power_batch(df, masses[:, None, None], crrs[None, :, None], cdas[None, None, :]), args.repeat)
+        print(f"{os.path.basename(path):<30} {len(df):>8} {single * 1000:>13.1f} {loop * 1000:>18.0f} {batch * 1000:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_power_curves.py
+"""
+Courbes puissance-durée : sommes cumulées sur la grille de durées de
+power_curves.py contre une moyenne glissante pandas par durée (sur la même
+grille, et estimée pour toutes les durées de 1 s à la durée de la sortie).
+Sur un enregistrement irrégulier, les valeurs diffèrent : la moyenne glissante
+pandas moyenne les points, power_curves pondère par le temps.
+
+    python benchmarks/bench_power_curves.py sortie1.fit [sortie2.fit ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_ride  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from power_curves import mean_max_curves  # noqa: E402
+
+
+def rolling_curve(df, durations):
+    """Avant : une moyenne glissante temporelle par durée (puissance seule)."""
+    power = df['estimated_power'].fillna(0)
+    return np.array([power.rolling(f"{d}s").mean().max() for d in durations])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    print(f"{'fichier':<30} {'points':>8} {'durées':>7} {'cumuls (ms)':>12} {'glissant (ms)':>14} {'toutes durées, glissant (s)':>28}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        df, _, _, _, error_msg = read_ride(raw_bytes)
+        if df is None: print(f"{os.path.basename(path):<30} {error_msg}"); continue
+        df = AnalysisPipeline().run(path, df, {}, targets=('analysed',))['analysed']
+
+        start = time.perf_counter(); curves = mean_max_curves(df); fast_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter(); rolling_curve(df, curves.index); rolling_ms = (time.perf_counter() - start) * 1000
+        # Une moyenne glissante pour chacune des durées de 1 s à la fin de la sortie
+        all_durations_s = rolling_ms / len(curves) * curves.index[-1] / 1000
+        print(f"{os.path.basename(path):<30} {len(df):>8} {len(curves):>7} {fast_ms:>12.1f} {rolling_ms:>14.0f} {all_durations_s:>28.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# benchmarks/bench_profile.py
+"""
+Construction du profil complet (create_full_ride_profile) : durée, nombre de
+traces et taille du JSON envoyé au navigateur, par fichier.
+
+    python benchmarks/bench_profile.py sortie1.fit [sortie2.fit ...] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_ride  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from profile_plotter import create_full_ride_profile  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'fichier':<30} {'points':>8} {'traces':>7} {'figure (ms)':>12} {'JSON (ms)':>10} {'JSON (Ko)':>10}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        df, _, _, _, error_msg = read_ride(raw_bytes)
+        if df is None: print(f"{os.path.basename(path):<30} {error_msg}"); continue
+        df = AnalysisPipeline().run(path, df, {}, targets=('analysed',))['analysed']
+
+        build, dump = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter(); fig = create_full_ride_profile(df); build.append(time.perf_counter() - start)
+            start = time.perf_counter(); payload = fig.to_json(); dump.append(time.perf_counter() - start)
+        print(f"{os.path.basename(path):<30} {len(df):>8} {len(fig.data):>7} {min(build) * 1000:>12.1f} "
+              f"{min(dump) * 1000:>10.1f} {len(payload) / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_record_schema.py
+"""
+Empreinte mémoire des 'record' nettoyés, avant et après le schéma compact
+(compact_record_frame), avec le détail des types retenus.
+
+    python benchmarks/bench_record_schema.py sortie1.fit [sortie2.fit ...] [--detail]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import FIT_MESSAGES, RECORD_BLOCK_SIZE, compact_record_frame, ingest_record_blocks, read_messages_fitparse  # noqa: E402
+from fit_decoder import read_fit_messages, FitDecodeUnsupported  # noqa: E402
+
+
+def cleaned_records(raw_bytes):
+    """'record' nettoyés comme dans parse_ride, sans le schéma compact."""
+    try:
+        messages = read_fit_messages(raw_bytes, FIT_MESSAGES, RECORD_BLOCK_SIZE)
+        return ingest_record_blocks(messages['record'])[0]
+    except FitDecodeUnsupported:
+        messages = read_messages_fitparse(raw_bytes, FIT_MESSAGES, RECORD_BLOCK_SIZE)
+        return ingest_record_blocks(messages['record'])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--detail', action='store_true', help="Affiche les types colonne par colonne")
+    args = parser.parse_args()
+
+    print(f"{'fichier':<30} {'records':>8} {'avant (Mo)':>11} {'après (Mo)':>11} {'gain':>6}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        before = cleaned_records(raw_bytes)
+        mem_before = before.memory_usage(deep=True).sum()
+        after = compact_record_frame(before.copy())
+        mem_after = after.memory_usage(deep=True).sum()
+        print(f"{os.path.basename(path):<30} {len(after):>8} {mem_before / 1e6:>11.2f} {mem_after / 1e6:>11.2f} {mem_before / mem_after:>5.1f}x")
+        if args.detail:
+            for col in before.columns:
+                dtype_after = after[col].dtype if col in after.columns else 'supprimée'
+                print(f"    {col:<28} {str(before[col].dtype):>10} -> {dtype_after}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_replay.py
+"""
+Coût d'une image de la relecture 3D (curseur, carte pydeck, profil 2D),
+sérialisation JSON comprise (ce que Streamlit envoie au navigateur) :
+reconstruction complète à chaque image contre couches et profil en cache.
+
+    python benchmarks/bench_replay.py sortie1.fit [sortie2.fit ...] [--ticks 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_ride  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from map_3d_engine import build_distance_index, nearest_position, build_static_layers, create_replay_deck  # noqa: E402
+from profile_plotter import create_full_ride_profile, set_distance_marker  # noqa: E402
+
+TOKEN = 'bench'
+
+
+def full_tick(df, climbs, sprints, selected_distance):
+    """Image d'avant : idxmin sur toute la colonne, segments, couches et profil reconstruits."""
+    point = df.loc[(df['distance'] - selected_distance).abs().idxmin()]
+    climb_segments = [df.iloc[s:e] for s, e in zip(climbs['start'], climbs['end'])]
+    sprint_segments = [df.iloc[s:e] for s, e in zip(sprints['start'], sprints['end'])]
+    deck = create_replay_deck(build_static_layers(df, climb_segments, sprint_segments, TOKEN), TOKEN, point)
+    fig = create_full_ride_profile(df, selected_distance=selected_distance)
+    return deck.to_json(), fig.to_json()
+
+
+def cached_tick(df, scene, selected_distance):
+    """Image avec la scène en cache : recherche binaire, point cycliste, caméra et ligne verticale."""
+    position = nearest_position(scene['cursor'], selected_distance)
+    deck = create_replay_deck(scene['layers'], TOKEN, df.iloc[position])
+    fig = set_distance_marker(scene['profile'], selected_distance)
+    return deck.to_json(), fig.to_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--ticks', type=int, default=50, help="Images simulées par mesure")
+    args = parser.parse_args()
+
+    print(f"{'fichier':<30} {'points':>8} {'scène (ms)':>11} {'image avant (ms)':>17} {'image cache (ms)':>17} {'gain':>6}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        df, _, _, _, error_msg = read_ride(raw_bytes)
+        if df is None: print(f"{os.path.basename(path):<30} {error_msg}"); continue
+        results = AnalysisPipeline().run(path, df, {}, targets=('analysed', 'climbs', 'sprints'))
+        df, climbs, sprints = results['analysed'], results['climbs'], results['sprints']
+        distances = np.linspace(0, df['distance'].max(), args.ticks)
+
+        start = time.perf_counter()
+        scene = {'cursor': build_distance_index(df), 'profile': create_full_ride_profile(df),
+                 'layers': build_static_layers(df, [df.iloc[s:e] for s, e in zip(climbs['start'], climbs['end'])],
+                                               [df.iloc[s:e] for s, e in zip(sprints['start'], sprints['end'])], TOKEN)}
+        scene_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for d in distances: full_tick(df, climbs, sprints, d)
+        full_ms = (time.perf_counter() - start) * 1000 / args.ticks
+        start = time.perf_counter()
+        for d in distances: cached_tick(df, scene, d)
+        cached_ms = (time.perf_counter() - start) * 1000 / args.ticks
+        print(f"{os.path.basename(path):<30} {len(df):>8} {scene_ms:>11.0f} {full_ms:>17.1f} {cached_ms:>17.1f} {full_ms / cached_ms:>5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_rolling_stats.py
+"""
+Moteur de sommes préfixes (rolling_stats.py) contre pandas/NumPy par requête :
+lissage de l'altitude (20 s), puissance normalisée et meilleures 5/20/60 min,
+et moyennes de nombreux segments (bornes aléatoires, comme des montées ou des sprints).
+
+    python benchmarks/bench_rolling_stats.py sortie1.fit [sortie2.fit ...] [--segments 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import read_ride  # noqa: E402
+from pipeline import AnalysisPipeline  # noqa: E402
+from climb_processing import as_float  # noqa: E402
+from rolling_stats import PrefixStats, time_windows  # noqa: E402
+from summary_processor import power_summary  # noqa: E402
+
+
+def pandas_power_summary(df):
+    """Avant : une moyenne glissante pandas par métrique."""
+    power = df['estimated_power']
+    summary = {'power_np_est': (power.rolling('30s').mean() ** 4).mean() ** 0.25}
+    for minutes in (5, 20, 60): summary[f'power_{minutes}min_est'] = power.rolling(f'{minutes * 60}s').mean().max()
+    return summary
+
+
+def timed(func):
+    start = time.perf_counter(); result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--segments', type=int, default=10000, help="Segments aléatoires pour les moyennes par segment")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'fichier':<24} {'points':>8} {'altitude pandas/préfixes (ms)':>30} {'puissance pandas/préfixes (ms)':>31} {'segments NumPy/préfixes (ms)':>29}")
+    for path in args.files:
+        with open(path, 'rb') as f: raw_bytes = f.read()
+        df, _, _, _, error_msg = read_ride(raw_bytes)
+        if df is None: print(f"{os.path.basename(path):<24} {error_msg}"); continue
+        df = AnalysisPipeline().run(path, df, {}, targets=('analysed',))['analysed']
+        seconds = np.asarray((df.index - df.index[0]) / pd.Timedelta(seconds=1)); altitude = as_float(df['altitude'])
+
+        _, alt_pandas = timed(lambda: df['altitude'].rolling('20s').mean())
+        _, alt_prefix = timed(lambda: PrefixStats(altitude).mean(*time_windows(seconds, 20)))
+        _, power_pandas = timed(lambda: pandas_power_summary(df))
+        _, power_prefix = timed(lambda: power_summary(df))
+
+        bounds = np.sort(rng.integers(0, len(df), size=(args.segments, 2)), axis=1); bounds[:, 1] += 1
+        speed = as_float(df['speed'])
+        _, seg_numpy = timed(lambda: [np.nanmean(speed[s:e]) for s, e in bounds])
+        _, seg_prefix = timed(lambda: PrefixStats(speed).mean(bounds[:, 0], bounds[:, 1]))
+        print(f"{os.path.basename(path):<24} {len(df):>8} {alt_pandas:>14.1f} / {alt_prefix:<13.1f} {power_pandas:>15.1f} / {power_prefix:<13.1f} {seg_numpy:>14.1f} / {seg_prefix:<12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/bench_stages.py
+"""
+Temps et pic mémoire de chaque étape de l'application, sur des sorties
+synthétiques (synthetic_ride.py) de 1 h, 6 h et 24 h par défaut : lecture du
+.fit, puissance estimée, dérivées, chaîne des montées, sprints, profil 2D,
+carte, profils des montées et carte 3D. Chaque étape est mesurée deux fois :
+une pour le temps, une sous tracemalloc pour le pic mémoire (allocations
+Python et NumPy). Le cache disque des sorties est désactivé.
+
+Le rapport JSON (--rapport) donne, par taille, une ligne par étape : durée,
+pic mémoire, lignes en entrée et en sortie, erreur éventuelle.
+
+    python benchmarks/bench_stages.py [--heures 1 6 24] [--intervalle 1] [--rapport bench_stages.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ['ANALYSE_FIT_CACHE_MAX_MB'] = '0' # Mesurer le décodage, pas le cache disque
+
+import numpy as np
+import pandas as pd
+import plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_ride import synthetic_ride, write_fit  # noqa: E402
+from data_loader import load_and_clean_data  # noqa: E402
+from pipeline import DEFAULT_PARAMS  # noqa: E402
+from power_estimator import estimate_power  # noqa: E402
+from climb_processing import calculate_derivatives, identify_and_filter_initial_climbs, merge_climb_ranges, climb_segment_index, format_climbs  # noqa: E402
+from sprint_detector import detect_sprints, sprint_segment_index  # noqa: E402
+from profile_plotter import create_full_ride_profile  # noqa: E402
+from map_plotter import create_map_figure  # noqa: E402
+from plotting import create_climb_figure  # noqa: E402
+from map_3d_engine import build_static_layers, create_replay_deck  # noqa: E402
+
+TOKEN = 'bench'
+CHUNK_DISTANCE_M = 100 # Fenêtre des profils de montée par défaut de l'application
+
+
+def climb_chain(df_analyzed, params):
+    """Montées : blocs de pente, fusion, index (étapes climb_blocks, climb_ranges, climbs du pipeline)."""
+    blocks = identify_and_filter_initial_climbs(df_analyzed, params['min_pente'])
+    return climb_segment_index(blocks, *merge_climb_ranges(blocks, params['max_gap_climb']), params['min_climb_distance'])
+
+
+def climb_figures(df_analyzed, climbs):
+    """Profils de toutes les montées, comme l'onglet Montées."""
+    results = format_climbs(climbs); alt_col = 'altitude_lisse' if 'altitude_lisse' in df_analyzed.columns else 'altitude'
+    return [create_climb_figure(df_analyzed.iloc[start:end].copy(), alt_col, CHUNK_DISTANCE_M, results, i)
+            for i, (start, end) in enumerate(zip(climbs['start'], climbs['end']))]
+
+
+def pydeck_chart(df_analyzed, climbs, sprints):
+    """create_pydeck_chart sans st.secrets : couches statiques puis deck (jeton factice)."""
+    climb_segments = [df_analyzed.iloc[s:e] for s, e in zip(climbs['start'], climbs['end'])]
+    sprint_segments = [df_analyzed.iloc[s:e] for s, e in zip(sprints['start'], sprints['end'])]
+    return create_replay_deck(build_static_layers(df_analyzed, climb_segments, sprint_segments, TOKEN), TOKEN)
+
+
+def measure(func, *args, memory=True):
+    """(résultat, durée en s, pic mémoire en Mo ou None, erreur) : un appel chronométré, puis un sous tracemalloc."""
+    try:
+        start = time.perf_counter(); result = func(*args); duration = time.perf_counter() - start
+    except Exception as e:
+        return None, None, None, f"{type(e).__name__} : {e}"
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try: func(*args); peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally: tracemalloc.stop()
+    return result, duration, peak, None
+
+
+def _rows(value):
+    """Lignes d'un résultat d'étape (DataFrame, liste, tuple dont le premier élément est le DataFrame), ou None."""
+    if isinstance(value, tuple) and value: value = value[0]
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series, list)) else None
+
+
+def bench_size(hours, interval_s, seed, memory=True):
+    """Mesure toutes les étapes sur une sortie de hours heures : dict du rapport pour cette taille."""
+    ride = synthetic_ride(hours, interval_s, seed); raw_bytes = write_fit(ride)
+    params = DEFAULT_PARAMS
+    report = {'heures': hours, 'intervalle_s': interval_s, 'points': len(ride), 'octets_fit': len(raw_bytes),
+              'distance_km': round(float(ride['distance'].iloc[-1]) / 1000, 1), 'etapes': []}
+
+    def stage(name, func, *args, rows_in=None):
+        result, duration, peak, error = measure(func, *args, memory=memory)
+        report['etapes'].append({'etape': name, 'duree_s': duration, 'pic_memoire_mo': peak,
+                                 'lignes_entree': rows_in, 'lignes_sortie': _rows(result), 'erreur': error})
+        return result
+
+    loaded = stage('load_and_clean_data', lambda: load_and_clean_data(io.BytesIO(raw_bytes)), rows_in=len(ride))
+    if loaded is None or loaded[0] is None: return report
+    df = loaded[0]; n = len(df)
+    power = stage('estimate_power', estimate_power, df, params['total_weight_kg'], params['crr'], params['cda'], rows_in=n)
+    derivatives = stage('calculate_derivatives', calculate_derivatives, df, rows_in=n)
+    if power is None or derivatives is None: return report
+    df_analyzed = derivatives.join(power[['estimated_power']]) # Comme l'étape 'analysed' du pipeline
+    sprint_params = [params[p] for p in ('min_speed_kmh', 'min_gradient', 'max_gradient', 'min_duration_sec', 'max_gap_distance_m', 'rewind_sec')]
+    climbs = stage('climb_chain', climb_chain, df_analyzed, params, rows_in=n)
+    stage('detect_sprints', detect_sprints, df_analyzed, *sprint_params, rows_in=n)
+    stage('create_full_ride_profile', create_full_ride_profile, df_analyzed, rows_in=n)
+    stage('create_map_figure', create_map_figure, df_analyzed, rows_in=n)
+    if climbs is None: return report
+    stage('create_climb_figure', climb_figures, df_analyzed, climbs, rows_in=int((climbs['end'] - climbs['start']).sum()))
+    stage('create_pydeck_chart', pydeck_chart, df_analyzed, climbs, sprint_segment_index(df_analyzed, *sprint_params), rows_in=n)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--heures', nargs='+', type=float, default=[1, 6, 24], help="Durées des sorties (h)")
+    parser.add_argument('--intervalle', type=int, default=1, help="Secondes entre deux points")
+    parser.add_argument('--graine', type=int, default=0)
+    parser.add_argument('--sans-memoire', action='store_true', help="Temps seulement (pas de seconde passe sous tracemalloc)")
+    parser.add_argument('--rapport', default='bench_stages.json', help="Rapport JSON")
+    args = parser.parse_args()
+
+    sizes = []
+    for hours in args.heures:
+        report = bench_size(hours, args.intervalle, args.graine, memory=not args.sans_memoire); sizes.append(report)
+        print(f"\n{hours:g} h : {report['points']} points, {report['distance_km']} km, {report['octets_fit'] / 2 ** 20:.1f} Mo de .fit")
+        print(f"{'étape':<26} {'durée (ms)':>11} {'pic mémoire (Mo)':>17} {'lignes':>8}")
+        for row in report['etapes']:
+            if row['erreur']: print(f"{row['etape']:<26} erreur : {row['erreur']}"); continue
+            peak = f"{row['pic_memoire_mo']:.1f}" if row['pic_memoire_mo'] is not None else '-'
+            print(f"{row['etape']:<26} {row['duree_s'] * 1000:>11.1f} {peak:>17} {row['lignes_sortie'] if row['lignes_sortie'] is not None else '-':>8}")
+
+    environment = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                   'plotly': plotly.__version__, 'machine': platform.machine(), 'processeurs': os.cpu_count()}
+    with open(args.rapport, 'w', encoding='utf-8') as f:
+        json.dump({'date': pd.Timestamp.now().isoformat(timespec='seconds'), 'environnement': environment, 'tailles': sizes}, f, ensure_ascii=False, indent=2)
+    print(f"\nRapport : {args.rapport}")
+
+
+if __name__ == '__main__':
+    main()
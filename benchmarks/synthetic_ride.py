@@ -0,0 +1,202 @@
+# benchmarks/synthetic_ride.py
+"""
+Sorties synthétiques de taille contrôlée, pour les benchmarks : parcours avec
+montées et descentes, sprints sur le plat, pauses (trous d'horodatage),
+GPS avec coupures (tunnels), fréquence cardiaque avec décrochages, cadence
+(nulle en roue libre) et température. La sortie est un DataFrame au format de
+data_loader.parse_ride (index timestamp, GPS en degrés) ou un .fit valide
+(en-tête, file_id, record, lap, session et CRC), relu par data_loader.
+
+Le FIT horodate les 'record' à la seconde : l'échantillonnage se règle par
+l'intervalle entre deux points (1 s, ou plus comme l'enregistrement
+"intelligent" des compteurs).
+
+    python benchmarks/synthetic_ride.py sortie_6h.fit --heures 6 [--intervalle 1] [--graine 0]
+"""
+import argparse
+import struct
+
+import numpy as np
+import pandas as pd
+
+ROUTE_STEP_M = 10 # Pas du parcours (altitude, cap, vitesse)
+FIT_EPOCH = pd.Timestamp('1989-12-31')
+SEMICIRCLES = 2 ** 31 / 180
+
+# Champs du message 'record' : (numéro, nom, dtype, base type FIT, échelle, décalage)
+RECORD_FIELDS = [
+    (253, 'timestamp', '<u4', 0x86, 1, 0),
+    (0, 'position_lat', '<i4', 0x85, SEMICIRCLES, 0),
+    (1, 'position_long', '<i4', 0x85, SEMICIRCLES, 0),
+    (2, 'altitude', '<u2', 0x84, 5, 500),
+    (3, 'heart_rate', 'u1', 0x02, 1, 0),
+    (4, 'cadence', 'u1', 0x02, 1, 0),
+    (5, 'distance', '<u4', 0x86, 100, 0),
+    (6, 'speed', '<u2', 0x84, 1000, 0),
+    (13, 'temperature', 'i1', 0x01, 1, 0),
+]
+INVALID = {'<u4': 0xFFFFFFFF, '<i4': 0x7FFFFFFF, '<u2': 0xFFFF, 'u1': 0xFF, 'i1': 0x7F}
+# Numéros des champs de résumé : ils diffèrent entre les messages 'lap' et 'session'
+LAP_FIELDS = {'avg_speed': 13, 'max_speed': 14, 'avg_heart_rate': 15, 'max_heart_rate': 16, 'avg_cadence': 17, 'max_cadence': 18, 'total_ascent': 21}
+SESSION_FIELDS = {'avg_speed': 14, 'max_speed': 15, 'avg_heart_rate': 16, 'max_heart_rate': 17, 'avg_cadence': 18, 'max_cadence': 19, 'total_ascent': 22}
+
+
+def _spans(rng, n, count, min_len, max_len):
+    """Masque de count plages aléatoires de min_len à max_len points parmi n."""
+    mask = np.zeros(n, dtype=bool)
+    for start, length in zip(rng.integers(0, max(n, 1), count), rng.integers(min_len, max_len + 1, count)):
+        mask[start:start + length] = True
+    return mask
+
+
+def _route(rng, length_m):
+    """Parcours au pas de ROUTE_STEP_M : (altitude, pente %, cap en radians), montées de 1 à 8 km tous les 10 à 25 km."""
+    n = int(length_m // ROUTE_STEP_M) + 2
+    pente = np.convolve(rng.normal(0, 1.5, n), np.ones(50) / 50 ** 0.5, mode='same') * 0.4 # Faux plats
+    position = 0
+    while position < n:
+        position += int(rng.uniform(10_000, 25_000) / ROUTE_STEP_M)
+        climb = int(rng.uniform(1_000, 8_000) / ROUTE_STEP_M); descent = int(climb * rng.uniform(0.6, 1.2))
+        grade = rng.uniform(4, 9)
+        pente[position:position + climb] += grade + rng.normal(0, 1, len(pente[position:position + climb]))
+        pente[position + climb:position + climb + descent] -= grade * climb / descent
+        position += climb + descent
+    altitude = 200 + np.cumsum(pente * ROUTE_STEP_M / 100)
+    cap = np.cumsum(rng.normal(0, 0.02, n)) + np.cumsum(rng.normal(0, 0.002, n))
+    return altitude - min(altitude.min() - 50, 0), pente, cap
+
+
+def synthetic_ride(hours=1.0, interval_s=1, seed=0, start='2024-06-01 08:00:00'):
+    """
+    Sortie de hours heures (pauses comprises), un point toutes les interval_s
+    secondes : DataFrame horodaté (distance, altitude, speed, heart_rate,
+    cadence, temperature, position_lat, position_long) comme parse_ride.
+    """
+    rng = np.random.default_rng(seed)
+    duration = hours * 3600
+    altitude, pente, cap = _route(rng, duration * 18) # Au plus ~65 km/h de moyenne
+
+    # Vitesse selon la pente (m/s), sprints de 8 à 15 s sur le plat, puis temps de parcours de chaque pas
+    speed = np.clip(8.5 - 0.75 * pente - 0.04 * np.minimum(pente, 0) ** 2, 2.5, 19)
+    speed *= np.exp(np.convolve(rng.normal(0, 0.08, len(speed)), np.ones(20) / 20 ** 0.5, mode='same'))
+    flat = np.flatnonzero(np.abs(pente) < 2)
+    for i in rng.choice(flat, size=min(len(flat), max(int(hours * 3), 1)), replace=False):
+        steps = int(rng.uniform(120, 220) / ROUTE_STEP_M)
+        speed[i:i + steps] = np.maximum(speed[i:i + steps], rng.uniform(12.5, 16.5) * np.sin(np.linspace(0.3, np.pi - 0.3, len(speed[i:i + steps]))))
+    moving_time = np.r_[0, np.cumsum(ROUTE_STEP_M / speed[:-1])]
+
+    # Pauses (arrêts, ravitaillements) : trous dans l'horodatage
+    pauses = np.sort(rng.uniform(0, duration, max(int(hours), 1))); pause_lengths = rng.uniform(30, 600, len(pauses))
+    elapsed = np.arange(0, duration, interval_s, dtype=np.float64)
+    paused = np.zeros(len(elapsed), dtype=bool); offset = np.zeros(len(elapsed))
+    for at, length in zip(pauses, pause_lengths):
+        paused |= (elapsed >= at) & (elapsed < at + length); offset += np.clip(elapsed - at, 0, length)
+    elapsed = elapsed[~paused]; moving = elapsed - offset[~paused]
+
+    distance = np.interp(moving, moving_time, np.arange(len(speed)) * ROUTE_STEP_M)
+    n = len(distance)
+    point_speed = np.interp(distance, np.arange(len(speed)) * ROUTE_STEP_M, speed) + rng.normal(0, 0.15, n)
+    point_pente = np.interp(distance, np.arange(len(pente)) * ROUTE_STEP_M, pente)
+    point_cap = np.interp(distance, np.arange(len(cap)) * ROUTE_STEP_M, cap)
+
+    # GPS : intégration du cap (équirectangulaire), coupures de 10 à 60 s
+    step = np.diff(distance, prepend=distance[0])
+    lat = 45.0 + np.cumsum(step * np.cos(point_cap)) / 110540.0
+    lon = 5.5 + np.cumsum(step * np.sin(point_cap)) / (111320.0 * np.cos(np.radians(45.0)))
+    gps_lost = _spans(rng, n, max(int(hours * 2), 1), 10 // interval_s + 1, 60 // interval_s + 1)
+
+    # Effort : cardio en retard sur la pente, décrochages ; cadence nulle en roue libre
+    effort = np.clip(point_pente, -3, 10)
+    heart_rate = 115 + 4.5 * pd.Series(effort).ewm(span=max(60 // interval_s, 2)).mean().to_numpy() + rng.normal(0, 2, n)
+    heart_rate[_spans(rng, n, max(int(hours * 3), 1), 5, 120 // interval_s + 5)] = np.nan
+    cadence = np.where(point_pente < -3.5, 0, 88 - 1.5 * np.clip(point_pente, 0, 10) + rng.normal(0, 4, n))
+    cadence[rng.random(n) < 0.002] = np.nan
+    temperature = 16 + 8 * np.sin(np.linspace(0, np.pi, n)) + rng.normal(0, 0.3, n) # Journée
+
+    index = pd.DatetimeIndex(pd.Timestamp(start) + pd.to_timedelta(np.round(elapsed), unit='s'), name='timestamp')
+    return pd.DataFrame({
+        'distance': distance, 'altitude': np.interp(distance, np.arange(len(altitude)) * ROUTE_STEP_M, altitude) + rng.normal(0, 0.2, n),
+        'speed': np.clip(point_speed, 0, None), 'heart_rate': np.clip(heart_rate, 60, 200), 'cadence': np.clip(cadence, 0, 140),
+        'temperature': np.round(temperature), 'position_lat': np.where(gps_lost, np.nan, lat), 'position_long': np.where(gps_lost, np.nan, lon),
+    }, index=index)
+
+
+# --- Écriture FIT ---
+_CRC_TABLE = []
+for _byte in range(256):
+    _crc = _byte
+    for _ in range(8): _crc = (_crc >> 1) ^ 0xA001 if _crc & 1 else _crc >> 1
+    _CRC_TABLE.append(_crc)
+
+
+def fit_crc(data, crc=0):
+    """CRC-16 du format FIT."""
+    for byte in data: crc = (crc >> 8) ^ _CRC_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def _fit_time(timestamps):
+    return ((pd.DatetimeIndex(timestamps) - FIT_EPOCH) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+
+def _definition(local, global_num, fields):
+    """Message de définition (petit boutisme) : fields liste de (numéro, taille, base type)."""
+    return struct.pack('<BBBHB', 0x40 | local, 0, 0, global_num, len(fields)) + b''.join(struct.pack('BBB', *field) for field in fields)
+
+
+def _summary_message(local, global_num, values):
+    """Définition et données d'un message : values liste de (numéro, format struct, base type, valeur)."""
+    fields = [(num, struct.calcsize('<' + fmt), base_type) for num, fmt, base_type, _ in values]
+    data = struct.pack('<B' + ''.join(fmt for _, fmt, _, _ in values), local, *(value for _, _, _, value in values))
+    return _definition(local, global_num, fields) + data
+
+
+def write_fit(df):
+    """Octets d'un .fit d'activité contenant la sortie df (format de synthetic_ride)."""
+    # 'record' : un tableau structuré rempli colonne par colonne, valeurs absentes -> invalides
+    dtype = np.dtype([('header', 'u1')] + [(name, fmt) for _, name, fmt, _, _, _ in RECORD_FIELDS])
+    records = np.zeros(len(df), dtype=dtype)
+    records['timestamp'] = _fit_time(df.index)
+    for _, name, fmt, _, scale, offset in RECORD_FIELDS[1:]:
+        values = df[name].to_numpy(dtype=np.float64) if name in df.columns else np.full(len(df), np.nan)
+        encoded = np.round((values + offset) * scale)
+        records[name] = np.where(np.isnan(encoded), INVALID[fmt], encoded).astype(fmt)
+    record_definition = _definition(0, 20, [(num, np.dtype(fmt).itemsize, base_type) for num, _, fmt, base_type, _, _ in RECORD_FIELDS])
+
+    start, end = _fit_time(df.index[[0, -1]])
+    elapsed = float(end - start); total_distance = float(df['distance'].iloc[-1])
+    ascent = float(np.clip(np.diff(df['altitude'].to_numpy()), 0, None).sum())
+    speed = df['speed'].to_numpy(); heart_rate = df['heart_rate'].dropna(); cadence = df['cadence'].dropna()
+    # Temps et distance : mêmes numéros dans 'lap' et 'session'
+    times = [(253, 'I', 0x86, end), (2, 'I', 0x86, start), (7, 'I', 0x86, int(elapsed * 1000)), (8, 'I', 0x86, int(elapsed * 1000)),
+             (9, 'I', 0x86, int(total_distance * 100))]
+    summary = {'avg_speed': ('H', 0x84, int(total_distance / max(elapsed, 1) * 1000)), 'max_speed': ('H', 0x84, int(speed.max() * 1000)),
+               'avg_heart_rate': ('B', 0x02, int(heart_rate.mean())), 'max_heart_rate': ('B', 0x02, int(heart_rate.max())),
+               'avg_cadence': ('B', 0x02, int(cadence[cadence > 0].mean())), 'max_cadence': ('B', 0x02, int(cadence.max())),
+               'total_ascent': ('H', 0x84, int(ascent))}
+    lap, session = ([*times, *((numbers[name], *value) for name, value in summary.items())] for numbers in (LAP_FIELDS, SESSION_FIELDS))
+    body = b''.join([
+        _summary_message(1, 0, [(0, 'B', 0x00, 4), (1, 'H', 0x84, 255), (2, 'H', 0x84, 0), (4, 'I', 0x86, start)]), # file_id : activité
+        record_definition, records.tobytes(),
+        _summary_message(2, 19, lap), # lap : un seul tour
+        _summary_message(3, 18, [*session, (5, 'B', 0x00, 2)]), # session : cyclisme
+    ])
+    header = struct.pack('<BBHI4s', 14, 0x20, 2132, len(body), b'.FIT')
+    header += struct.pack('<H', fit_crc(header))
+    return header + body + struct.pack('<H', fit_crc(body, fit_crc(header)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help="Fichier .fit à écrire")
+    parser.add_argument('--heures', type=float, default=1.0)
+    parser.add_argument('--intervalle', type=int, default=1, help="Secondes entre deux points")
+    parser.add_argument('--graine', type=int, default=0)
+    args = parser.parse_args()
+    df = synthetic_ride(args.heures, args.intervalle, args.graine)
+    with open(args.output, 'wb') as f: f.write(write_fit(df))
+    print(f"{args.output} : {len(df)} points, {df['distance'].iloc[-1] / 1000:.1f} km, D+ {np.clip(np.diff(df['altitude']), 0, None).sum():.0f} m")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# climb_matching.py
+"""
+Reconnaissance des montées déjà grimpées : chaque montée est réduite à un
+tracé de TRACE_POINTS points (lat/lon, répartis sur sa distance), rangé dans
+un index par cases de CELL_DEG degrés selon son point de départ. Pour une
+nouvelle montée, seules les montées des 9 cases autour de son départ sont
+comparées (écart moyen au plus proche point, dans les deux sens, en mètres),
+au lieu de tout le catalogue.
+"""
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from climb_processing import as_float
+from downsampling import gps_to_metres
+
+TRACE_POINTS = 32
+CELL_DEG = 0.005 # ~550 m en latitude : plus grand que l'écart toléré entre deux départs
+MATCH_TOLERANCE_M = 50 # Écart moyen max. entre deux tracés de la même montée
+LENGTH_TOLERANCE = 0.25 # Écart relatif max. des longueurs
+EFFORT_COLUMNS = ['cle', 'n', 'debut', 'duree_s', 'vitesse_kmh', 'power_moy']
+
+
+def climb_traces(df, climbs):
+    """
+    Tracés (montées, TRACE_POINTS, 2) en degrés (lat, lon) et longueurs (m) des
+    montées de l'index climbs (positions [start, end) dans df). Tracé NaN si
+    la montée n'a pas de GPS.
+    """
+    traces = np.full((len(climbs), TRACE_POINTS, 2), np.nan); lengths = np.full(len(climbs), np.nan)
+    if 'position_lat' not in df.columns or 'position_long' not in df.columns: return traces, lengths
+    lat, lon, distance = as_float(df['position_lat']), as_float(df['position_long']), as_float(df['distance'])
+    for i, (start, end) in enumerate(zip(climbs['start'], climbs['end'])):
+        valid = ~(np.isnan(lat[start:end]) | np.isnan(lon[start:end]) | np.isnan(distance[start:end]))
+        if valid.sum() < 2: continue
+        d = distance[start:end][valid]
+        targets = np.linspace(d[0], d[-1], TRACE_POINTS)
+        traces[i, :, 0] = np.interp(targets, d, lat[start:end][valid]); traces[i, :, 1] = np.interp(targets, d, lon[start:end][valid])
+        lengths[i] = d[-1] - d[0]
+    return traces, lengths
+
+
+def trace_distance(trace, candidates):
+    """
+    Écart (m) entre un tracé et chaque tracé candidat (m, TRACE_POINTS, 2) :
+    moyenne, dans les deux sens, de la distance de chaque point au point le
+    plus proche de l'autre tracé (tolère des départs et arrivées un peu décalés).
+    """
+    x, y = gps_to_metres(np.r_[trace[:, 0], candidates[..., 0].ravel()], np.r_[trace[:, 1], candidates[..., 1].ravel()])
+    query = np.stack([x[:TRACE_POINTS], y[:TRACE_POINTS]], axis=-1)
+    others = np.stack([x[TRACE_POINTS:], y[TRACE_POINTS:]], axis=-1).reshape(candidates.shape)
+    pairwise = np.linalg.norm(query[None, :, None, :] - others[:, None, :, :], axis=-1) # (m, points requête, points candidat)
+    return (pairwise.min(axis=2).mean(axis=1) + pairwise.min(axis=1).mean(axis=1)) / 2
+
+
+def _cell(lat, lon):
+    return int(np.floor(lat / CELL_DEG)), int(np.floor(lon / CELL_DEG))
+
+
+class ClimbCatalogue:
+    """
+    Catalogue des montées enregistrées (tracés, longueurs et informations de
+    l'effort), indexé par case du point de départ. Les ajouts sont groupés ;
+    les tableaux sont reconstruits à la première recherche qui suit.
+    """
+
+    def __init__(self):
+        self._cells = defaultdict(list)
+        self._pending = []
+        self._traces = np.empty((0, TRACE_POINTS, 2)); self._lengths = np.empty(0)
+        self.efforts = pd.DataFrame(columns=EFFORT_COLUMNS)
+
+    @classmethod
+    def from_store(cls, store):
+        """Catalogue de toutes les montées d'une base ride_store.RideStore."""
+        catalogue = cls()
+        efforts, traces, lengths = store.climb_traces()
+        catalogue.add(traces, lengths, efforts)
+        return catalogue
+
+    def __len__(self):
+        return len(self._lengths) + sum(len(lengths) for _, lengths, _ in self._pending)
+
+    def add(self, traces, lengths, efforts):
+        """Ajoute des montées : tracés et longueurs de climb_traces, efforts (une ligne par montée, colonnes EFFORT_COLUMNS)."""
+        keep = ~np.isnan(traces).any(axis=(1, 2))
+        if keep.any(): self._pending.append((traces[keep], lengths[keep], efforts.reset_index(drop=True)[keep]))
+
+    def _flush(self):
+        if not self._pending: return
+        offset = len(self._lengths)
+        traces, lengths, efforts = zip(*self._pending); self._pending = []
+        new_traces = np.concatenate(traces)
+        for i, (lat, lon) in enumerate(new_traces[:, 0, :], start=offset): self._cells[_cell(lat, lon)].append(i)
+        self._traces = np.concatenate([self._traces, new_traces]); self._lengths = np.concatenate([self._lengths, *lengths])
+        self.efforts = pd.concat([self.efforts, *efforts], ignore_index=True) if len(self.efforts) else pd.concat(efforts, ignore_index=True)
+
+    def match(self, traces, lengths):
+        """
+        Montées du catalogue qui correspondent à chaque tracé : une ligne par
+        correspondance (n = numéro de la montée cherchée, à partir de 1, écart_m
+        et informations de l'effort), par écart croissant.
+        """
+        self._flush()
+        found, climb_numbers, gaps_found = [], [], []
+        for n, (trace, length) in enumerate(zip(traces, lengths), start=1):
+            if np.isnan(trace).any(): continue
+            lat_cell, lon_cell = _cell(*trace[0])
+            candidates = [i for dlat in (-1, 0, 1) for dlon in (-1, 0, 1) for i in self._cells.get((lat_cell + dlat, lon_cell + dlon), ())]
+            if not candidates: continue
+            candidates = np.array(candidates, dtype=np.int64)
+            candidates = candidates[np.abs(self._lengths[candidates] / length - 1) <= LENGTH_TOLERANCE]
+            if len(candidates) == 0: continue
+            gaps = trace_distance(trace, self._traces[candidates])
+            close = gaps <= MATCH_TOLERANCE_M
+            found.append(candidates[close]); gaps_found.append(gaps[close]); climb_numbers.append(np.full(close.sum(), n))
+        # Informations des efforts lues une seule fois pour toutes les correspondances
+        found = np.concatenate(found) if found else np.array([], dtype=np.int64)
+        matches = self.efforts.iloc[found].reset_index(drop=True)
+        matches.insert(0, 'ecart_m', np.concatenate(gaps_found) if gaps_found else np.array([]))
+        matches.insert(0, 'montee', np.concatenate(climb_numbers) if climb_numbers else np.array([], dtype=np.int64))
+        return matches.sort_values(['montee', 'ecart_m'], kind='stable').reset_index(drop=True)
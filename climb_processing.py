@@ -1,6 +1,7 @@
 # climb_processing.py
 import pandas as pd
 import numpy as np
+from rolling_stats import PrefixStats, time_windows
 
 # --- Constantes (peuvent être ajustées ou passées en arguments) ---
 FENETRE_LISSAGE_SEC = 20
@@ -19,7 +20,10 @@ def calculate_derivatives(df):
          except Exception:
              raise ValueError("L'index doit être de type DatetimeIndex pour le lissage temporel.")
 
-    df_processed['altitude_lisse'] = df_processed['altitude'].rolling(window=f'{FENETRE_LISSAGE_SEC}s').mean().ffill().bfill()
+    # Moyenne sur ]t - FENETRE_LISSAGE_SEC, t] (comme rolling('20s')), par sommes préfixes
+    seconds = (df_processed.index - df_processed.index[0]) / pd.Timedelta(seconds=1) if len(df_processed) else np.array([])
+    altitude_lisse = PrefixStats(as_float(df_processed['altitude'])).mean(*time_windows(np.asarray(seconds), FENETRE_LISSAGE_SEC))
+    df_processed['altitude_lisse'] = pd.Series(altitude_lisse, index=df_processed.index).ffill().bfill()
     df_processed['delta_distance'] = df_processed['distance'].diff().fillna(0)
     df_processed['delta_altitude'] = df_processed['altitude_lisse'].diff().fillna(0)
     df_processed['pente'] = np.where(df_processed['delta_distance'] == 0, 0, (df_processed['delta_altitude'] / df_processed['delta_distance']) * 100)
@@ -29,56 +33,100 @@ def calculate_derivatives(df):
     
     return df_processed
 
+def run_length_encode(values):
+    """Découpe un tableau en plages de valeurs identiques : (débuts, fins exclusives, valeur de chaque plage)."""
+    values = np.asarray(values)
+    if len(values) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, values
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    return starts, ends, values[starts]
+
+def as_float(series):
+    """Valeurs en float64 (NaN pour les trous, y compris des entiers nullables)."""
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+def run_sums(values, starts):
+    """Somme (NaN ignorés) de values sur chaque plage commençant en starts."""
+    if len(starts) == 0: return np.array([], dtype=np.float64)
+    return np.add.reduceat(np.nan_to_num(values), starts)
+
+def run_means(values, starts):
+    """Moyenne (NaN ignorés, NaN si plage vide) de values sur chaque plage."""
+    counts = run_sums((~np.isnan(values)).astype(np.float64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, run_sums(values, starts) / counts, np.nan)
+
 def identify_and_filter_initial_climbs(df, min_pente):
     """Identifie les blocs de montée bruts et filtre les segments trop courts."""
     df_processed = df.copy()
-    df_processed['en_montee_brute'] = (df_processed['pente'] > min_pente)
-    df_processed['bloc_initial'] = (df_processed['en_montee_brute'] != df_processed['en_montee_brute'].shift()).cumsum()
-
-    bloc_distances = df_processed.groupby('bloc_initial')['delta_distance'].sum()
-    is_climb_first = df_processed.groupby('bloc_initial')['en_montee_brute'].first()
-    blocs_montée_courts = bloc_distances.loc[(bloc_distances < SEUIL_DISTANCE_MIN_BLOC_MONTEE) & (is_climb_first == True)].index
-
-    df_processed['en_montee_filtree'] = df_processed['en_montee_brute']
-    df_processed.loc[df_processed['bloc_initial'].isin(blocs_montée_courts), 'en_montee_filtree'] = False
-
-    df_processed['bloc_a_fusionner'] = (df_processed['en_montee_filtree'] != df_processed['en_montee_filtree'].shift()).cumsum()
+    en_montee_brute = (df_processed['pente'] > min_pente).to_numpy()
+    starts, ends, is_climb = run_length_encode(en_montee_brute)
+    lengths = ends - starts
+
+    # Plages de montée trop courtes (anti-bruit) : repassées à False
+    bloc_distances = run_sums(as_float(df_processed['delta_distance']), starts)
+    blocs_courts = is_climb & (bloc_distances < SEUIL_DISTANCE_MIN_BLOC_MONTEE)
+    en_montee_filtree = en_montee_brute & ~np.repeat(blocs_courts, lengths)
+
+    df_processed['en_montee_brute'] = en_montee_brute
+    df_processed['bloc_initial'] = np.repeat(np.arange(1, len(starts) + 1), lengths)
+    df_processed['en_montee_filtree'] = en_montee_filtree
+    starts_f, ends_f, _ = run_length_encode(en_montee_filtree)
+    df_processed['bloc_a_fusionner'] = np.repeat(np.arange(1, len(starts_f) + 1), ends_f - starts_f)
     return df_processed
 
+def concat_ranges(starts, ends):
+    """Positions des plages [starts, ends) mises bout à bout (un seul tableau)."""
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return np.arange(lengths.sum()) + offsets
+
+def range_sums(values, starts, ends):
+    """Somme (NaN ignorés) de values sur des plages [starts, ends) (rolling_stats.PrefixStats)."""
+    return PrefixStats(values).sum(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64))
+
+def range_means(values, starts, ends):
+    """Moyenne (NaN ignorés, NaN si aucune valeur) de values sur des plages [starts, ends)."""
+    return PrefixStats(values).mean(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64))
+
+def range_max(values, starts, ends):
+    """Maximum (NaN ignorés, NaN si aucune valeur) de values sur des plages [starts, ends)."""
+    if len(starts) == 0: return np.array([], dtype=np.float64)
+    bounds = np.column_stack([starts, ends]).ravel()
+    return np.fmax.reduceat(np.r_[values, np.nan], bounds)[::2]
+
+def _merge_runs(df, max_gap_distance):
+    """Plages de en_montee_filtree et numéro de groupe après fusion par-dessus les courts replats."""
+    starts, ends, is_climb = run_length_encode(df['en_montee_filtree'].to_numpy(dtype=bool))
+    distances = run_sums(as_float(df['delta_distance']), starts)
+
+    # Les plages alternent montée / replat : un replat entre deux montées, plus court
+    # que max_gap_distance, fait le pont et rattache la montée suivante au groupe en cours.
+    n_blocs = len(starts); position = np.arange(n_blocs)
+    pont = ~is_climb & (position > 0) & (position < n_blocs - 1) & (distances < max_gap_distance)
+    apres_pont = np.zeros(n_blocs, dtype=bool); apres_pont[1:] = pont[:-1]
+    merged_ids = np.cumsum(~pont & ~apres_pont) - 1
+    return starts, ends, is_climb, distances, merged_ids
+
+def merge_climb_ranges(df, max_gap_distance):
+    """Positions [début, fin) des montées après fusion, sur le DataFrame de identify_and_filter_initial_climbs."""
+    starts, ends, is_climb, _, merged_ids = _merge_runs(df, max_gap_distance)
+    group_first, group_end, _ = run_length_encode(merged_ids)
+    is_climb_group = is_climb[group_first] if len(group_first) else np.array([], dtype=bool)  # Un groupe fusionné commence par une montée
+    return starts[group_first[is_climb_group]], ends[group_end[is_climb_group] - 1]
+
 def group_and_merge_climbs(df, max_gap_distance):
     """Groupe les segments filtrés et fusionne ceux séparés par un court replat."""
-    blocs_data = []
-    for bloc_id, segment in df.groupby('bloc_a_fusionner'):
-        blocs_data.append({
-            'bloc_id': bloc_id,
-            'is_climb': segment['en_montee_filtree'].iloc[0],
-            'distance': segment['delta_distance'].sum()
-        })
-    df_blocs = pd.DataFrame(blocs_data)
-
-    merged_bloc_id = 0
-    bloc_map = {}
-    for i in range(len(df_blocs)):
-        current_bloc = df_blocs.iloc[i]
-        if current_bloc['bloc_id'] in bloc_map: continue
-        bloc_map[current_bloc['bloc_id']] = merged_bloc_id
-        if not current_bloc['is_climb']:
-            merged_bloc_id += 1; continue
-        j = i + 1
-        while j < len(df_blocs) - 1:
-            replat_bloc, next_climb_bloc = df_blocs.iloc[j], df_blocs.iloc[j+1]
-            if not replat_bloc['is_climb'] and next_climb_bloc['is_climb']:
-                if replat_bloc['distance'] < max_gap_distance:
-                    bloc_map[replat_bloc['bloc_id']] = merged_bloc_id
-                    bloc_map[next_climb_bloc['bloc_id']] = merged_bloc_id
-                    j += 2
-                else: break
-            else: break
-        merged_bloc_id += 1
-
-    df['bloc_fusionne'] = df['bloc_a_fusionner'].map(bloc_map)
-    climb_merged_ids = df_blocs.loc[df_blocs['is_climb'] == True, 'bloc_id'].map(bloc_map).unique()
-    df_segments_a_garder = df[df['bloc_fusionne'].isin(climb_merged_ids)]
+    starts, ends, is_climb, distances, merged_ids = _merge_runs(df, max_gap_distance)
+    bloc_ids = df['bloc_a_fusionner'].to_numpy()[starts]
+    df_blocs = pd.DataFrame({'bloc_id': bloc_ids, 'is_climb': is_climb, 'distance': distances})
+    bloc_map = dict(zip(bloc_ids.tolist(), merged_ids.tolist()))
+
+    df['bloc_fusionne'] = np.repeat(merged_ids, ends - starts)
+    climb_merged_ids = np.unique(merged_ids[is_climb])
+    df_segments_a_garder = df[np.repeat(np.isin(merged_ids, climb_merged_ids), ends - starts)]
 
     # Utiliser observed=True si possible
     try:
@@ -88,41 +136,55 @@ def group_and_merge_climbs(df, max_gap_distance):
 
     return montees_grouped, df_blocs, bloc_map # Retourne le groupby et les infos de blocs
 
-def calculate_climb_summary(montees_grouped, min_climb_distance):
-    """Calcule les statistiques pour chaque montée valide et retourne une liste de résultats."""
+def climb_segment_index(df, starts, ends, min_climb_distance):
+    """
+    Index des montées retenues : positions entières [start, end) dans df et
+    statistiques numériques (non formatées), une ligne par montée.
+    """
+    starts = np.asarray(starts, dtype=np.int64); ends = np.asarray(ends, dtype=np.int64); last = ends - 1
+
+    # Statistiques de toutes les montées en une passe sur les tableaux
+    distances = range_sums(as_float(df['delta_distance']), starts, ends)
+    altitude = df['altitude'].to_numpy()
+    deniveles = np.maximum(0, altitude[last] - altitude[starts])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pentes = np.where(distances == 0, 0, (deniveles / distances) * 100)
+    durees = (df.index[last] - df.index[starts]).total_seconds().to_numpy()
+    def means_of(col): return range_means(as_float(df[col]), starts, ends) if col in df.columns else np.full(len(starts), np.nan)
+
+    index = pd.DataFrame({
+        'start': starts, 'end': ends,
+        'debut_km': df['distance'].to_numpy()[starts] / 1000,
+        'distance_m': distances, 'denivele_m': deniveles, 'pente_pct': pentes, 'duree_s': durees,
+        'fc_moy': means_of('heart_rate'), 'cadence_moy': means_of('cadence'), 'power_moy': means_of('estimated_power'),
+        'power_max': range_max(as_float(df['estimated_power']), starts, ends) if 'estimated_power' in df.columns else np.full(len(starts), np.nan),
+    })
+    index = index[(index['distance_m'] >= min_climb_distance) & (index['duree_s'] > 0)].reset_index(drop=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        index.insert(7, 'vitesse_kmh', (index['distance_m'] / 1000) / (index['duree_s'] / 3600))
+    return index
+
+def format_climbs(climbs):
+    """Lignes d'affichage (textes formatés) de l'index des montées."""
     resultats_montees = []
-    for nom_bloc, segment in montees_grouped:
-        segment = segment.copy() # Travailler sur une copie
-        distance_segment = segment['delta_distance'].sum()
-        if distance_segment < min_climb_distance: continue
-
-        # Calculs des stats (identiques à avant)
-        altitude_debut, altitude_fin = segment['altitude'].iloc[0], segment['altitude'].iloc[-1]
-        denivele = max(0, altitude_fin - altitude_debut); dist_debut_km = segment['distance'].iloc[0] / 1000
-        pente_moyenne = np.where(distance_segment == 0, 0, (denivele / distance_segment) * 100)
-        duree_secondes = (segment.index[-1] - segment.index[0]).total_seconds();
-        if duree_secondes <= 0: continue
-        duree_formatted = pd.to_timedelta(duree_secondes, unit='s'); vitesse_moyenne_kmh = (distance_segment / 1000) / (duree_secondes / 3600)
-        fc_moyenne = segment['heart_rate'].mean() if 'heart_rate' in segment.columns else np.nan
-        cadence_moyenne = segment['cadence'].mean() if 'cadence' in segment.columns else np.nan
-        power_moyenne = segment['estimated_power'].mean() if 'estimated_power' in segment.columns else np.nan
-
-        # --- NOUVEAU : Calcul de la Puissance Max ---
-        power_max = segment['estimated_power'].max() if 'estimated_power' in segment.columns and not segment['estimated_power'].isnull().all() else np.nan
-        # --- FIN NOUVEAU ---
-
+    for climb in climbs.itertuples(index=False):
         resultats_montees.append({
-            'Début (km)': f"{dist_debut_km:.1f}",
-            'Distance (m)': f"{distance_segment:.0f}",
-            'Dénivelé (m)': f"{denivele:.0f}",
-            'Pente (%)': f"{pente_moyenne:.1f}",
-            'Durée': str(duree_formatted).split('.')[0].replace('0 days ', ''),
-            'Vitesse (km/h)': f"{vitesse_moyenne_kmh:.1f}",
-            'FC Moy (bpm)': f"{fc_moyenne:.0f}" if pd.notna(fc_moyenne) else "N/A",
-            'Cadence Moy': f"{cadence_moyenne:.0f}" if pd.notna(cadence_moyenne) else "N/A",
-            'Puissance Est. (W)': f"{power_moyenne:.0f}" if pd.notna(power_moyenne) else "N/A",
-            # --- NOUVEAU : Ajout au dictionnaire ---
-            'Puissance Max Est. (W)': f"{power_max:.0f}" if pd.notna(power_max) else "N/A"
+            'Début (km)': f"{climb.debut_km:.1f}",
+            'Distance (m)': f"{climb.distance_m:.0f}",
+            'Dénivelé (m)': f"{climb.denivele_m:.0f}",
+            'Pente (%)': f"{climb.pente_pct:.1f}",
+            'Durée': str(pd.to_timedelta(climb.duree_s, unit='s')).split('.')[0].replace('0 days ', ''),
+            'Vitesse (km/h)': f"{climb.vitesse_kmh:.1f}",
+            'FC Moy (bpm)': f"{climb.fc_moy:.0f}" if pd.notna(climb.fc_moy) else "N/A",
+            'Cadence Moy': f"{climb.cadence_moy:.0f}" if pd.notna(climb.cadence_moy) else "N/A",
+            'Puissance Est. (W)': f"{climb.power_moy:.0f}" if pd.notna(climb.power_moy) else "N/A",
+            'Puissance Max Est. (W)': f"{climb.power_max:.0f}" if pd.notna(climb.power_max) else "N/A"
         })
     return resultats_montees
 
+def calculate_climb_summary(montees_grouped, min_climb_distance):
+    """Calcule les statistiques pour chaque montée valide et retourne une liste de résultats."""
+    segments = montees_grouped.obj  # Lignes des montées : chaque groupe est une plage contiguë
+    if segments.empty: return []
+    starts, ends, _ = run_length_encode(segments['bloc_fusionne'].to_numpy())
+    return format_climbs(climb_segment_index(segments, starts, ends, min_climb_distance))
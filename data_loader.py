@@ -1,76 +1,231 @@
 # data_loader.py
 import pandas as pd
+import numpy as np
 from fitparse import FitFile
 import io
-import streamlit as st
 
-@st.cache_data
+from analysis_warnings import warn
+from fit_decoder import read_fit_messages, FitDecodeUnsupported
+from ride_cache import content_key, get_ride_cache
+
+FIT_MESSAGES = ('record', 'session', 'lap', 'event')
+RECORD_BLOCK_SIZE = 16384  # ~4h30 à 1 Hz par bloc
+
+def read_messages_fitparse(raw_bytes, names=FIT_MESSAGES, record_block_size=None):
+    """
+    Lecture via fitparse (un dict par message), en une seule passe. Sert de repli et de référence.
+    Avec record_block_size, 'record' est un itérateur de blocs, et les autres
+    listes ne sont complètes qu'une fois cet itérateur épuisé.
+    """
+    collectors = {name: [] for name in names if name != 'record'}
+
+    def record_blocks():
+        data_list = []
+        for message in FitFile(io.BytesIO(raw_bytes)).get_messages(list(names)):
+            data_row = {}
+            for field in message:
+                if field.value is not None: data_row[field.name] = field.value
+            if not data_row: continue
+            if message.name != 'record': collectors[message.name].append(data_row); continue
+            data_list.append(data_row)
+            if record_block_size and len(data_list) >= record_block_size:
+                yield pd.DataFrame(data_list); data_list = []
+        if data_list or not record_block_size: yield pd.DataFrame(data_list)
+
+    collectors['record'] = record_blocks() if record_block_size else next(record_blocks())
+    return collectors
+
+def read_records_fitparse(raw_bytes):
+    """Ancienne lecture des 'record' via fitparse, conservée pour les benchmarks."""
+    return read_messages_fitparse(raw_bytes, ('record',))['record']
+
 def load_and_clean_data(file_buffer):
     """
     Lit le .fit, nettoie les 'record', convertit le GPS (s'il existe),
     et extrait les 'session'.
     """
+    df, session_data, _, _, error_msg = load_ride(file_buffer)
+    return df, session_data, error_msg
+
+def load_ride(file_buffer):
+    """
+    Comme load_and_clean_data, mais rend aussi les tours et les événements,
+    issus du même décodage : (df, session_data, laps_df, events_df, erreur).
+    Une sortie déjà analysée est relue depuis le cache disque, sans décodage FIT.
+    """
+    file_buffer.seek(0)
+    df, session_data, laps_df, events_df, error_msg = read_ride(file_buffer.read())
+    if df is None: return None, None, None, None, error_msg
+
+    if not session_data:
+        warn("Aucun message 'session' de résumé trouvé.")
+    return df, session_data, laps_df, events_df, None
+
+def read_ride(raw_bytes):
+    """
+    parse_ride derrière le cache disque, sans Streamlit (utilisable en lot) :
+    (df, session_data, laps_df, events_df, erreur).
+    """
+    cache = get_ride_cache(); key = content_key(raw_bytes)
+    cached = cache.get(key) if cache else None
+    if cached is not None: return (*cached, None)
+
+    df, session_data, laps_df, events_df, error_msg = parse_ride(raw_bytes)
+    if df is not None and cache:
+        try: cache.put(key, df, session_data, laps_df, events_df)
+        except Exception: pass  # Le cache n'est qu'une accélération
+    return df, session_data, laps_df, events_df, error_msg
+
+COLS_ESSENTIELLES = ['distance', 'altitude', 'timestamp', 'speed']
+
+def clean_record_block(df, cadence_state):
+    """
+    Nettoie un bloc de 'record' sur place : conversion numérique, GPS en degrés,
+    puis suppression des lignes sans données essentielles. cadence_state
+    ({'last', 'first'}) propage la cadence d'un bloc à l'autre, comme un ffill
+    sur le fichier entier.
+    """
+    # Conversion et nettoyage
+    cols_to_convert = ['altitude', 'distance', 'enhanced_altitude', 'enhanced_speed',
+                       'heart_rate', 'speed', 'temperature', 'cadence']
+    cols_gps = ['position_lat', 'position_long']
+
+    for col in df.columns:
+        if col in cols_to_convert: 
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        elif col == 'timestamp': 
+             df[col] = pd.to_datetime(df[col], errors='coerce')
+        # Conversion GPS (Seulement si la colonne existe)
+        elif col in cols_gps:
+            df[col] = pd.to_numeric(df[col], errors='coerce') * (180 / 2**31)
+
+    if 'cadence' in df.columns:
+        cadence = df['cadence']
+        if cadence_state['first'] is None and cadence.notna().any():
+            cadence_state['first'] = cadence[cadence.notna()].iloc[0]
+        cadence = cadence.ffill()
+        if cadence_state['last'] is not None: cadence = cadence.fillna(cadence_state['last'])
+        if cadence.notna().any(): cadence_state['last'] = cadence.iloc[-1]
+        df['cadence'] = cadence
+    elif cadence_state['last'] is not None:
+        df['cadence'] = cadence_state['last']  # Bloc sans cadence : dernière valeur connue
+
+    # --- MODIFIÉ : Colonnes GPS retirées des essentielles ---
+    # On ne supprime les lignes que si les données ESSENTIELLES manquent
+    return df.dropna(subset=[c for c in COLS_ESSENTIELLES if c in df.columns])
+
+
+def ingest_record_blocks(record_blocks):
+    """
+    Nettoie chaque bloc dès sa lecture puis concatène une seule fois : le pic
+    mémoire reste proche de la taille du DataFrame final. Retourne (df, nb de
+    'record' lus).
+    """
+    cadence_state = {'last': None, 'first': None}
+    cleaned = []; n_records = 0
+    for block in record_blocks:
+        n_records += len(block)
+        if not block.empty: cleaned.append(clean_record_block(block, cadence_state))
+        del block
+    if not cleaned: return pd.DataFrame(), n_records
+
+    df = pd.concat(cleaned, ignore_index=True, copy=False) if len(cleaned) > 1 else cleaned[0]
+    del cleaned
+    if 'cadence' in df.columns and cadence_state['first'] is not None:
+        df['cadence'] = df['cadence'].fillna(cadence_state['first'])  # bfill des premières lignes
+    # Un bloc peut ne pas contenir une colonne essentielle présente ailleurs
+    subset = [c for c in COLS_ESSENTIELLES if c in df.columns]
+    if df[subset].isna().any().any(): df = df.dropna(subset=subset)
+    return df, n_records
+
+# --- Schéma compact des 'record' (type NumPy cible par colonne connue) ---
+# Les entiers deviennent nullables (UInt8...) s'il reste des trous.
+RECORD_SCHEMA = {
+    'distance': 'float64',  # Cumul sur des centaines de km : float64 pour garder le cm
+    'altitude': 'float32', 'enhanced_altitude': 'float32',
+    'speed': 'float32', 'enhanced_speed': 'float32',
+    'position_lat': 'float32', 'position_long': 'float32',  # ~0,5 m de résolution
+    'heart_rate': 'uint8', 'cadence': 'uint8', 'temperature': 'int8',
+    'power': 'uint16', 'grade': 'float32', 'vertical_speed': 'float32',
+    'fractional_cadence': 'float32', 'calories': 'uint16', 'accumulated_power': 'uint32',
+}
+INT_DTYPES = ['uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32', 'int64']
+
+def _narrow_integer(values, dtype=None):
+    """Entier le plus petit contenant les valeurs (nullable si trous), ou None si non entier."""
+    valid = values.dropna()
+    if not valid.empty and not (valid == np.floor(valid)).all(): return None
+    low, high = (valid.min(), valid.max()) if not valid.empty else (0, 0)
+    candidates = INT_DTYPES[INT_DTYPES.index(dtype):] if dtype else INT_DTYPES
+    for candidate in candidates:
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max: break
+    else: return None
+    if len(valid) < len(values): candidate = candidate.capitalize().replace('Uint', 'UInt')
+    return values.astype(candidate)
+
+def compact_record_frame(df):
+    """
+    Applique RECORD_SCHEMA aux 'record' nettoyés. Les champs inconnus de fitparse
+    (unknown_*) sont supprimés ; les autres colonnes sont réduites au plus petit
+    type numérique, en catégorie (texte) ou laissées telles quelles (tableaux).
+    """
+    df = df.drop(columns=[c for c in df.columns if str(c).startswith('unknown_')])
+    for col in df.columns:
+        values = df[col]
+        if col == 'timestamp' or pd.api.types.is_bool_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype): continue
+        if values.dtype == object or pd.api.types.is_string_dtype(values):
+            valid = values.dropna()
+            numeric = pd.to_numeric(valid, errors='coerce')
+            if numeric.notna().all(): values = pd.to_numeric(values, errors='coerce')
+            else:
+                if valid.map(type).eq(str).all(): df[col] = values.astype('category')
+                continue
+        elif not pd.api.types.is_numeric_dtype(values): continue
+
+        target = RECORD_SCHEMA.get(col)
+        if target is None or target in INT_DTYPES:
+            narrowed = _narrow_integer(values.astype('float64'), target)
+            if narrowed is not None: df[col] = narrowed; continue
+            target = 'float32'
+        df[col] = values.astype(target)
+    return df
+
+def parse_ride(raw_bytes, block_size=RECORD_BLOCK_SIZE):
+    """
+    Décode et nettoie un fichier .fit : (df, session_data, laps_df, events_df, erreur).
+    Les 'record' sont lus et nettoyés par blocs de block_size messages (en un
+    seul bloc si block_size est None ou 0).
+    """
     
-    # --- 1. Lire les données 'record' (seconde par seconde) ---
-    data_list = []
-    file_buffer.seek(0) 
-    
-    try:
-        fitfile = FitFile(io.BytesIO(file_buffer.read()))
-        for record in fitfile.get_messages('record'):
-            data_row = {}
-            for field in record:
-                if field.value is not None: data_row[field.name] = field.value
-            if data_row: data_list.append(data_row)
+    # --- 1. Un seul décodage du fichier, un collecteur par type de message ---
+    def record_blocks(records):
+        # Sans taille de bloc, les lecteurs rendent un seul DataFrame et non un itérateur de blocs
+        return [records] if isinstance(records, pd.DataFrame) else records
 
-        if not data_list: 
-            return None, None, "Aucun message 'record' trouvé."
+    try:
+        try:
+            messages = read_fit_messages(raw_bytes, FIT_MESSAGES, block_size)
+            df, n_records = ingest_record_blocks(record_blocks(messages.pop('record')))
+        except FitDecodeUnsupported:
+            messages = read_messages_fitparse(raw_bytes, FIT_MESSAGES, block_size)
+            df, n_records = ingest_record_blocks(record_blocks(messages.pop('record')))
 
-        df = pd.DataFrame(data_list)
-        
-        # Conversion et nettoyage
-        cols_to_convert = ['altitude', 'distance', 'enhanced_altitude', 'enhanced_speed',
-                           'heart_rate', 'speed', 'temperature', 'cadence']
-        cols_gps = ['position_lat', 'position_long']
-
-        for col in df.columns:
-            if col in cols_to_convert: 
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            elif col == 'timestamp': 
-                 df[col] = pd.to_datetime(df[col], errors='coerce')
-            # Conversion GPS (Seulement si la colonne existe)
-            elif col in cols_gps:
-                df[col] = pd.to_numeric(df[col], errors='coerce') * (180 / 2**31)
-
-        if 'cadence' in df.columns: df['cadence'] = df['cadence'].ffill().bfill()
-        
-        # --- MODIFIÉ : Colonnes GPS retirées des essentielles ---
-        cols_essentielles = ['distance', 'altitude', 'timestamp', 'speed']
-        # On ne supprime les lignes que si les données ESSENTIELLES manquent
-        df = df.dropna(subset=[c for c in cols_essentielles if c in df.columns])
+        if n_records == 0: 
+            return None, None, None, None, "Aucun message 'record' trouvé."
         
         if df.empty: 
-            return None, None, "Fichier vide après nettoyage (données essentielles manquantes)."
-        # --- FIN MODIFICATION ---
+            return None, None, None, None, "Fichier vide après nettoyage (données essentielles manquantes)."
             
-        df = df.set_index('timestamp').sort_index()
+        df = compact_record_frame(df).set_index('timestamp').sort_index()
 
-        # --- 2. Lire les données 'session' ---
-        session_data = {}
-        file_buffer.seek(0)
-        fitfile_session = FitFile(io.BytesIO(file_buffer.read()))
-        
-        session_messages = list(fitfile_session.get_messages('session'))
-        if session_messages:
-            session = session_messages[0]
-            for field in session:
-                if field.value is not None:
-                    session_data[field.name] = field.value
-        else:
-            st.warning("Aucun message 'session' de résumé trouvé.")
-            session_data = {}
-
-        return df, session_data, None
+        # --- 2. Données 'session', 'lap' et 'event' (même décodage) ---
+        session_data = messages['session'][0] if messages['session'] else {}
+
+        laps_df = pd.DataFrame(messages['lap'])
+        events_df = pd.DataFrame(messages['event'])
+
+        return df, session_data, laps_df, events_df, None
 
     except Exception as e: 
-        return None, None, f"Erreur traitement : {e}"
+        return None, None, None, None, f"Erreur traitement : {e}"
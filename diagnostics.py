@@ -0,0 +1,108 @@
+# diagnostics.py
+"""
+Mesures des étapes de l'application : pour chaque étape (lecture, étapes du
+pipeline, figures...), durée, pic mémoire, lignes en entrée et en sortie et
+statut de cache ('calcul' ou 'cache'). Les mesures sont affichées dans le
+panneau de diagnostic et ajoutées au journal JSON lines (une ligne par étape)
+pour les comparer d'une session à l'autre.
+
+Le pic mémoire vient de tracemalloc (allocations Python et NumPy) : il n'est
+mesuré que si le suivi est demandé, car il ralentit les étapes. tracemalloc
+est global au processus : avec plusieurs sessions simultanées, les pics se
+mélangent.
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# --- Configuration (variables d'environnement) ---
+DIAGNOSTICS_LOG = os.environ.get('ANALYSE_FIT_DIAGNOSTICS_LOG', os.path.join(os.path.expanduser('~'), '.local', 'share', 'analyse_fit', 'diagnostics.jsonl')) # '' = pas de journal
+
+
+def row_count(value):
+    """Lignes d'un résultat (DataFrame, Series, liste ; premier élément d'un tuple), ou None."""
+    if isinstance(value, tuple) and value: value = value[0]
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series, list)) else None
+
+
+class StageMonitor:
+    """
+    Mesures d'une exécution de l'application, une entrée par étape appelée.
+    Les étapes peuvent s'imbriquer : le pic d'une étape englobante inclut
+    celui des étapes qu'elle contient. context (session, clé de la sortie...)
+    est ajouté à chaque ligne du journal.
+    """
+
+    def __init__(self, trace_memory=False, **context):
+        self.trace_memory = trace_memory
+        self.context = context
+        self.records = []
+        self._peaks = [] # Pic déjà atteint par chaque étape englobante en cours
+        self._started_tracing = False
+        self._logged = 0
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(); self._started_tracing = True
+
+    def stop(self):
+        if self._started_tracing: tracemalloc.stop(); self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name, rows_in=None, status='calcul'):
+        """Mesure le bloc : l'entrée rendue peut être complétée (statut, lignes_sortie)."""
+        entry = {'etape': name, 'statut': status, 'duree_ms': None, 'pic_memoire_mo': None, 'lignes_entree': rows_in, 'lignes_sortie': None}
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            base, peak = tracemalloc.get_traced_memory()
+            if self._peaks: self._peaks[-1] = max(self._peaks[-1], peak) # Avant la remise à zéro du pic
+            tracemalloc.reset_peak(); self._peaks.append(base)
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['duree_ms'] = (time.perf_counter() - start) * 1000
+            if tracing:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                entry['pic_memoire_mo'] = (peak - base) / 2 ** 20
+                if self._peaks: self._peaks[-1] = max(self._peaks[-1], peak)
+            self.records.append(entry)
+
+    def call(self, name, func, *args, rows_in=None, **kwargs):
+        """func(*args, **kwargs) mesuré sous le nom name ; les lignes en sortie sont comptées sur le résultat."""
+        with self.stage(name, rows_in) as entry:
+            result = func(*args, **kwargs)
+            entry['lignes_sortie'] = row_count(result)
+        return result
+
+    def record(self, name, status, duration_ms=0.0, rows_out=None):
+        """Entrée sans mesure (ex. résultat lu dans un cache)."""
+        self.records.append({'etape': name, 'statut': status, 'duree_ms': duration_ms, 'pic_memoire_mo': None, 'lignes_entree': None, 'lignes_sortie': rows_out})
+
+    def summary(self):
+        """Tableau par étape et statut : appels, durée totale, et pic mémoire et lignes du plus gros appel."""
+        columns = ['etape', 'statut', 'appels', 'duree_ms', 'pic_memoire_mo', 'lignes_entree', 'lignes_sortie']
+        if not self.records: return pd.DataFrame(columns=columns)
+        frame = pd.DataFrame(self.records)
+        grouped = frame.groupby(['etape', 'statut'], sort=False).agg(
+            appels=('etape', 'size'), duree_ms=('duree_ms', 'sum'), pic_memoire_mo=('pic_memoire_mo', 'max'),
+            lignes_entree=('lignes_entree', 'max'), lignes_sortie=('lignes_sortie', 'max'))
+        return grouped.reset_index()[columns]
+
+    def write_log(self, path=DIAGNOSTICS_LOG):
+        """Ajoute au journal les entrées pas encore écrites, une ligne JSON par étape. Retourne le nombre de lignes."""
+        new_records = self.records[self._logged:]
+        if not path or not new_records: return 0
+        date = pd.Timestamp.now().isoformat(timespec='seconds')
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                for entry in new_records: f.write(json.dumps({'date': date, **self.context, **entry}, ensure_ascii=False, default=str) + '\n')
+        except OSError:
+            return 0 # Le journal n'est qu'une aide au diagnostic
+        self._logged = len(self.records)
+        return len(new_records)
@@ -0,0 +1,121 @@
+# downsampling.py
+"""
+Sous-échantillonnage qui garde la forme des tracés (sommets, pics de sprint,
+lacets), à la place d'un pas fixe iloc[::k] :
+
+- lttb_indices : Largest-Triangle-Three-Buckets, pour les séries x/y
+  (distance/altitude, temps/vitesse...) ;
+- douglas_peucker_indices : Douglas-Peucker ramené à un budget de points,
+  pour les tracés GPS.
+
+Les deux rendent des positions triées (premier et dernier point inclus).
+cached_indices garde ces positions par sortie, usage et budget.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from climb_processing import concat_ranges
+
+CACHE_MAX_ENTRIES = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions des n_out points retenus par LTTB : les points intérieurs sont
+    répartis en n_out - 2 paquets, et chaque paquet garde le point qui forme le
+    plus grand triangle avec le point retenu avant lui et la moyenne du paquet suivant.
+    """
+    x = np.asarray(x, dtype=np.float64); y = np.asarray(y, dtype=np.float64); n = len(x)
+    if n_out >= n: return np.arange(n)
+    if n_out < 3: return np.array([0, n - 1])[:max(n_out, 0)]
+
+    # Bornes des paquets [edges[i], edges[i + 1]) sur les points 1 .. n - 2
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # Moyenne de chaque paquet (sommes cumulées), puis celle du paquet suivant ; le dernier point après le dernier paquet
+    cum_x = np.r_[0, np.cumsum(x)]; cum_y = np.r_[0, np.cumsum(y)]; counts = np.diff(edges)
+    next_x = np.r_[((cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts)[1:], x[-1]]
+    next_y = np.r_[((cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts)[1:], y[-1]]
+
+    selected = np.empty(n_out, dtype=np.int64); selected[0] = 0; selected[-1] = n - 1
+    a = 0  # Chaque choix dépend du précédent : boucle sur les paquets, calcul vectorisé dans le paquet
+    for i, (start, end) in enumerate(zip(edges[:-1].tolist(), edges[1:].tolist())):
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[i] - ay))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def douglas_peucker_indices(x, y, n_out):
+    """
+    Positions des n_out points les plus significatifs au sens de Douglas-Peucker
+    (x, y en mètres). Chaque point reçoit la tolérance en dessous de laquelle il
+    serait gardé (bornée par celle de son segment parent) ; on garde les n_out
+    plus grandes. Tous les segments d'un même niveau sont découpés en une passe.
+    """
+    x = np.asarray(x, dtype=np.float64); y = np.asarray(y, dtype=np.float64); n = len(x)
+    if n_out >= n: return np.arange(n)
+    if n_out < 3: return np.array([0, n - 1])[:max(n_out, 0)]
+
+    significance = np.full(n, -1.0); significance[[0, n - 1]] = np.inf
+    starts = np.array([0]); ends = np.array([n - 1]); parent = np.array([np.inf])
+    while True:
+        has_inside = ends - starts > 1
+        starts, ends, parent = starts[has_inside], ends[has_inside], parent[has_inside]
+        if len(starts) == 0: break
+
+        # Distance de chaque point intérieur au segment [start, end] qui le contient
+        lengths = ends - starts - 1
+        points = concat_ranges(starts + 1, ends); segment = np.repeat(np.arange(len(starts)), lengths)
+        ax, ay = x[starts][segment], y[starts][segment]
+        dx, dy = x[ends][segment] - ax, y[ends][segment] - ay
+        norm = dx * dx + dy * dy
+        t = np.clip(((x[points] - ax) * dx + (y[points] - ay) * dy) / np.where(norm > 0, norm, 1), 0, 1)
+        distances = np.hypot(x[points] - ax - t * dx, y[points] - ay - t * dy)
+
+        # Point le plus éloigné (le premier) de chaque segment, qui coupe le segment en deux
+        offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+        d_max = np.maximum.reduceat(distances, offsets)
+        farthest = np.flatnonzero(distances == d_max[segment])
+        split = points[farthest[np.r_[True, np.diff(segment[farthest]) > 0]]]
+        level = np.minimum(d_max, parent)
+        significance[split] = level
+        starts, ends, parent = np.r_[starts, split], np.r_[split, ends], np.r_[level, level]
+
+        # Un segment ne peut plus fournir de point plus significatif que le n_out-ième déjà trouvé
+        if (significance >= 0).sum() >= n_out:
+            threshold = np.partition(significance, n - n_out)[n - n_out]
+            keep = parent > threshold
+            starts, ends, parent = starts[keep], ends[keep], parent[keep]
+
+    return np.sort(np.argpartition(-significance, n_out - 1)[:n_out])
+
+
+def gps_to_metres(lat, lon):
+    """Projection équirectangulaire locale (mètres) de latitudes/longitudes en degrés."""
+    lat = np.asarray(lat, dtype=np.float64); lon = np.asarray(lon, dtype=np.float64)
+    cos_lat = np.cos(np.radians(np.nanmean(lat))) if len(lat) else 1.0
+    return lon * (111320.0 * cos_lat), lat * 110540.0
+
+
+def cached_indices(key, compute):
+    """
+    Positions rendues par compute(), gardées sous key (sortie, usage, budget) ;
+    key None : pas de cache. Cache LRU partagé de CACHE_MAX_ENTRIES entrées.
+    """
+    if key is None: return compute()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    indices = compute()
+    with _cache_lock:
+        _cache[key] = indices
+        while len(_cache) > CACHE_MAX_ENTRIES: _cache.popitem(last=False)
+    return indices
@@ -0,0 +1,499 @@
+# fit_decoder.py
+import datetime
+
+import numpy as np
+import pandas as pd
+from fitparse.profile import MESSAGE_TYPES, FIELD_NUM_TIMESTAMP
+from fitparse.records import BASE_TYPES, BASE_TYPE_BYTE
+from fitparse.processors import UTC_REFERENCE
+
+# --- Constantes FIT ---
+MESG_NUM_RECORD = 20
+MESG_NUM_FIELD_DESCRIPTION = 206
+MESG_NUM_DEVELOPER_DATA_ID = 207
+DATE_TIME_MIN = 0x10000000  # En dessous : valeur relative (secondes), pas une date
+
+# Base type FIT -> (dtype NumPy sans boutisme, valeur invalide ; None = NaN)
+NUMPY_BASE_TYPES = {
+    0x00: ('u1', 0xFF), 0x01: ('i1', 0x7F), 0x02: ('u1', 0xFF),
+    0x83: ('i2', 0x7FFF), 0x84: ('u2', 0xFFFF),
+    0x85: ('i4', 0x7FFFFFFF), 0x86: ('u4', 0xFFFFFFFF),
+    0x88: ('f4', None), 0x89: ('f8', None),
+    0x0A: ('u1', 0), 0x8B: ('u2', 0), 0x8C: ('u4', 0),
+    0x8E: ('i8', 0x7FFFFFFFFFFFFFFF), 0x8F: ('u8', 0xFFFFFFFFFFFFFFFF), 0x90: ('u8', 0),
+}
+# Types dont fitparse transforme la valeur ligne par ligne (hors date_time, géré en colonne)
+TYPES_OBJET = ('bool', 'local_date_time', 'localtime_into_day')
+
+
+class FitDecodeError(Exception):
+    """Fichier .fit illisible (en-tête, définition ou message invalide)."""
+
+
+class FitDecodeUnsupported(FitDecodeError):
+    """Cas FIT non géré par le décodeur colonnaire : l'appelant repasse par fitparse."""
+
+
+class FitDefinition:
+    """Message de définition FIT : disposition des champs d'un type de message local."""
+    __slots__ = ('mesg_num', 'endian', 'fields', 'dev_fields', 'size')
+
+    def __init__(self, mesg_num, endian, fields, dev_fields):
+        self.mesg_num = mesg_num
+        self.endian = endian
+        # (numéro de champ, taille, base type, décalage dans le message)
+        self.fields = fields
+        # (numéro de champ, taille, index développeur, décalage dans le message)
+        self.dev_fields = dev_fields
+        self.size = sum(f[1] for f in fields) + sum(f[1] for f in dev_fields)
+
+
+# --- 1. Parcours des en-têtes (une seule passe, sans décoder les champs) ---
+
+def scan_fit(data):
+    """
+    Parcourt le fichier une fois et repère chaque message de données.
+    Retourne (définitions, index de définition, décalage, décalage temporel compressé)
+    par message, les trois derniers sous forme de tableaux NumPy alignés.
+    Le CRC n'est pas vérifié.
+    """
+    definitions = []
+    mesg_defs = []; mesg_offsets = []; mesg_time_offsets = []
+    n_bytes = len(data); pos = 0
+
+    while pos < n_bytes:  # Boucle externe : fichiers FIT chaînés
+        if n_bytes - pos < 12 or data[pos + 8:pos + 12] != b'.FIT':
+            raise FitDecodeError("En-tête .FIT invalide.")
+        header_size = data[pos]
+        data_size = int.from_bytes(data[pos + 4:pos + 8], 'little')
+        pos += header_size
+        end = pos + data_size
+        if end > n_bytes:
+            raise FitDecodeError("Fichier .FIT tronqué.")
+        local_defs = {}; sizes = {}
+
+        while pos < end:
+            header = data[pos]; pos += 1
+            if header & 0x80:  # En-tête à horodatage compressé
+                local_num = (header >> 5) & 0x3; time_offset = header & 0x1F
+            elif header & 0x40:  # Message de définition
+                endian = '>' if data[pos + 1] else '<'
+                mesg_num = int.from_bytes(data[pos + 2:pos + 4], 'big' if endian == '>' else 'little')
+                num_fields = data[pos + 4]; pos += 5
+                fields = []; offset = 0
+                for _ in range(num_fields):
+                    field_num, size, base_num = data[pos], data[pos + 1], data[pos + 2]
+                    fields.append((field_num, size, base_num, offset)); offset += size; pos += 3
+                dev_fields = []
+                if header & 0x20:
+                    num_dev = data[pos]; pos += 1
+                    for _ in range(num_dev):
+                        field_num, size, dev_index = data[pos], data[pos + 1], data[pos + 2]
+                        dev_fields.append((field_num, size, dev_index, offset)); offset += size; pos += 3
+                definitions.append(FitDefinition(mesg_num, endian, fields, dev_fields))
+                local_defs[header & 0xF] = len(definitions) - 1
+                sizes[header & 0xF] = definitions[-1].size
+                continue
+            else:
+                local_num = header & 0xF; time_offset = -1
+
+            def_index = local_defs.get(local_num)
+            if def_index is None:
+                raise FitDecodeError(f"Message de données sans définition (type local {local_num}).")
+            mesg_defs.append(def_index); mesg_offsets.append(pos); mesg_time_offsets.append(time_offset)
+            pos += sizes[local_num]
+
+        if pos > end:
+            raise FitDecodeError("Fichier .FIT tronqué.")
+        pos = end + 2  # CRC de fin de fichier
+
+    return (definitions, np.asarray(mesg_defs, dtype=np.int32),
+            np.asarray(mesg_offsets, dtype=np.int64), np.asarray(mesg_time_offsets, dtype=np.int8))
+
+
+# --- 2. Décodage ligne par ligne (messages rares : descriptions de champs développeur) ---
+
+def _parse_python_value(base_num, endian, raw_bytes):
+    """Lit une valeur brute comme fitparse (tuple pour les tableaux et les octets, None si invalide)."""
+    base_type = BASE_TYPES.get(base_num, BASE_TYPE_BYTE)
+    if base_type.name == 'string':
+        return base_type.parse(raw_bytes)
+    fmt, _ = NUMPY_BASE_TYPES.get(base_num, ('u1', 0xFF))
+    values = np.frombuffer(raw_bytes, dtype=endian + fmt).tolist()
+    if base_type.name == 'byte':
+        return base_type.parse(tuple(values))
+    if len(values) > 1:
+        return tuple(base_type.parse(v) for v in values)
+    return base_type.parse(values[0])
+
+
+def _apply_scale_offset(scale, offset, value):
+    if isinstance(value, tuple):
+        return tuple(_apply_scale_offset(scale, offset, v) for v in value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if scale: value = float(value) / scale
+        if offset: value = value - offset
+    return value
+
+
+def _process_type(type_name, value):
+    """Reprend les processeurs de type par défaut de fitparse."""
+    if value is None: return value
+    if type_name == 'bool': return bool(value)
+    if type_name == 'date_time' and value >= DATE_TIME_MIN:
+        return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=UTC_REFERENCE + value)
+    if type_name == 'local_date_time':
+        return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=UTC_REFERENCE + value)
+    if type_name == 'localtime_into_day':
+        m, s = divmod(value, 60); h, m = divmod(m, 60)
+        return datetime.time(h, m, s)
+    return value
+
+
+def _render(field, raw_value):
+    values = field.type.values
+    if values and raw_value in values: return values[raw_value]
+    return raw_value
+
+
+def decode_row(data, offset, definition, dev_types=None):
+    """
+    Décode un message de données en dict {nom: valeur}, avec la même sémantique
+    que fitparse (sous-champs, composants, processeurs de type). Les valeurs
+    invalides sont omises.
+    """
+    mesg_type = MESSAGE_TYPES.get(definition.mesg_num)
+    raw_values = []
+    for field_num, size, base_num, field_offset in definition.fields:
+        start = offset + field_offset
+        raw_values.append(_parse_python_value(base_num, definition.endian, bytes(data[start:start + size])))
+
+    row = {}
+    for (field_num, size, base_num, _), raw_value in zip(definition.fields, raw_values):
+        field = mesg_type.fields.get(field_num) if mesg_type else None
+        if field is None:
+            if raw_value is not None: row[f'unknown_{field_num}'] = raw_value
+            continue
+        field = _resolve_subfield(field, definition, raw_values)
+        for component in (field.components or []):
+            if component.accumulate:
+                raise FitDecodeUnsupported(f"Composant cumulé non géré ({field.name}).")
+            if raw_value is None or isinstance(raw_value, tuple): continue
+            cmp_raw = (raw_value >> component.bit_offset) & ((1 << component.bits) - 1)
+            cmp_raw = _apply_scale_offset(component.scale, component.offset, cmp_raw)
+            cmp_field = _resolve_subfield(mesg_type.fields[component.def_num], definition, raw_values)
+            cmp_value = _process_type(cmp_field.type.name, _render(cmp_field, cmp_raw))
+            if cmp_value is not None: row[cmp_field.name] = cmp_value
+        value = _apply_scale_offset(field.scale, field.offset, _render(field, raw_value))
+        value = _process_type(field.type.name, value)
+        if value is not None: row[field.name] = value
+
+    for field_num, size, dev_index, field_offset in definition.dev_fields:
+        dev_field = (dev_types or {}).get((dev_index, field_num))
+        if dev_field is None:
+            raise FitDecodeUnsupported(f"Champ développeur {dev_index}/{field_num} sans description.")
+        start = offset + field_offset
+        value = _parse_python_value(dev_field[1], definition.endian, bytes(data[start:start + size]))
+        if value is not None: row[dev_field[0]] = value
+    return row
+
+
+def _resolve_subfield(field, definition, raw_values):
+    if not field.subfields: return field
+    for sub_field in field.subfields:
+        for ref_field in sub_field.ref_fields:
+            for (field_num, _, _, _), raw_value in zip(definition.fields, raw_values):
+                if field_num == ref_field.def_num and ref_field.raw_value == raw_value:
+                    return sub_field
+    return field
+
+
+def read_dev_types(data, scan):
+    """Construit {(index développeur, numéro de champ): (nom, base type)} à partir des 'field_description'."""
+    definitions, mesg_defs, mesg_offsets, _ = scan
+    dev_types = {}
+    for def_index in np.unique(mesg_defs):
+        if definitions[def_index].mesg_num != MESG_NUM_FIELD_DESCRIPTION: continue
+        for offset in mesg_offsets[mesg_defs == def_index]:
+            row = decode_row(data, int(offset), definitions[def_index])
+            field_num = row.get('field_definition_number')
+            name = row.get('field_name') or f"unnamed_dev_field_{field_num}"
+            # fitparse garde le numéro brut du base type
+            dev_types[(row.get('developer_data_index'), field_num)] = (name, _raw_base_type_id(row.get('fit_base_type_id')))
+    return dev_types
+
+
+def _raw_base_type_id(value):
+    if isinstance(value, str):
+        for num, base_type in BASE_TYPES.items():
+            if base_type.name == value: return num
+    return value
+
+
+# --- 3. Décodage colonnaire des messages 'record' ---
+
+class _Column:
+    """Colonne préallouée (une case par message 'record') et son masque de validité."""
+    __slots__ = ('values', 'valid')
+
+    def __init__(self, kind, n_rows):
+        if kind == 'int': self.values = np.zeros(n_rows, dtype=np.int64)
+        elif kind == 'float': self.values = np.full(n_rows, np.nan)
+        elif kind == 'datetime': self.values = np.full(n_rows, np.datetime64('NaT'), dtype='datetime64[ns]')
+        else: self.values = np.full(n_rows, None, dtype=object)
+        self.valid = np.zeros(n_rows, dtype=bool)
+
+    def write(self, rows, values, valid):
+        """Écrit les valeurs valides ; une valeur non nulle écrase la précédente (comme le dict fitparse)."""
+        kind = values.dtype.kind
+        if self.values.dtype.kind != kind and self.values.dtype != object:
+            if self.values.dtype.kind == 'i' and kind == 'f': self.values = self.values.astype(np.float64)
+            elif not (self.values.dtype.kind == 'f' and kind == 'i'):
+                self.values = self.values.astype(object)
+        self.values[rows[valid]] = values[valid]
+        self.valid[rows[valid]] = True
+
+
+def _record_field_plan(field, base_num, size):
+    """Décrit comment produire la colonne d'un champ : (type de colonne, échelle, offset)."""
+    base_type = BASE_TYPES.get(base_num, BASE_TYPE_BYTE)
+    is_scalar = base_type.name not in ('string', 'byte') and size == base_type.size
+    if field is None:
+        kind = 'float' if base_type.name.startswith('float') else 'int'
+        return (kind if is_scalar else 'object'), None, None
+    if field.subfields:
+        raise FitDecodeUnsupported(f"Sous-champs non gérés dans 'record' ({field.name}).")
+    if not is_scalar or field.type.values or field.type.name in TYPES_OBJET:
+        return 'object', field.scale, field.offset
+    if field.type.name == 'date_time':
+        return 'datetime', None, None
+    if field.scale or base_type.name.startswith('float'):
+        return 'float', field.scale, field.offset
+    return 'int', None, field.offset
+
+
+def _gather(buffer, offsets, size):
+    """Rassemble les octets (offsets[i] : offsets[i] + size) de chaque message en un tableau (n, size)."""
+    return buffer[offsets[:, None] + np.arange(size)]
+
+
+def _invalid_mask(raw, base_num):
+    _, invalid = NUMPY_BASE_TYPES.get(base_num, ('u1', 0xFF))
+    if invalid is None: return np.isnan(raw)
+    return raw == invalid
+
+
+def _object_values(raw_bytes, field, base_num, endian):
+    """Chemin lent, pour les champs rares (énumérations, tableaux, chaînes) : valeur par valeur."""
+    values = np.empty(len(raw_bytes), dtype=object)
+    for i, item in enumerate(raw_bytes):
+        value = _parse_python_value(base_num, endian, item.tobytes())
+        if field is not None and value is not None:
+            value = _process_type(field.type.name, _apply_scale_offset(field.scale, field.offset, _render(field, value)))
+        values[i] = value
+    valid = np.array([v is not None for v in values], dtype=bool)
+    return values, valid
+
+
+def _decode_definition(buffer, definition, offsets, dev_types):
+    """Décode toutes les occurrences d'une définition 'record'. Rend [(nom, type, valeurs, valides)] dans l'ordre fitparse."""
+    mesg_type = MESSAGE_TYPES[MESG_NUM_RECORD]
+    rows = _gather(buffer, offsets, definition.size)
+    columns = []
+
+    for field_num, size, base_num, field_offset in definition.fields:
+        field = mesg_type.fields.get(field_num)
+        name = field.name if field else f'unknown_{field_num}'
+        kind, scale, offset = _record_field_plan(field, base_num, size)
+        field_bytes = rows[:, field_offset:field_offset + size]
+
+        if kind == 'object':
+            if field is not None and field.components:
+                raise FitDecodeUnsupported(f"Composants non gérés sur '{name}'.")
+            values, valid = _object_values(field_bytes, field, base_num, definition.endian)
+            columns.append((name, kind, values, valid))
+            continue
+
+        raw = np.ascontiguousarray(field_bytes).view(definition.endian + NUMPY_BASE_TYPES[base_num][0])[:, 0]
+        valid = ~_invalid_mask(raw, base_num)
+        # Composants (ex. altitude -> enhanced_altitude) : fitparse les émet avant le champ parent
+        for component in (field.components if field is not None and field.components else []):
+            if component.accumulate:
+                raise FitDecodeUnsupported(f"Composant cumulé non géré ({name}).")
+            cmp_field = mesg_type.fields[component.def_num]
+            if cmp_field.subfields or cmp_field.type.values or cmp_field.type.name in TYPES_OBJET + ('date_time',):
+                raise FitDecodeUnsupported(f"Composant non géré ({cmp_field.name}).")
+            cmp_raw = (raw.astype(np.int64) >> component.bit_offset) & ((1 << component.bits) - 1)
+            cmp_kind = 'float' if component.scale else 'int'
+            columns.append((cmp_field.name, cmp_kind, _scale(cmp_raw, component.scale, component.offset), valid))
+
+        if kind == 'datetime':
+            if (raw[valid] < DATE_TIME_MIN).any():
+                raise FitDecodeUnsupported("Horodatage relatif non géré.")
+            values = _to_datetime(raw)
+        else:
+            values = _scale(raw, scale, offset)
+        columns.append((name, kind, values, valid))
+
+    for field_num, size, dev_index, field_offset in definition.dev_fields:
+        dev_field = dev_types.get((dev_index, field_num))
+        if dev_field is None:
+            raise FitDecodeUnsupported(f"Champ développeur {dev_index}/{field_num} sans description.")
+        name, base_num = dev_field
+        fmt, _ = NUMPY_BASE_TYPES.get(base_num, (None, None))
+        if fmt is None or size != np.dtype(fmt).itemsize:
+            raise FitDecodeUnsupported(f"Champ développeur non scalaire ({name}).")
+        raw = np.ascontiguousarray(rows[:, field_offset:field_offset + size]).view(definition.endian + fmt)[:, 0]
+        kind = 'float' if fmt[0] == 'f' else 'int'
+        columns.append((name, kind, _scale(raw, None, None), ~_invalid_mask(raw, base_num)))
+    return columns
+
+
+def _to_datetime(raw):
+    return (raw.astype(np.int64) + UTC_REFERENCE).astype('datetime64[s]').astype('datetime64[ns]')
+
+
+def _scale(raw, scale, offset):
+    if scale:
+        values = raw.astype(np.float64) / scale
+    elif raw.dtype.kind == 'f':
+        values = raw.astype(np.float64)
+    else:
+        values = raw.astype(np.int64)
+    if offset: values = values - offset
+    return values
+
+
+def _compressed_timestamps(buffer, definitions, mesg_defs, mesg_offsets, mesg_time_offsets):
+    """Reconstitue les horodatages compressés (accumulateur 5 bits sur tous les messages, dans l'ordre)."""
+    ts_raw = np.full(len(mesg_defs), -1, dtype=np.int64)
+    for def_index, definition in enumerate(definitions):
+        for field_num, size, base_num, field_offset in definition.fields:
+            if field_num != FIELD_NUM_TIMESTAMP or size != 4: continue
+            idx = np.flatnonzero(mesg_defs == def_index)
+            raw = _gather(buffer, mesg_offsets[idx] + field_offset, 4).view(definition.endian + 'u4')[:, 0].astype(np.int64)
+            ts_raw[idx] = np.where(raw == 0xFFFFFFFF, -1, raw)
+
+    timestamps = np.full(len(mesg_defs), -1, dtype=np.int64)
+    accumulator = 0
+    for i in np.flatnonzero((ts_raw >= 0) | (mesg_time_offsets >= 0)):
+        if ts_raw[i] >= 0: accumulator = int(ts_raw[i])
+        time_offset = int(mesg_time_offsets[i])
+        if time_offset >= 0:
+            base = time_offset + (accumulator & ~0x1F)
+            if time_offset < (accumulator & 0x1F): base += 0x20
+            accumulator = base
+            timestamps[i] = accumulator
+    return timestamps
+
+
+def _decode_records(buffer, scan, record_mesgs, dev_types, timestamps):
+    """Décode un ensemble de messages 'record' (dans l'ordre du fichier) en DataFrame."""
+    definitions, mesg_defs, mesg_offsets, mesg_time_offsets = scan
+    n_rows = len(record_mesgs)
+
+    columns = {}
+    record_defs = mesg_defs[record_mesgs]
+    for def_index in np.unique(record_defs):  # Ordre des définitions = ordre d'apparition
+        rows = np.flatnonzero(record_defs == def_index)
+        mesgs = record_mesgs[rows]
+        for name, kind, values, valid in _decode_definition(buffer, definitions[def_index], mesg_offsets[mesgs], dev_types):
+            if name not in columns: columns[name] = _Column(kind, n_rows)
+            columns[name].write(rows, values, valid)
+
+    compressed = mesg_time_offsets[record_mesgs] >= 0
+    if compressed.any():
+        block_timestamps = timestamps[record_mesgs]
+        if (block_timestamps[compressed] < DATE_TIME_MIN).any():
+            raise FitDecodeUnsupported("Horodatage compressé relatif non géré.")
+        column = columns.setdefault('timestamp', _Column('datetime', n_rows))
+        column.write(np.arange(n_rows), _to_datetime(block_timestamps), compressed)
+
+    # Lignes sans aucun champ valide : ignorées, comme dans la boucle fitparse
+    keep = np.zeros(n_rows, dtype=bool)
+    for column in columns.values(): keep |= column.valid
+
+    # Colonnes dans l'ordre de leur première apparition
+    first_row = {name: int(np.argmax(column.valid[keep])) if keep.any() else 0 for name, column in columns.items()}
+    frame = {}
+    for name in sorted(columns, key=first_row.get):
+        column = columns[name]
+        values, valid = column.values[keep], column.valid[keep]
+        if values.dtype == np.int64 and not valid.all():
+            values = np.where(valid, values, np.nan)
+        elif values.dtype == object:
+            values[~valid] = np.nan
+        frame[name] = values
+    return pd.DataFrame(frame)
+
+
+def iter_record_blocks(data, block_size=None, scan=None):
+    """
+    Décode les messages 'record' par blocs d'au plus block_size messages
+    (None = un seul bloc), dans l'ordre du fichier. Chaque bloc est un
+    DataFrame typé ; leur concaténation est identique à read_record_frame.
+    Les définitions sont toutes vérifiées avant le premier bloc, de sorte que
+    FitDecodeUnsupported est levée d'emblée (sauf horodatage relatif, très rare).
+    """
+    if scan is None: scan = scan_fit(data)
+    definitions, mesg_defs, mesg_offsets, mesg_time_offsets = scan
+    buffer = np.frombuffer(data, dtype=np.uint8)
+
+    is_record = np.array([d.mesg_num == MESG_NUM_RECORD for d in definitions], dtype=bool)
+    record_mesgs = np.flatnonzero(is_record[mesg_defs]) if len(definitions) else np.array([], dtype=np.int64)
+    record_def_indexes = np.unique(mesg_defs[record_mesgs])
+
+    has_dev = any(definitions[i].dev_fields for i in record_def_indexes)
+    dev_types = read_dev_types(data, scan) if has_dev else {}
+    for def_index in record_def_indexes:  # Vérification à vide de chaque définition
+        _decode_definition(buffer, definitions[def_index], mesg_offsets[:0], dev_types)
+
+    timestamps = None
+    if (mesg_time_offsets[record_mesgs] >= 0).any():
+        timestamps = _compressed_timestamps(buffer, definitions, mesg_defs, mesg_offsets, mesg_time_offsets)
+
+    block_size = block_size or max(len(record_mesgs), 1)
+    for start in range(0, len(record_mesgs), block_size):
+        yield _decode_records(buffer, scan, record_mesgs[start:start + block_size], dev_types, timestamps)
+
+
+def read_record_frame(data, scan=None):
+    """
+    Décode tous les messages 'record' en colonnes NumPy préallouées, une
+    définition à la fois, et retourne un DataFrame équivalent à
+    pd.DataFrame([dict(champs non nuls) pour chaque record fitparse]).
+    Lève FitDecodeUnsupported pour les cas rares gérés seulement par fitparse.
+    """
+    blocks = list(iter_record_blocks(data, None, scan))
+    return blocks[0] if blocks else pd.DataFrame()
+
+
+# --- 4. Passe unique : un collecteur par type de message ---
+
+def read_fit_messages(data, names=('record', 'session', 'lap', 'event'), record_block_size=None):
+    """
+    Décode le fichier en un seul parcours et répartit chaque message vers le
+    collecteur de son type : 'record' en DataFrame colonnaire, les autres
+    (session, lap, event...) en listes de dicts, dans l'ordre du fichier.
+    Avec record_block_size, 'record' est un itérateur de blocs (iter_record_blocks).
+    """
+    scan = scan_fit(data)
+    definitions, mesg_defs, mesg_offsets, _ = scan
+    collectors = {name: [] for name in names if name != 'record'}
+    if 'record' in names:
+        if record_block_size: collectors['record'] = iter_record_blocks(data, record_block_size, scan)
+        else: collectors['record'] = read_record_frame(data, scan)
+
+    # Types de message (par définition) à décoder ligne par ligne
+    mesg_names = np.array([getattr(MESSAGE_TYPES.get(d.mesg_num), 'name', '') for d in definitions], dtype=object)
+    wanted = np.isin(mesg_names, [name for name in names if name != 'record'])
+    if not wanted.any():
+        return collectors
+
+    has_dev = any(definitions[i].dev_fields for i in np.flatnonzero(wanted))
+    dev_types = read_dev_types(data, scan) if has_dev else {}
+    for i in np.flatnonzero(wanted[mesg_defs]):
+        definition = definitions[mesg_defs[i]]
+        row = decode_row(data, int(mesg_offsets[i]), definition, dev_types)
+        if row: collectors[mesg_names[mesg_defs[i]]].append(row)
+    return collectors
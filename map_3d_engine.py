@@ -1,10 +1,13 @@
 import streamlit as st
 import pydeck as pdk
 import pandas as pd
+import numpy as np
+from downsampling import douglas_peucker_indices, gps_to_metres, cached_indices
 
 # --- CONSTANTES ---
 TERRARIUM_ELEVATION_TILE_URL = "https://s3.amazonaws.com/elevation-tiles-prod/terrarium/{z}/{x}/{y}.png"
 ELEVATION_DECODER_TERRARIUM = {"rScaler": 256, "gScaler": 1, "bScaler": 1 / 256, "offset": -32768}
+TRACK_POINT_BUDGET = 5000 # Points de la trace principale (Douglas-Peucker)
 
 def prepare_segment_data(segments):
     """Prépare les segments (montées/sprints) avec détection flexible des colonnes."""
@@ -25,54 +28,91 @@ def prepare_segment_data(segments):
                 path_data.append({"path": df_coords.values.tolist()})
     return path_data
 
-def create_pydeck_chart(df, climb_segments, sprint_segments, selected_point_data=None):
-    if "MAPBOX_API_KEY" not in st.secrets:
-        st.error("Clé Mapbox manquante.")
-        return None
-    
-    token = st.secrets["MAPBOX_API_KEY"]
+def build_distance_index(df):
+    """
+    Index du curseur de relecture : (distances triées, positions dans df),
+    sans les points sans distance. Construit une fois par sortie.
+    """
+    distance = df['distance'].to_numpy(dtype=np.float64, na_value=np.nan)
+    positions = np.flatnonzero(~np.isnan(distance))
+    order = np.argsort(distance[positions], kind='stable')
+    return distance[positions][order], positions[order]
 
+def nearest_position(distance_index, selected_distance):
+    """
+    Position du point le plus proche de selected_distance par recherche
+    binaire (O(log n)), le premier en cas d'égalité comme idxmin. None si vide.
+    """
+    distances, positions = distance_index
+    if len(distances) == 0: return None
+    i = int(np.searchsorted(distances, selected_distance))
+    if i == len(distances) or (i > 0 and selected_distance - distances[i - 1] <= distances[i] - selected_distance):
+        i = int(np.searchsorted(distances, distances[i - 1]))  # Premier point à cette distance
+    return int(positions[i])
+
+def build_static_layers(df, climb_segments, sprint_segments, token, cache_key=None):
+    """
+    Couches fixes de la carte (relief, trace, montées, sprints) et vue par
+    défaut : ne dépendent pas du curseur, à construire une fois par sortie.
+    """
     # 1. Trace principale (Orange)
-    # Sampling léger pour la performance
+    # TRACK_POINT_BUDGET points choisis par Douglas-Peucker (lacets gardés), en cache sous cache_key
     df_main = df[['position_long', 'position_lat', 'altitude']].dropna()
-    sampling = max(1, len(df_main) // 15000) 
-    main_coords = df_main.iloc[::sampling].values.tolist()
+    kept = cached_indices((cache_key, 'track3d', TRACK_POINT_BUDGET) if cache_key is not None else None,
+                          lambda: douglas_peucker_indices(*gps_to_metres(df_main['position_lat'], df_main['position_long']), TRACK_POINT_BUDGET))
+    main_coords = df_main.iloc[kept].values.tolist()
 
     # --- COUCHES DE LA CARTE ---
-    layers = [
+    layers = {
         # Relief 3D (Terrain)
-        pdk.Layer("TerrainLayer", id="terrain", 
+        'terrain': pdk.Layer("TerrainLayer", id="terrain", 
                   elevation_decoder=ELEVATION_DECODER_TERRARIUM, 
                   elevation_data=TERRARIUM_ELEVATION_TILE_URL, 
                   texture=f"https://api.mapbox.com/v4/mapbox.satellite/{{z}}/{{x}}/{{y}}@2x.jpg?access_token={token}"),
         
         # Trace Orange (DepthTest: False pour qu'elle soit toujours visible)
-        pdk.Layer("PathLayer", id="track", 
+        'track': pdk.Layer("PathLayer", id="track", 
                   data=[{"path": main_coords}], 
                   get_path="path", get_color=[255, 69, 0, 255], 
                   width_min_pixels=4, parameters={"depthTest": False})
-    ]
+    }
 
     # 2. Montées (Rose)
     data_climbs = prepare_segment_data(climb_segments)
     if data_climbs:
-        layers.append(pdk.Layer("PathLayer", id="climbs-3d", data=data_climbs,
+        layers['climbs'] = pdk.Layer("PathLayer", id="climbs-3d", data=data_climbs,
                                 get_path="path", get_color=[255, 0, 255, 255], 
-                                width_min_pixels=6, parameters={"depthTest": False}))
+                                width_min_pixels=6, parameters={"depthTest": False})
 
     # 3. Sprints (Cyan)
     data_sprints = prepare_segment_data(sprint_segments)
     if data_sprints:
-        layers.append(pdk.Layer("PathLayer", id="sprints-3d", data=data_sprints,
+        layers['sprints'] = pdk.Layer("PathLayer", id="sprints-3d", data=data_sprints,
                                 get_path="path", get_color=[0, 255, 255, 255], 
-                                width_min_pixels=6, parameters={"depthTest": False}))
+                                width_min_pixels=6, parameters={"depthTest": False})
+
+    # Vue par défaut (sans curseur)
+    default_view = pdk.ViewState(latitude=df_main['position_lat'].mean(), 
+                                 longitude=df_main['position_long'].mean(), 
+                                 zoom=12, pitch=40)
+    return layers, default_view
+
+def create_replay_deck(static_layers, token, selected_point_data=None, show_climbs=True, show_sprints=True):
+    """
+    Carte d'une image de la relecture : réutilise les couches fixes de
+    build_static_layers, seuls le point cycliste et la caméra sont recréés.
+    """
+    layers, default_view = static_layers
+    deck_layers = [layers['terrain'], layers['track']]
+    if show_climbs and 'climbs' in layers: deck_layers.append(layers['climbs'])
+    if show_sprints and 'sprints' in layers: deck_layers.append(layers['sprints'])
 
     # 4. Point Cycliste (Rouge) & Caméra
     if selected_point_data is not None:
         pt = selected_point_data
         
         # COUCHE CYCLISTE
-        layers.append(pdk.Layer(
+        deck_layers.append(pdk.Layer(
             "ScatterplotLayer", 
             id="cyclist",
             data=[{"pos": [pt['position_long'], pt['position_lat'], pt['altitude'] + 20]}],
@@ -98,10 +138,16 @@ def create_pydeck_chart(df, climb_segments, sprint_segments, selected_point_data
             transition_duration=300
         )
     else:
-        # Vue par défaut
-        view_state = pdk.ViewState(latitude=df_main['position_lat'].mean(), 
-                                   longitude=df_main['position_long'].mean(), 
-                                   zoom=12, pitch=40)
+        view_state = default_view
 
-    return pdk.Deck(layers=layers, initial_view_state=view_state, 
+    return pdk.Deck(layers=deck_layers, initial_view_state=view_state, 
                     map_style="mapbox://styles/mapbox/satellite-v9", api_keys={"mapbox": token})
+
+def create_pydeck_chart(df, climb_segments, sprint_segments, selected_point_data=None):
+    if "MAPBOX_API_KEY" not in st.secrets:
+        st.error("Clé Mapbox manquante.")
+        return None
+    
+    token = st.secrets["MAPBOX_API_KEY"]
+    static_layers = build_static_layers(df, climb_segments, sprint_segments, token)
+    return create_replay_deck(static_layers, token, selected_point_data)
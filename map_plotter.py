@@ -4,6 +4,8 @@ import numpy as np
 import pandas as pd
 import plotly.colors
 import streamlit as st
+from climb_processing import run_length_encode, run_means, as_float, concat_ranges
+from downsampling import douglas_peucker_indices, gps_to_metres, cached_indices
 
 # Palette de couleurs "classique" (Vert -> Jaune -> Orange -> Rouge -> Noir)
 CUSTOM_MAP_COLORSCALE = [
@@ -14,20 +16,40 @@ CUSTOM_MAP_COLORSCALE = [
     [1.0, 'rgb(0,0,0)']      # Noir
 ]
 PUISSANCE_MAX_ECHELLE = 1000.0 
+PUISSANCE_PAS_COULEUR = 20.0 # Pas (en W) des paliers de couleur : 51 couleurs au plus
+CHUNK_DISTANCE_MAP = 250
+MAP_POINT_BUDGET = 5000 # Points du tracé (Douglas-Peucker), en plus des extrémités des chunks
 
-def create_map_figure(df, mapbox_style="carto-positron"):
+def create_map_figure(df, mapbox_style="carto-positron", cache_key=None):
     """
     Crée une carte Scattermapbox (Version Lignes colorées par Chunks)
     avec les styles gratuits.
     """
+    return set_map_style(build_map_figure(df, cache_key), mapbox_style)
+
+
+def set_map_style(fig, mapbox_style):
+    """Change le fond de carte d'une figure déjà construite (la géométrie est réutilisée)."""
+    fig.update_layout(mapbox_style=mapbox_style)
+    return fig
+
+
+def build_map_figure(df, cache_key=None):
+    """
+    Géométrie de la carte, sans le fond (voir set_map_style) : chunks de
+    CHUNK_DISTANCE_MAP colorés par puissance moyenne, calculés sur des tableaux
+    et regroupés en une trace par palier de couleur (PUISSANCE_PAS_COULEUR),
+    les chunks séparés par des trous (None). Le tracé garde MAP_POINT_BUDGET
+    points (Douglas-Peucker, en cache sous cache_key) plus les extrémités de
+    chaque chunk ; les moyennes utilisent tous les points.
+    """
     
     # --- 1. Préparation des données ---
-    df_map = df.copy()
-    
-    if 'position_lat' not in df_map.columns or 'position_long' not in df_map.columns:
+    if 'position_lat' not in df.columns or 'position_long' not in df.columns:
         st.warning("Données GPS (position_lat/long) non trouvées.")
         return go.Figure()
 
+    df_map = df[[col for col in ['position_lat', 'position_long', 'distance', 'estimated_power'] if col in df.columns]]
     df_map = df_map.dropna(subset=['position_lat', 'position_long'])
     
     if df_map.empty:
@@ -37,7 +59,6 @@ def create_map_figure(df, mapbox_style="carto-positron"):
     has_power_data = 'estimated_power' in df_map.columns and not df_map['estimated_power'].isnull().all()
     
     if has_power_data:
-        df_map['plot_color_val'] = df_map['estimated_power']
         colorscale = CUSTOM_MAP_COLORSCALE
         min_color_val = 0
         max_color_val = PUISSANCE_MAX_ECHELLE
@@ -45,46 +66,69 @@ def create_map_figure(df, mapbox_style="carto-positron"):
         colorbar_title = 'Puissance (W)'
     else:
         st.warning("Données de puissance estimée non disponibles. Tracé simple.")
-        df_map['plot_color_val'] = 0
         colorscale = 'Blues'
         min_color_val = 0; max_color_val = 1; range_color = 1.0
         colorbar_title = ''
 
-    # --- 2. Grouper par Chunks de Distance ---
-    CHUNK_DISTANCE_MAP = 250 
-    
+    # --- 2. Chunks de Distance (ordre d'un groupby trié, sans les distances manquantes) ---
     if 'distance' not in df_map.columns:
         st.error("Colonne 'distance' manquante pour les chunks de carte.")
         return go.Figure()
         
-    df_map['distance_bin'] = (df_map['distance'] // CHUNK_DISTANCE_MAP) * CHUNK_DISTANCE_MAP
-    
-    try: grouped = df_map.groupby('distance_bin', observed=True)
-    except TypeError: grouped = df_map.groupby('distance_bin')
-    
     center_lat = df_map['position_lat'].mean()
     center_lon = df_map['position_long'].mean()
 
+    distance = df_map['distance'].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = np.flatnonzero(~np.isnan(distance))
+    bins = (distance[valid] // CHUNK_DISTANCE_MAP) * CHUNK_DISTANCE_MAP
+    sort = np.argsort(bins, kind='stable')
+    order = valid[sort]; bins = bins[sort]
+    lat = df_map['position_lat'].to_numpy(dtype=np.float64)[order]
+    lon = df_map['position_long'].to_numpy(dtype=np.float64)[order]
+    chunk_starts, chunk_ends, chunk_bins = run_length_encode(bins)
+    kept = cached_indices((cache_key, 'map2d', MAP_POINT_BUDGET) if cache_key is not None else None,
+                          lambda: douglas_peucker_indices(*gps_to_metres(lat, lon), MAP_POINT_BUDGET))
+    keep = np.zeros(len(lat) + 1, dtype=bool) # + position n (trou), toujours gardée
+    keep[kept] = True; keep[chunk_starts] = True; keep[chunk_ends - 1] = True; keep[-1] = True
+
     fig = go.Figure()
-    
-    plotly_colorscale = colorscale
 
-    # --- 3. Créer une trace par CHUNK coloré ---
-    for name, group in grouped:
-        if group.empty: continue
-            
+    # --- 3. Une trace par palier de couleur (chunks séparés par des trous) ---
+    if has_power_data:
+        avg_power = run_means(as_float(df_map['estimated_power'])[order], chunk_starts)
+        power_norm = np.clip((avg_power - min_color_val) / range_color, 0.00001, 0.99999)
+        power_norm[np.isnan(power_norm)] = 0.99999
+        paliers = np.round(power_norm * range_color / PUISSANCE_PAS_COULEUR).astype(np.int64)
+    else:
+        avg_power = np.full(len(chunk_starts), np.nan)
+        paliers = np.zeros(len(chunk_starts), dtype=np.int64)
+
+    lat_ext = np.r_[lat, np.nan]; lon_ext = np.r_[lon, np.nan]
+    for palier in np.unique(paliers):
+        chunks = np.flatnonzero(paliers == palier)
+        # Points de chaque chunk, suivis d'une position n (NaN) qui coupe la ligne
+        ends = chunk_ends[chunks] + 1
+        positions = concat_ranges(chunk_starts[chunks], ends)
+        last = np.cumsum(ends - chunk_starts[chunks]) - 1
+        positions[last] = len(lat)
+        chunk_of_point = np.repeat(chunks, ends - chunk_starts[chunks])
+        drawn = keep[positions]; positions = positions[drawn]; chunk_of_point = chunk_of_point[drawn]
+
         if has_power_data:
-            avg_power = group['plot_color_val'].mean()
-            power_norm = max(0.00001, min(0.99999, (avg_power - min_color_val) / range_color))
-            segment_color_rgb_str = plotly.colors.sample_colorscale(plotly_colorscale, power_norm)[0]
-            hovertemplate = f"<b>Puissance Moy:</b> {avg_power:.0f} W<br><b>Distance:</b> {name}m - {name + CHUNK_DISTANCE_MAP}m<extra></extra>"
+            color_norm = min(0.99999, max(0.00001, palier * PUISSANCE_PAS_COULEUR / range_color))
+            segment_color_rgb_str = plotly.colors.sample_colorscale(colorscale, color_norm)[0]
+            customdata = np.column_stack([avg_power[chunk_of_point], chunk_bins[chunk_of_point], chunk_bins[chunk_of_point] + CHUNK_DISTANCE_MAP]).round()
+            if not np.isnan(customdata).any(): customdata = customdata.astype(np.int64) # JSON plus court
+            hovertemplate = "<b>Puissance Moy:</b> %{customdata[0]:.0f} W<br><b>Distance:</b> %{customdata[1]}m - %{customdata[2]}m<extra></extra>"
         else:
             segment_color_rgb_str = 'rgb(0,104,201)'
+            customdata = None
             hovertemplate = "Trace GPS<extra></extra>"
 
         fig.add_trace(go.Scattermapbox(
-            lat=group['position_lat'],
-            lon=group['position_long'],
+            lat=lat_ext[positions[:-1]],
+            lon=lon_ext[positions[:-1]],
+            customdata=customdata[:-1] if customdata is not None else None,
             mode='lines',
             line=dict(width=4, color=segment_color_rgb_str),
             hovertemplate=hovertemplate,
@@ -106,11 +150,10 @@ def create_map_figure(df, mapbox_style="carto-positron"):
             hoverinfo='none', showlegend=False
         ))
 
-    # --- 5. Mise en forme de la carte ---
+    # --- 5. Mise en forme de la carte (le fond est posé par set_map_style) ---
     fig.update_layout(
         title="Carte du Parcours (Lignes colorées par Puissance Moyenne)",
         showlegend=False,
-        mapbox_style=mapbox_style, # Utilise le style passé (ex: "open-street-map")
         mapbox=dict(
             center=go.layout.mapbox.Center(lat=center_lat, lon=center_lon),
             zoom=12 
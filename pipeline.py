@@ -0,0 +1,131 @@
+# pipeline.py
+"""
+Chaîne d'analyse sous forme de graphe d'étapes mises en cache. Chaque étape est
+indexée par la clé de ses entrées et la valeur de ses propres paramètres : un
+changement de réglage ne recalcule que les étapes situées en aval.
+
+    ride ─┬─ power (poids, Crr, CdA) ──┐
+          └─ derivatives ──────────────┴─ analysed ─┬─ climb_blocks (pente min.)
+                                                    │    └─ climb_ranges (fusion gap)
+                                                    │         └─ climbs (longueur min.)
+                                                    ├─ sprints (5 réglages sprint)
+                                                    └─ curves (meilleures moyennes par durée)
+
+climbs et sprints sont des index de segments (positions entières [start, end)
+dans analysed et statistiques numériques), formatés seulement à l'affichage.
+"""
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+
+from analysis_warnings import capture_warnings
+from diagnostics import row_count
+from power_estimator import estimate_power
+from climb_processing import (
+    calculate_derivatives,
+    identify_and_filter_initial_climbs,
+    merge_climb_ranges,
+    climb_segment_index
+)
+from sprint_detector import sprint_segment_index
+from power_curves import mean_max_curves
+
+# Valeurs par défaut de la barre latérale de l'application
+DEFAULT_PARAMS = {
+    'total_weight_kg': 77.0, 'crr': 0.0043, 'cda': 0.38,
+    'min_climb_distance': 400, 'min_pente': 3.0, 'max_gap_climb': 200,
+    'min_speed_kmh': 40.0, 'min_duration_sec': 5, 'min_gradient': -5.0, 'max_gradient': 5.0,
+    'max_gap_distance_m': 50, 'rewind_sec': 10,
+}
+
+Stage = namedtuple('Stage', ['name', 'deps', 'params', 'func'])
+
+
+def _power(df, total_weight_kg, crr, cda):
+    """'record' + colonne estimated_power."""
+    return df.join(estimate_power(df, total_weight_kg, crr, cda))
+
+
+def _analysed(df_derivatives, df_power):
+    """Dérivées (pente, deltas...) + puissance : le df_analyzed de l'application."""
+    return df_derivatives.join(df_power[['estimated_power']])
+
+
+def _climb_ranges(df_blocks, max_gap_climb):
+    return merge_climb_ranges(df_blocks, max_gap_climb)
+
+
+def _climbs(df_blocks, climb_ranges, min_climb_distance):
+    return climb_segment_index(df_blocks, *climb_ranges, min_climb_distance)
+
+
+STAGES = OrderedDict((stage.name, stage) for stage in [
+    Stage('power', ('ride',), ('total_weight_kg', 'crr', 'cda'), _power),
+    Stage('derivatives', ('ride',), (), calculate_derivatives),
+    Stage('analysed', ('derivatives', 'power'), (), _analysed),
+    Stage('climb_blocks', ('analysed',), ('min_pente',), identify_and_filter_initial_climbs),
+    Stage('climb_ranges', ('climb_blocks',), ('max_gap_climb',), _climb_ranges),
+    Stage('climbs', ('climb_blocks', 'climb_ranges'), ('min_climb_distance',), _climbs),
+    Stage('sprints', ('analysed',), ('min_speed_kmh', 'min_gradient', 'max_gradient', 'min_duration_sec', 'max_gap_distance_m', 'rewind_sec'), sprint_segment_index),
+    Stage('curves', ('analysed',), (), mean_max_curves),
+])
+
+
+class AnalysisPipeline:
+    """
+    Exécute les étapes de STAGES à la demande, avec un cache LRU de max_entries
+    résultats par étape. Les avertissements (AnalysisWarning) d'une étape sont
+    gardés avec son résultat et rendus aussi lors d'un succès de cache.
+    Après chaque run(), last_run donne pour chaque étape demandée
+    (statut 'cache' ou 'calcul', durée en secondes) ; avec un monitor
+    (diagnostics.StageMonitor), chaque étape y est aussi mesurée (mémoire, lignes).
+    """
+
+    def __init__(self, max_entries=4, stages=STAGES):
+        self.stages = stages
+        self.max_entries = max_entries
+        self._cache = {name: OrderedDict() for name in stages}
+        self.last_run = OrderedDict()
+        self.warnings = []
+        self._monitor = None
+
+    def run(self, ride_key, df, params, targets=('power', 'analysed', 'climbs', 'sprints'), monitor=None):
+        """
+        Calcule les étapes targets (et leurs dépendances) pour la sortie df,
+        identifiée par ride_key (empreinte du fichier). Retourne {étape: résultat}.
+        """
+        params = {**DEFAULT_PARAMS, **params}
+        self.last_run = OrderedDict(); self.warnings = []; self._monitor = monitor
+        inputs = {'ride': (ride_key, df)}
+        results = {}
+        for name in targets:
+            results[name] = self._compute(name, inputs, params)[1]
+        return results
+
+    def _compute(self, name, inputs, params):
+        """(clé, résultat) de l'étape name, depuis le cache si entrées et paramètres n'ont pas changé."""
+        if name in inputs: return inputs[name]
+        stage = self.stages[name]
+        deps = [self._compute(dep, inputs, params) for dep in stage.deps]
+        stage_params = {p: params[p] for p in stage.params}
+        key = (tuple(dep_key for dep_key, _ in deps), tuple(stage_params.values()))
+
+        cache = self._cache[name]
+        if key in cache:
+            cache.move_to_end(key)
+            value, messages = cache[key]
+            if name not in self.last_run:
+                self.last_run[name] = ('cache', 0.0); self.warnings.extend(messages)
+                if self._monitor: self._monitor.record(name, 'cache', rows_out=row_count(value))
+            return key, value
+
+        start = time.perf_counter()
+        measured = self._monitor.stage(name, rows_in=row_count(deps[0][1])) if self._monitor else nullcontext({})
+        with capture_warnings() as messages, measured as entry:
+            value = stage.func(*(dep_value for _, dep_value in deps), **stage_params)
+            entry['lignes_sortie'] = row_count(value)
+        self.last_run[name] = ('calcul', time.perf_counter() - start)
+        self.warnings.extend(messages)
+        cache[key] = (value, messages)
+        while len(cache) > self.max_entries: cache.popitem(last=False)
+        return key, value
@@ -4,6 +4,7 @@ import numpy as np
 import pandas as pd
 import plotly.colors
 import streamlit as st
+from climb_processing import run_length_encode, run_means, concat_ranges
 
 def create_climb_figure(df_climb, alt_col_to_use, CHUNK_DISTANCE_DISPLAY, resultats_montées, index):
     """Crée la figure Plotly avec un design épuré."""
@@ -24,38 +25,32 @@ def create_climb_figure(df_climb, alt_col_to_use, CHUNK_DISTANCE_DISPLAY, result
     df_climb.loc[:, 'dist_relative'] = df_climb['distance'] - start_distance_abs
     df_climb.loc[:, 'speed_kmh'] = df_climb['speed'] * 3.6
     
-    df_climb.loc[:, 'distance_bin'] = (df_climb['dist_relative'] // CHUNK_DISTANCE_DISPLAY) * CHUNK_DISTANCE_DISPLAY
-    try:
-        df_climb_chunks = df_climb.groupby('distance_bin', observed=True).agg(start_dist=('dist_relative', 'first'), end_dist=('dist_relative', 'last'), start_alt=(alt_col_to_use, 'first'), end_alt=(alt_col_to_use, 'last'), mid_dist=('dist_relative', 'mean')).reset_index()
-    except TypeError:
-         df_climb_chunks = df_climb.groupby('distance_bin').agg(start_dist=('dist_relative', 'first'), end_dist=('dist_relative', 'last'), start_alt=(alt_col_to_use, 'first'), end_alt=(alt_col_to_use, 'last'), mid_dist=('dist_relative', 'mean')).reset_index()
-
-    df_climb_chunks['delta_alt'] = df_climb_chunks['end_alt'] - df_climb_chunks['start_alt']
-    df_climb_chunks['delta_dist'] = df_climb_chunks['end_dist'] - df_climb_chunks['start_dist']
-    df_climb_chunks['pente_chunk'] = np.where(df_climb_chunks['delta_dist'] == 0, 0, (df_climb_chunks['delta_alt'] / df_climb_chunks['delta_dist']) * 100).round(1)
+    # Tronçons de CHUNK_DISTANCE_DISPLAY : bornes positionnelles [début, fin) en une passe
+    # (ordre d'un groupby trié ; la distance étant cumulée, chaque tronçon est une plage contiguë)
+    dist_relative = df_climb['dist_relative'].to_numpy(dtype=np.float64); altitude = df_climb[alt_col_to_use].to_numpy(dtype=np.float64)
+    bins = (dist_relative // CHUNK_DISTANCE_DISPLAY) * CHUNK_DISTANCE_DISPLAY
+    order = np.argsort(bins, kind='stable'); dist_relative, altitude = dist_relative[order], altitude[order]
+    chunk_starts, chunk_ends, _ = run_length_encode(bins[order]); chunk_last = chunk_ends - 1
+    delta_dist = dist_relative[chunk_last] - dist_relative[chunk_starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pente_chunk = np.where(delta_dist == 0, 0, ((altitude[chunk_last] - altitude[chunk_starts]) / delta_dist) * 100).round(1)
     
     fig = go.Figure()
 
-    # Trace 1: Remplissage (Blocs Synchronisés)
-    for _, row in df_climb_chunks.iterrows():
-        pente_norm = max(0, min(1, row['pente_chunk'] / PENTE_MAX_COULEUR))
+    # Trace 1: Remplissage (Blocs Synchronisés) : une trace par couleur (pente au 0.1 % près),
+    # chaque bloc va jusqu'au premier point du suivant et se termine par un trou (None)
+    n_points = len(dist_relative)
+    fill_ends = np.minimum(chunk_ends + 1, n_points)
+    x_ext = np.r_[dist_relative, np.nan]; y_ext = np.r_[altitude, np.nan]
+    for pente in np.unique(pente_chunk):
+        blocs = pente_chunk == pente
+        positions = concat_ranges(chunk_starts[blocs], fill_ends[blocs] + 1)
+        positions[np.cumsum(fill_ends[blocs] + 1 - chunk_starts[blocs]) - 1] = n_points
+        pente_norm = max(0, min(1, pente / PENTE_MAX_COULEUR))
         epsilon = 1e-9; pente_norm_clamped = max(epsilon, min(1.0 - epsilon, pente_norm))
         color_rgb_str = plotly.colors.sample_colorscale(CUSTOM_COLORSCALE, pente_norm_clamped)[0]
         fill_color_with_alpha = f'rgba({color_rgb_str[4:-1]}, 0.7)'
-        mask_chunk = (df_climb['dist_relative'] >= row['start_dist']) & (df_climb['dist_relative'] <= row['end_dist'])
-        df_fill_segment = df_climb.loc[mask_chunk]
-        if not df_fill_segment.empty:
-            last_index_label = df_fill_segment.index[-1]
-            try:
-                last_iloc_position = df_climb.index.get_loc(last_index_label)
-                next_iloc_position = last_iloc_position + 1
-                if next_iloc_position < len(df_climb):
-                    next_index_label = df_climb.index[next_iloc_position]
-                    next_point = df_climb.loc[[next_index_label]]
-                    df_fill_segment = pd.concat([df_fill_segment, next_point])
-            except (KeyError, IndexError): pass
-        if not df_fill_segment.empty:
-            fig.add_trace(go.Scatter(x=df_fill_segment['dist_relative'], y=df_fill_segment[alt_col_to_use], mode='lines', line=dict(width=0), fill='tozeroy', fillcolor=fill_color_with_alpha, hoverinfo='none', showlegend=False))
+        fig.add_trace(go.Scatter(x=x_ext[positions[:-1]], y=y_ext[positions[:-1]], mode='lines', line=dict(width=0), fill='tozeroy', fillcolor=fill_color_with_alpha, hoverinfo='none', showlegend=False))
     
     # Trace 2: Ligne de profil noire
     fig.add_trace(go.Scatter(x=df_climb['dist_relative'], y=df_climb[alt_col_to_use], mode='lines', line=dict(color='black', width=1.5), hoverinfo='none', showlegend=False))
@@ -89,15 +84,14 @@ def create_climb_figure(df_climb, alt_col_to_use, CHUNK_DISTANCE_DISPLAY, result
         customdata=final_customdata, hovertemplate=hovertemplate_str
     ))
     
-    # Trace 4: Étiquettes
-    for _, row in df_climb_chunks.iterrows():
-        if row['pente_chunk'] > 0.5:
-            mask = (df_climb['dist_relative'] >= row['start_dist']) & (df_climb['dist_relative'] <= row['end_dist'])
-            mean_alt_chunk = df_climb.loc[mask, alt_col_to_use].mean() if mask.any() else start_altitude_abs
-            max_alt_climb = df_climb[alt_col_to_use].max() if not df_climb.empty else start_altitude_abs
-            if pd.notna(mean_alt_chunk):
-                mid_y_altitude = mean_alt_chunk + (max_alt_climb - start_altitude_abs) * 0.05
-                fig.add_annotation(x=row['mid_dist'], y=mid_y_altitude, text=f"<b>{row['pente_chunk']:.1f}%</b>", showarrow=False, font=dict(size=10, color="white", family="Arial Black"), yshift=8)
+    # Trace 4: Étiquettes (ajoutées en une fois au layout)
+    labelled = np.flatnonzero(pente_chunk > 0.5)
+    mid_dist = run_means(dist_relative, chunk_starts)[labelled]
+    mid_y_altitude = run_means(altitude, chunk_starts)[labelled] + (altitude.max() - start_altitude_abs) * 0.05
+    fig.update_layout(annotations=[
+        dict(x=x, y=y, text=f"<b>{pente:.1f}%</b>", showarrow=False, font=dict(size=10, color="white", family="Arial Black"), yshift=8)
+        for x, y, pente in zip(mid_dist.tolist(), mid_y_altitude.tolist(), pente_chunk[labelled].tolist())
+    ])
     
     # Mise en forme
     if index < len(resultats_montées): climb_info = pd.DataFrame(resultats_montées).iloc[index]
@@ -251,21 +245,34 @@ def create_sprint_figure(df_sprint_segment, sprint_info, index, display_mode="co
     return fig
 
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+def create_mean_max_figure(curves):
+    """
+    Courbes puissance-durée et vitesse-durée (power_curves.mean_max_curves),
+    durées en échelle logarithmique.
+    """
+    fig = go.Figure()
+    color_vitesse = "#0068C9"; color_puissance = "#D62728"
+    if 'puissance_w' in curves.columns:
+        fig.add_trace(go.Scatter(x=curves.index, y=curves['puissance_w'], mode='lines', name='Puissance Est. (W)',
+                                 line=dict(color=color_puissance, width=2), yaxis='y1',
+                                 hovertemplate='<b>Durée:</b> %{x} s<br><b>Puissance:</b> %{y:.0f} W<extra></extra>'))
+    if 'vitesse_kmh' in curves.columns:
+        fig.add_trace(go.Scatter(x=curves.index, y=curves['vitesse_kmh'], mode='lines', name='Vitesse (km/h)',
+                                 line=dict(color=color_vitesse, width=2), yaxis='y2',
+                                 hovertemplate='<b>Durée:</b> %{x} s<br><b>Vitesse:</b> %{y:.1f} km/h<extra></extra>'))
+    ticks = [t for t in (1, 5, 15, 30, 60, 300, 1200, 3600, 4 * 3600) if len(curves) and t <= curves.index[-1]]
+    fig.update_layout(
+        title=dict(text="Meilleures Moyennes par Durée", x=0.5),
+        height=400,
+        template="plotly_white",
+        font=dict(family="Arial, sans-serif", size=12, color="#333333"),
+        xaxis=dict(title='Durée', type='log', gridcolor='#EAEAEA', tickvals=ticks,
+                   ticktext=[f"{t} s" if t < 60 else (f"{t // 60} min" if t < 3600 else f"{t // 3600} h") for t in ticks]),
+        yaxis=dict(title='Puissance Est. (W)', color=color_puissance, gridcolor='#EAEAEA', side='left', rangemode='tozero'),
+        yaxis2=dict(title='Vitesse (km/h)', color=color_vitesse, overlaying='y', side='right', showgrid=False, rangemode='tozero'),
+        hovermode='x unified',
+        legend=dict(x=0.01, y=1.15, orientation='h', bgcolor='rgba(0,0,0,0)'),
+        margin=dict(l=50, r=50, t=80, b=50),
+        hoverlabel=dict(bgcolor="white", bordercolor="#E0E0E0", font=dict(color="#333333"))
+    )
+    return fig
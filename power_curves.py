@@ -0,0 +1,82 @@
+# power_curves.py
+"""
+Courbes puissance-durée et vitesse-durée (meilleures moyennes) d'une sortie,
+et enveloppe de saison sur plusieurs sorties.
+
+La puissance et la distance sont intégrées une fois (énergie, distance
+cumulées) puis ramenées sur une grille de 1 s : la meilleure moyenne sur d
+secondes est le plus grand écart cumul[t + d] - cumul[t], divisé par d, soit
+un passage vectorisé par durée. Les durées suivent une grille fixe (chaque
+seconde jusqu'à SHORT_DURATIONS_S, puis un pas géométrique de CURVE_STEP,
+plus KEY_DURATIONS_S et la durée de la sortie) : O(n log n) au lieu de O(n²)
+pour toutes les durées, et la même grille pour toutes les sorties, ce qui
+permet de fusionner les courbes sans relire les enregistrements.
+"""
+import numpy as np
+import pandas as pd
+
+from climb_processing import as_float
+
+SHORT_DURATIONS_S = 120 # Toutes les secondes jusqu'ici (sprints, efforts courts)
+CURVE_STEP = 1.03 # Puis une durée tous les 3 %
+KEY_DURATIONS_S = (300, 600, 1200, 1800, 3600, 7200, 10800, 14400, 18000) # Durées de référence, toujours présentes
+MAX_RECORD_GAP_S = 5 # Un point après une pause ne compte que pour ce temps (roue arrêtée)
+CURVE_COLUMNS = {'puissance_w': 'estimated_power', 'vitesse_kmh': 'distance'}
+
+
+def curve_durations(max_duration):
+    """Grille de durées (s, entiers croissants) jusqu'à max_duration inclus."""
+    max_duration = int(max_duration)
+    if max_duration < 1: return np.array([], dtype=np.int64)
+    n_long = int(np.ceil(np.log(max(max_duration / SHORT_DURATIONS_S, 1)) / np.log(CURVE_STEP))) + 1
+    long = np.round(SHORT_DURATIONS_S * CURVE_STEP ** np.arange(n_long)).astype(np.int64)
+    durations = np.unique(np.r_[np.arange(1, SHORT_DURATIONS_S + 1), long, KEY_DURATIONS_S, max_duration])
+    return durations[durations <= max_duration]
+
+
+def best_averages(cumulative, durations):
+    """Meilleure moyenne sur chaque durée d'une grandeur cumulée échantillonnée toutes les secondes."""
+    cumulative = np.asarray(cumulative, dtype=np.float64)
+    return np.array([(cumulative[d:] - cumulative[:-d]).max() / d for d in durations], dtype=np.float64)
+
+
+def mean_max_curves(df):
+    """
+    Courbes d'une sortie (index temporel) : DataFrame indexé par duree_s, avec
+    puissance_w (meilleure puissance estimée moyenne) et vitesse_kmh (meilleure
+    vitesse moyenne, depuis la distance) selon les colonnes présentes.
+    """
+    available = {name: col for name, col in CURVE_COLUMNS.items() if col in df.columns}
+    if not isinstance(df.index, pd.DatetimeIndex) or len(df) < 2 or not available:
+        return pd.DataFrame(columns=list(available), index=pd.Index([], name='duree_s'), dtype=np.float64)
+
+    seconds = np.asarray((df.index - df.index[0]) / pd.Timedelta(seconds=1))
+    grid = np.arange(int(seconds[-1]) + 1)
+    durations = curve_durations(grid[-1])
+    curves = {}
+    if 'puissance_w' in available:
+        power = np.nan_to_num(as_float(df[available['puissance_w']]))
+        delta_time = np.clip(np.diff(seconds, prepend=seconds[0]), 0, MAX_RECORD_GAP_S)
+        energy = np.cumsum(power * delta_time)
+        curves['puissance_w'] = best_averages(np.interp(grid, seconds, energy), durations)
+    if 'vitesse_kmh' in available:
+        distance = pd.Series(as_float(df[available['vitesse_kmh']])).ffill().fillna(0).to_numpy()
+        curves['vitesse_kmh'] = best_averages(np.interp(grid, seconds, distance), durations) * 3.6
+    return pd.DataFrame(curves, index=pd.Index(durations, name='duree_s'))
+
+
+def season_envelope(curves):
+    """
+    Enveloppe (meilleure valeur par durée) de courbes de plusieurs sorties,
+    itérable de (nom, courbes de mean_max_curves) : pour chaque grandeur, la
+    valeur et la sortie qui la détient (colonne <grandeur>_sortie).
+    """
+    frames = [curve.reset_index().assign(sortie=name) for name, curve in curves if not curve.empty]
+    if not frames: return pd.DataFrame(index=pd.Index([], name='duree_s'))
+    long = pd.concat(frames, ignore_index=True)
+    envelope = {}
+    for column in (col for col in CURVE_COLUMNS if col in long.columns):
+        values = long.dropna(subset=[column])
+        best = values.loc[values.groupby('duree_s')[column].idxmax()].set_index('duree_s')
+        envelope[column] = best[column]; envelope[f"{column}_sortie"] = best['sortie']
+    return pd.DataFrame(envelope).sort_index()
@@ -1,62 +1,106 @@
 # power_estimator.py
 import pandas as pd
 import numpy as np
-import streamlit as st # Nécessaire pour st.warning
+from analysis_warnings import warn
+from rolling_stats import PrefixStats
 
 # --- CONSTANTES PHYSIQUES ---
 GRAVITY = 9.80665
 
-# --- FONCTION D'ESTIMATION DE PUISSANCE ---
-def estimate_power(df, total_weight_kg, crr, cda):
-    """Estime la puissance en Watts seconde par seconde."""
+GRADIENT_WINDOW = 5 # Points pour la pente (somme glissante des deltas)
+SMOOTHING_WINDOW = 3 # Lissage centré de la puissance
+
+# --- NOYAU NUMPY ---
+def _diff0(values):
+    """Différence avec le point précédent, 0 pour le premier point et autour des trous (NaN)."""
+    return np.nan_to_num(np.diff(values, prepend=np.nan), nan=0.0)
+
+def power_terms(seconds, altitude, distance, speed, temperature):
+    """
+    Termes de l'estimation qui ne dépendent pas des réglages (tableaux NumPy
+    alignés, seconds croissant) : (vitesse, force par kg hors roulement
+    [pente + accélération], force aérodynamique par m² de CdA).
+    """
+    seconds, altitude, distance, speed, temperature = (np.asarray(a, dtype=np.float64) for a in (seconds, altitude, distance, speed, temperature))
+    delta_time = np.clip(np.diff(seconds, prepend=seconds[:1] - 1.0), 0.1, None)
+    delta_altitude = _diff0(altitude); delta_distance = _diff0(distance)
+
+    # Gradient (pente) : sommes glissantes sur GRADIENT_WINDOW points (le point et les précédents)
+    rolling_dist = PrefixStats(delta_distance).window_sum(GRADIENT_WINDOW - 1)
+    rolling_alt = PrefixStats(delta_altitude).window_sum(GRADIENT_WINDOW - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gradient = np.clip(np.where(rolling_dist == 0, 0, rolling_alt / rolling_dist), -0.5, 0.5)
+
+    # Accélération
+    acceleration = _diff0(speed) / delta_time
+
+    # Densité de l'air
+    temp_kelvin = np.where(np.isnan(temperature), 15, temperature) + 273.15
+    altitude_m = np.where(np.isnan(altitude), np.nanmean(altitude) if not np.isnan(altitude).all() else np.nan, altitude)
+    air_density = 1.225 * np.exp(-0.0001185 * altitude_m) * (288.15 / temp_kelvin)
+
+    return speed, GRAVITY * gradient + acceleration, 0.5 * air_density * speed ** 2
+
+def power_from_terms(terms, total_weight_kg, crr, cda):
+    """
+    Puissance lissée (W) à partir de power_terms. total_weight_kg, crr et cda
+    peuvent être des tableaux : ils sont diffusés entre eux (numpy broadcasting)
+    et le résultat a la forme de leur diffusion + (nombre de points,).
+    """
+    speed, mass_term, aero_term = terms
+    mass = np.asarray(total_weight_kg, dtype=np.float64)[..., None]
+    crr = np.asarray(crr, dtype=np.float64)[..., None]; cda = np.asarray(cda, dtype=np.float64)[..., None]
+
+    # Forces : roulement + pente + accélération (proportionnelles à la masse) + aérodynamique
+    power = np.maximum(0, (mass * (crr * GRAVITY + mass_term) + cda * aero_term) * speed)
+    # Les trous (NaN) ne dépendent pas des réglages : un seul masque pour toutes les combinaisons
+    valid = ~np.isnan(speed * mass_term * aero_term)
+    np.nan_to_num(power, copy=False, nan=0.0)
 
-    # S'assurer que les colonnes nécessaires sont numériques
+    # Moyenne centrée sur SMOOTHING_WINDOW points (NaN ignorés), 0 si aucune valeur
+    half = SMOOTHING_WINDOW // 2
+    return np.nan_to_num(PrefixStats(power, valid).window_mean(half, half), nan=0.0)
+
+# --- FONCTION D'ESTIMATION DE PUISSANCE ---
+def _check_power_columns(df):
+    """Message d'avertissement si df ne permet pas l'estimation, sinon None."""
     required_cols = ['altitude', 'speed', 'distance', 'temperature']
     missing_cols = [col for col in required_cols if col not in df.columns or not pd.api.types.is_numeric_dtype(df[col])]
     if missing_cols:
-        st.warning(f"Colonnes manquantes ou non numériques pour l'estimation de puissance : {', '.join(missing_cols)}. Estimation annulée.")
-        # Retourner un DataFrame avec une colonne vide pour éviter les erreurs
-        return pd.DataFrame(index=df.index, data={'estimated_power': np.nan})
-
-    df_power = df.copy()
-
-    # Calculer les deltas
-    # Assurer que l'index est bien un DatetimeIndex pour .diff().dt.total_seconds()
-    if not isinstance(df_power.index, pd.DatetimeIndex):
-         st.error("L'index du DataFrame n'est pas un DatetimeIndex. Impossible de calculer delta_time.")
-         return pd.DataFrame(index=df.index, data={'estimated_power': np.nan})
+        return f"Colonnes manquantes ou non numériques pour l'estimation de puissance : {', '.join(missing_cols)}. Estimation annulée."
+    # Assurer que l'index est bien un DatetimeIndex pour calculer delta_time
+    if not isinstance(df.index, pd.DatetimeIndex):
+        return "L'index du DataFrame n'est pas un DatetimeIndex. Impossible de calculer delta_time."
+    return None
 
-    df_power['delta_time'] = df_power.index.to_series().diff().dt.total_seconds().fillna(1.0).clip(lower=0.1)
-    df_power['delta_altitude'] = df_power['altitude'].diff().fillna(0)
-    df_power['delta_distance'] = df_power['distance'].diff().fillna(0)
-    df_power['delta_speed'] = df_power['speed'].diff().fillna(0)
+def _terms_from_frame(df):
+    """power_terms sur les colonnes de df (sans copier le DataFrame)."""
+    seconds = (df.index - df.index[0]) / pd.Timedelta(seconds=1) if len(df) else np.array([])
+    columns = (df[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in ['altitude', 'distance', 'speed', 'temperature'])
+    altitude, distance, speed, temperature = columns
+    return power_terms(np.asarray(seconds), altitude, distance, speed, temperature)
 
-    # Gradient (pente)
-    window_size = 5
-    rolling_dist = df_power['delta_distance'].rolling(window=window_size, min_periods=1).sum()
-    rolling_alt = df_power['delta_altitude'].rolling(window=window_size, min_periods=1).sum()
-    df_power['gradient'] = np.where(rolling_dist == 0, 0, rolling_alt / rolling_dist)
-    df_power['gradient'] = df_power['gradient'].clip(-0.5, 0.5)
+def estimate_power(df, total_weight_kg, crr, cda):
+    """Estime la puissance en Watts seconde par seconde."""
+    error = _check_power_columns(df)
+    if error:
+        warn(error)
+        # Retourner un DataFrame avec une colonne vide pour éviter les erreurs
+        return pd.DataFrame(index=df.index, data={'estimated_power': np.nan})
 
-    # Accélération
-    df_power['acceleration'] = df_power['delta_speed'] / df_power['delta_time']
+    power = power_from_terms(_terms_from_frame(df), total_weight_kg, crr, cda)
+    return pd.DataFrame({'estimated_power': power}, index=df.index) # Retourne seulement la nouvelle colonne
 
-    # Densité de l'air
-    temp_kelvin = df_power['temperature'].fillna(15) + 273.15
-    altitude_m = df_power['altitude'].fillna(df_power['altitude'].mean())
-    df_power['air_density'] = (1.225 * np.exp(-0.0001185 * altitude_m) * (288.15 / temp_kelvin))
-
-    # Calcul des Forces
-    mass = total_weight_kg
-    speed_ms = df_power['speed']
-    F_rr = crr * mass * GRAVITY
-    F_ad = 0.5 * cda * df_power['air_density'] * (speed_ms ** 2)
-    F_g = mass * GRAVITY * df_power['gradient']
-    F_a = mass * df_power['acceleration']
-
-    # Puissance
-    power_gross = (F_rr + F_ad + F_g + F_a) * speed_ms
-    df_power['estimated_power'] = np.maximum(0, power_gross)
-    df_power['estimated_power'] = df_power['estimated_power'].rolling(window=3, min_periods=1, center=True).mean().fillna(0)
-
-    return df_power[['estimated_power']] # Retourne seulement la nouvelle colonne
\ No newline at end of file
+def estimate_power_batch(df, total_weight_kg, crr, cda):
+    """
+    Puissance pour plusieurs jeux de réglages en un calcul : total_weight_kg,
+    crr et cda sont diffusés entre eux (ex. masses[:, None, None],
+    crrs[None, :, None], cdas[None, None, :] pour une grille). Retourne un
+    tableau de forme (diffusion des réglages) + (len(df),), ou None si df ne
+    permet pas l'estimation (avec avertissement).
+    """
+    error = _check_power_columns(df)
+    if error:
+        warn(error)
+        return None
+    return power_from_terms(_terms_from_frame(df), total_weight_kg, crr, cda)
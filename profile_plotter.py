@@ -3,6 +3,8 @@ import numpy as np
 import pandas as pd
 import plotly.colors
 import streamlit as st
+from climb_processing import run_length_encode, run_means, concat_ranges
+from downsampling import lttb_indices, cached_indices
 
 # Palette (Vert -> Jaune -> Rouge -> Noir)
 PROFILE_COLORSCALE = [
@@ -12,12 +14,61 @@ PROFILE_COLORSCALE = [
     [1.0, 'rgb(0,0,0)']        # 20% (Noir)
 ]
 PENTE_ECHELLE_MAX = 20.0 
+CHUNK_DISTANCE_PROFILE = 50
+PENTE_PAS_COULEUR = 0.25 # Pas (en %) des paliers de couleur : 81 couleurs au plus entre 0 et 20 %
+PROFILE_POINT_BUDGET = 2000 # Points tracés (LTTB) : sommets et creux gardés
+
+
+def gradient_bucket_traces(x, y, pente, chunk_distance, keep=None, colorscale=PROFILE_COLORSCALE, pente_max=PENTE_ECHELLE_MAX, width=3):
+    """
+    Ligne x/y colorée par la pente moyenne de chaque tronçon de chunk_distance
+    (en unités de x), "cousue" d'un tronçon au suivant. Les pentes sont
+    arrondies au palier PENTE_PAS_COULEUR : une seule trace par couleur, les
+    suites de tronçons séparées par des trous (None), au lieu d'une trace par tronçon.
+    keep (positions) : points à tracer ; les moyennes utilisent tous les points.
+    """
+    if len(x) == 0: return []
+    bins = (x // chunk_distance) * chunk_distance
+    order = np.argsort(bins, kind='stable') # Ordre des tronçons comme un groupby trié
+    x, y, pente = x[order], y[order], pente[order]
+    chunk_starts, chunk_ends, _ = run_length_encode(bins[order])
+    avg_pente = run_means(pente, chunk_starts)
+
+    # Palier de couleur de chaque tronçon, reporté sur ses points, puis suites de points de même palier
+    paliers = np.round(np.clip(np.nan_to_num(avg_pente), 0, pente_max) / PENTE_PAS_COULEUR).astype(np.int64)
+    point_paliers = np.repeat(paliers, chunk_ends - chunk_starts)
+    if keep is not None:
+        kept = np.flatnonzero(np.isin(order, keep)) # Points à tracer, dans l'ordre des tronçons
+        x, y, point_paliers = x[kept], y[kept], point_paliers[kept]
+    run_starts, run_ends, run_palier = run_length_encode(point_paliers)
+    # Chaque suite reprend le dernier point de la précédente ; une position n (NaN) termine la suite
+    starts = np.maximum(run_starts - 1, 0); ends = run_ends + 1
+    x_ext = np.r_[x, np.nan]; y_ext = np.r_[y, np.nan]
+
+    traces = []
+    for palier in np.unique(run_palier):
+        mask = run_palier == palier
+        positions = concat_ranges(starts[mask], ends[mask])
+        positions[np.cumsum(ends[mask] - starts[mask]) - 1] = len(x)
+        pente_norm = max(0.00001, min(0.99999, palier * PENTE_PAS_COULEUR / pente_max))
+        traces.append(go.Scatter(
+            x=x_ext[positions[:-1]],
+            y=y_ext[positions[:-1]],
+            mode='lines',
+            line=dict(width=width, color=plotly.colors.sample_colorscale(colorscale, pente_norm)[0]), 
+            hoverinfo='none',
+            showlegend=False
+        ))
+    return traces
+
 
 # --- MODIFICATION 1 : Accepter la distance sélectionnée ---
-def create_full_ride_profile(df, selected_distance=None):
+def create_full_ride_profile(df, selected_distance=None, cache_key=None):
     """
     Crée un profil d'altitude 2D de toute la sortie, "Strava-style"
     AVEC un remplissage opaque et une ligne de suivi.
+    Le tracé garde PROFILE_POINT_BUDGET points choisis par LTTB sur
+    distance/altitude (en cache sous cache_key, l'empreinte de la sortie).
     """
     
     df_profile = df.copy()
@@ -30,8 +81,10 @@ def create_full_ride_profile(df, selected_distance=None):
     df_profile = df_profile.dropna(subset=['distance', 'altitude', 'pente', 'speed'])
     if df_profile.empty:
         st.warning("Données invalides pour le profil."); return go.Figure()
-    sampling_rate = max(1, len(df_profile) // 4000) 
-    df_sampled = df_profile.iloc[::sampling_rate, :].copy()
+    distance = df_profile['distance'].to_numpy(dtype=np.float64); altitude = df_profile['altitude'].to_numpy(dtype=np.float64)
+    sampled = cached_indices((cache_key, 'profile', PROFILE_POINT_BUDGET) if cache_key is not None else None,
+                             lambda: lttb_indices(distance, altitude, PROFILE_POINT_BUDGET))
+    df_sampled = df_profile.iloc[sampled, :].copy()
     if df_sampled.empty:
         st.warning("Pas assez de données pour le profil."); return go.Figure()
     if 'speed_kmh' not in df_sampled.columns and 'speed' in df_sampled.columns:
@@ -51,34 +104,10 @@ def create_full_ride_profile(df, selected_distance=None):
         showlegend=False
     ))
 
-    # --- Trace 2: La Ligne de Profil (Chunks "cousus") ---
-    # ... (toute la boucle 'groupby' est INCHANGÉE) ...
-    CHUNK_DISTANCE_PROFILE = 50 
-    df_sampled['distance_bin'] = (df_sampled['distance'] // CHUNK_DISTANCE_PROFILE) * CHUNK_DISTANCE_PROFILE
-    try: grouped = df_sampled.groupby('distance_bin', observed=True)
-    except TypeError: grouped = df_sampled.groupby('distance_bin')
-    plotly_colorscale = PROFILE_COLORSCALE
-    last_point = None 
-    for name, group in grouped:
-        if group.empty: continue
-        avg_pente = group['pente'].mean()
-        pente_norm_pos = max(0, avg_pente) 
-        pente_norm = max(0.00001, min(0.99999, (pente_norm_pos / PENTE_ECHELLE_MAX)))
-        segment_color_rgb_str = plotly.colors.sample_colorscale(plotly_colorscale, pente_norm)[0]
-        x_chunk = group['distance'].tolist()
-        y_chunk = group['altitude'].tolist()
-        if last_point is not None:
-            x_chunk = [last_point[0]] + x_chunk
-            y_chunk = [last_point[1]] + y_chunk
-        fig.add_trace(go.Scatter(
-            x=x_chunk,
-            y=y_chunk,
-            mode='lines',
-            line=dict(width=3, color=segment_color_rgb_str), 
-            hoverinfo='none',
-            showlegend=False
-        ))
-        last_point = (group['distance'].iloc[-1], group['altitude'].iloc[-1])
+    # --- Trace 2: La Ligne de Profil (Chunks "cousus", une trace par couleur) ---
+    for trace in gradient_bucket_traces(distance, altitude, df_profile['pente'].to_numpy(dtype=np.float64),
+                                        CHUNK_DISTANCE_PROFILE, keep=sampled):
+        fig.add_trace(trace)
 
 
     # --- Trace 5: La Couche Tooltip (Invisible) ---
@@ -127,6 +156,15 @@ def create_full_ride_profile(df, selected_distance=None):
     )
     
     # --- MODIFICATION 2 : Ajouter la ligne verticale ---
+    return set_distance_marker(fig, selected_distance)
+
+
+def set_distance_marker(fig, selected_distance):
+    """
+    Place (ou déplace) la ligne verticale de suivi sur un profil déjà construit :
+    pendant la relecture, c'est la seule modification de la figure à chaque image.
+    """
+    fig.layout.shapes = ()
     if selected_distance is not None:
         fig.add_vline(
             x=selected_distance, 
@@ -134,5 +172,4 @@ def create_full_ride_profile(df, selected_distance=None):
             line_dash="dash", 
             line_color="red"
         )
-    
     return fig
@@ -0,0 +1,141 @@
+# ride_cache.py
+import datetime
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- Configuration (variables d'environnement) ---
+CACHE_DIR = os.environ.get('ANALYSE_FIT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'analyse_fit', 'rides'))
+CACHE_MAX_MB = float(os.environ.get('ANALYSE_FIT_CACHE_MAX_MB', 1024))  # 0 = cache désactivé
+CACHE_VERSION = 2  # À incrémenter si le nettoyage des 'record' change
+
+_META_KEY = b'analyse_fit'
+
+
+def content_key(raw_bytes):
+    """Clé de cache : empreinte SHA-256 du contenu du fichier .fit."""
+    return hashlib.sha256(raw_bytes).hexdigest()
+
+
+# --- Sérialisation JSON des valeurs fitparse (dates, heures, tuples) ---
+
+def _encode(value):
+    if isinstance(value, datetime.datetime): return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.time): return {'__time__': value.isoformat()}
+    if isinstance(value, tuple): return {'__tuple__': [_encode(v) for v in value]}
+    if hasattr(value, 'item'): return value.item()  # Scalaires NumPy
+    if isinstance(value, float) and value != value: return None
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if '__datetime__' in value: return datetime.datetime.fromisoformat(value['__datetime__'])
+        if '__time__' in value: return datetime.time.fromisoformat(value['__time__'])
+        if '__tuple__' in value: return tuple(_decode(v) for v in value['__tuple__'])
+    return value
+
+
+def _rows_to_json(df):
+    if df is None: return None
+    return [{k: _encode(v) for k, v in row.items() if v is not None and not (isinstance(v, float) and v != v)}
+            for row in df.to_dict('records')]
+
+
+class RideCache:
+    """
+    Cache disque des sorties déjà analysées, indexé par le contenu du fichier.
+    Un fichier Parquet par sortie : les 'record' nettoyés en colonnes, la
+    session, les tours et les événements en métadonnées JSON. Au-delà de
+    max_bytes, les entrées les moins récemment lues sont supprimées (LRU sur
+    la date de modification, rafraîchie à chaque lecture).
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def get(self, key):
+        """Retourne (df, session_data, laps_df, events_df) ou None si absent ou illisible."""
+        path = self._path(key)
+        if not os.path.exists(path): return None
+        try:
+            table = pq.read_table(path)
+            meta = json.loads(table.schema.metadata[_META_KEY])
+            if meta.get('version') != CACHE_VERSION: return None
+            df = table.to_pandas()
+            for col in meta['json_columns']:
+                df[col] = pd.Series([_decode(json.loads(v)) if isinstance(v, str) else float('nan') for v in df[col]], index=df.index, dtype=object)
+            session_data = {k: _decode(v) for k, v in meta['session'].items()}
+            laps_df = pd.DataFrame([{k: _decode(v) for k, v in row.items()} for row in meta['laps']])
+            events_df = pd.DataFrame([{k: _decode(v) for k, v in row.items()} for row in meta['events']])
+        except Exception:
+            self._remove(path)  # Entrée corrompue ou format obsolète
+            return None
+        os.utime(path)  # Marque l'entrée comme récemment utilisée
+        return df, session_data, laps_df, events_df
+
+    def put(self, key, df, session_data, laps_df=None, events_df=None):
+        """Écrit l'entrée (écriture atomique) puis applique la limite de taille."""
+        df = df.copy(deep=False)
+        json_columns = []
+        for col in df.columns:
+            if df[col].dtype == object:
+                # Colonnes mixtes (énumérations fitparse...) : une valeur JSON par ligne
+                df[col] = [json.dumps(_encode(v)) if v is not None and v == v else None for v in df[col]]
+                json_columns.append(col)
+
+        meta = {
+            'version': CACHE_VERSION,
+            'json_columns': json_columns,
+            'session': {k: _encode(v) for k, v in (session_data or {}).items()},
+            'laps': _rows_to_json(laps_df) or [],
+            'events': _rows_to_json(events_df) or [],
+        }
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta)})
+
+        path = self._path(key); tmp_path = f"{path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Supprime les entrées les plus anciennes tant que le cache dépasse max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.parquet'): continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            self._remove(path); total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_ride_cache():
+    """Cache par défaut, ou None s'il est désactivé (taille 0) ou inaccessible."""
+    if CACHE_MAX_MB <= 0: return None
+    try:
+        return RideCache()
+    except OSError:
+        return None
@@ -0,0 +1,209 @@
+# ride_store.py
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration (variables d'environnement) ---
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S' # Dates en texte triable
+STORE_PATH = os.environ.get('ANALYSE_FIT_DB', os.path.join(os.path.expanduser('~'), '.local', 'share', 'analyse_fit', 'sorties.sqlite'))
+
+# Colonnes numériques (ou texte) de chaque table, dans l'ordre des index de climb_segment_index / sprint_segment_index
+RIDE_COLUMNS = ['cle', 'fichier', 'debut', 'dist_totale_km', 'd_plus', 'temps_deplacement_str', 'vitesse_moy_kmh',
+                'v_max_kmh', 'avg_hr', 'max_hr', 'avg_cad', 'max_cad', 'power_avg_est', 'power_max_est',
+                'power_np_est', 'power_5min_est', 'power_20min_est', 'power_60min_est']
+CLIMB_COLUMNS = ['cle', 'n', 'debut', 'start', 'end', 'debut_km', 'distance_m', 'denivele_m', 'pente_pct', 'duree_s',
+                 'vitesse_kmh', 'fc_moy', 'cadence_moy', 'power_moy', 'power_max']
+SPRINT_COLUMNS = ['cle', 'n', 'debut', 'start', 'end', 'debut_km', 'fin_km', 'distance_m', 'duree_s',
+                  'v_max_kmh', 'v_moy_kmh', 'pente_moy', 'accel_max', 'power_max']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sorties (
+    cle TEXT PRIMARY KEY, fichier TEXT, debut TEXT, dist_totale_km REAL, d_plus REAL, temps_deplacement_str TEXT,
+    vitesse_moy_kmh REAL, v_max_kmh REAL, avg_hr REAL, max_hr REAL, avg_cad REAL, max_cad REAL,
+    power_avg_est REAL, power_max_est REAL, power_np_est REAL, power_5min_est REAL, power_20min_est REAL, power_60min_est REAL
+);
+CREATE TABLE IF NOT EXISTS montees (
+    cle TEXT NOT NULL REFERENCES sorties(cle) ON DELETE CASCADE, n INTEGER NOT NULL, debut TEXT,
+    start INTEGER, "end" INTEGER, debut_km REAL, distance_m REAL, denivele_m REAL, pente_pct REAL, duree_s REAL,
+    vitesse_kmh REAL, fc_moy REAL, cadence_moy REAL, power_moy REAL, power_max REAL,
+    PRIMARY KEY (cle, n)
+);
+CREATE TABLE IF NOT EXISTS traces_montees (
+    cle TEXT NOT NULL, n INTEGER NOT NULL, longueur_m REAL, trace BLOB,
+    PRIMARY KEY (cle, n), FOREIGN KEY (cle, n) REFERENCES montees(cle, n) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS sprints (
+    cle TEXT NOT NULL REFERENCES sorties(cle) ON DELETE CASCADE, n INTEGER NOT NULL, debut TEXT,
+    start INTEGER, "end" INTEGER, debut_km REAL, fin_km REAL, distance_m REAL, duree_s REAL,
+    v_max_kmh REAL, v_moy_kmh REAL, pente_moy REAL, accel_max REAL, power_max REAL,
+    PRIMARY KEY (cle, n)
+);
+CREATE INDEX IF NOT EXISTS sorties_debut ON sorties(debut);
+CREATE INDEX IF NOT EXISTS sorties_distance ON sorties(dist_totale_km);
+CREATE INDEX IF NOT EXISTS montees_debut ON montees(debut);
+CREATE INDEX IF NOT EXISTS montees_pente ON montees(pente_pct);
+CREATE INDEX IF NOT EXISTS montees_distance ON montees(distance_m);
+CREATE INDEX IF NOT EXISTS montees_puissance ON montees(power_moy);
+CREATE INDEX IF NOT EXISTS sprints_debut ON sprints(debut);
+CREATE INDEX IF NOT EXISTS sprints_vitesse ON sprints(v_max_kmh);
+CREATE INDEX IF NOT EXISTS sprints_puissance ON sprints(power_max);
+"""
+
+
+def _date_text(value):
+    """Date 'AAAA-MM-JJ HH:MM:SS' (triable en texte), ou None."""
+    if value is None or pd.isna(value): return None
+    return pd.Timestamp(value).strftime(DATE_FORMAT)
+
+
+def _rows(frame, columns):
+    """Lignes SQL de frame (colonnes absentes -> NULL) : valeurs Python, NaN -> None, en un passage par colonne."""
+    data = frame.reindex(columns=columns).astype(object)
+    return data.where(data.notna(), None).to_numpy().tolist()
+
+
+def _segment_rows(frames, columns):
+    """
+    Lignes SQL des index de montées ou de sprints de plusieurs sorties, frames
+    liste de (clé, date de la sortie, index) : un seul concat, puis clé, numéro
+    (à partir de 1) et date ajoutés en colonnes, sans opération pandas par sortie.
+    """
+    frames = [(key, start, frame) for key, start, frame in frames if frame is not None and not frame.empty]
+    if not frames: return []
+    keys, starts, segments = zip(*frames)
+    lengths = np.array([len(frame) for frame in segments])
+    data = pd.concat(segments, ignore_index=True)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    ride_starts = pd.Series(np.repeat(np.array(starts, dtype=object), lengths))
+    # Date d'un segment : son horodatage s'il en a un (sprints), sinon celle de la sortie
+    if 'debut' in data.columns and pd.api.types.is_datetime64_any_dtype(data['debut']):
+        debut = data['debut'].dt.strftime(DATE_FORMAT).fillna(ride_starts)
+    else: debut = ride_starts
+    data = data.assign(cle=np.repeat(np.array(keys, dtype=object), lengths), n=np.arange(len(data)) - offsets + 1, debut=debut)
+    return _rows(data, columns)
+
+
+def _trace_rows(key, traces):
+    """Lignes (clé, n, longueur, tracé float32 en octets) des tracés (tracés, longueurs) de climb_matching.climb_traces, sans les tracés sans GPS."""
+    if traces is None: return []
+    points, lengths = traces
+    return [(key, n, float(length), np.asarray(trace, dtype=np.float32).tobytes())
+            for n, (trace, length) in enumerate(zip(points, lengths), start=1) if not np.isnan(trace).any()]
+
+
+class RideStore:
+    """
+    Base SQLite locale des sorties analysées : une ligne par sortie (résumé),
+    par montée et par sprint, en valeurs numériques, indexées sur la date, la
+    distance, la pente, la vitesse et la puissance. Les sorties sont
+    identifiées par leur clé (ride_cache.content_key) : réimporter une sortie
+    remplace ses lignes.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        if path != ':memory:': os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:': self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add_rides(self, rides):
+        """
+        Import en lot (une transaction, executemany) : rides est un itérable de
+        dicts {'cle', 'fichier', 'debut', 'resume', 'montees', 'sprints'} où
+        resume vient de calculate_global_summary et montees / sprints sont les
+        index de segments du pipeline ; clé optionnelle 'traces' : tracés des
+        montées (climb_matching.climb_traces), pour la reconnaissance des
+        montées. Une même clé présente plusieurs fois (même fichier dans deux
+        dossiers) n'est importée qu'une fois, la dernière l'emporte. Retourne le
+        nombre de sorties importées.
+        """
+        summaries, climbs, sprints, trace_rows = [], [], [], []
+        for ride in {ride['cle']: ride for ride in rides}.values():
+            key = ride['cle']; start = _date_text(ride.get('debut'))
+            summaries.append({**(ride.get('resume') or {}), 'cle': key, 'fichier': ride.get('fichier'), 'debut': start})
+            climbs.append((key, start, ride.get('montees'))); sprints.append((key, start, ride.get('sprints')))
+            trace_rows += _trace_rows(key, ride.get('traces'))
+        # Conversion colonne par colonne sur toutes les sorties d'un coup
+        ride_rows = _rows(pd.DataFrame(summaries), RIDE_COLUMNS) if summaries else []
+        climb_rows = _segment_rows(climbs, CLIMB_COLUMNS); sprint_rows = _segment_rows(sprints, SPRINT_COLUMNS)
+
+        def insert(table, columns, rows):
+            names = ', '.join(f'"{col}"' for col in columns)
+            self.connection.executemany(f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * len(columns))})", rows)
+
+        with self.connection:
+            # Réimport : les anciennes montées et sprints partent avec la sortie (ON DELETE CASCADE)
+            self.connection.executemany("DELETE FROM sorties WHERE cle = ?", [(row[0],) for row in ride_rows])
+            insert('sorties', RIDE_COLUMNS, ride_rows)
+            insert('montees', CLIMB_COLUMNS, climb_rows)
+            insert('sprints', SPRINT_COLUMNS, sprint_rows)
+            insert('traces_montees', ['cle', 'n', 'longueur_m', 'trace'], trace_rows)
+        return len(ride_rows)
+
+    def add_ride(self, key, fichier, debut, summary, climbs, sprints, traces=None):
+        """Importe une sortie (voir add_rides)."""
+        return self.add_rides([{'cle': key, 'fichier': fichier, 'debut': debut, 'resume': summary, 'montees': climbs, 'sprints': sprints, 'traces': traces}])
+
+    def has_ride(self, key):
+        return self.connection.execute("SELECT 1 FROM sorties WHERE cle = ?", (key,)).fetchone() is not None
+
+    def _select(self, table, ranges, since=None, until=None, order_by=None, limit=None):
+        """
+        Lignes de table (avec le fichier de la sortie pour les segments) : ranges
+        {colonne: (min, max)} avec None pour une borne ouverte, dates comme
+        'AAAA-MM-JJ' ou Timestamp. Les conditions utilisent les index.
+        """
+        conditions, values = [], []
+        for col, (low, high) in {**ranges, 'debut': (_date_text(since), _date_text(until))}.items():
+            if low is not None: conditions.append(f't."{col}" >= ?'); values.append(low)
+            if high is not None: conditions.append(f't."{col}" <= ?'); values.append(high)
+        query = f"SELECT t.*{', s.fichier' if table != 'sorties' else ''} FROM {table} t"
+        if table != 'sorties': query += " JOIN sorties s ON s.cle = t.cle"
+        if conditions: query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order_by or 't.debut'}"
+        if limit: query += " LIMIT ?"; values.append(int(limit))
+        return pd.read_sql_query(query, self.connection, params=values, parse_dates=['debut'])
+
+    def rides(self, since=None, until=None, min_distance_km=None, limit=None):
+        """Résumés des sorties, par date."""
+        return self._select('sorties', {'dist_totale_km': (min_distance_km, None)}, since, until, limit=limit)
+
+    def climbs(self, min_pente=None, min_distance_m=None, min_power=None, since=None, until=None, limit=None, order_by='t.pente_pct DESC'):
+        """Montées filtrées (ex. toutes les montées de plus de 6 % depuis le 1er janvier), les plus raides d'abord."""
+        ranges = {'pente_pct': (min_pente, None), 'distance_m': (min_distance_m, None), 'power_moy': (min_power, None)}
+        return self._select('montees', ranges, since, until, order_by, limit)
+
+    def sprints(self, min_speed_kmh=None, min_power=None, since=None, until=None, limit=None, order_by='t.v_max_kmh DESC'):
+        """Sprints filtrés, les plus rapides d'abord."""
+        ranges = {'v_max_kmh': (min_speed_kmh, None), 'power_max': (min_power, None)}
+        return self._select('sprints', ranges, since, until, order_by, limit)
+
+    def climb_traces(self):
+        """
+        Tracés de toutes les montées enregistrées : (efforts, tracés, longueurs)
+        avec efforts les colonnes de la montée (clé, n, date, durée, vitesse,
+        puissance) et tracés (montées, points, 2) en degrés (lat, lon).
+        """
+        query = ("SELECT m.cle, m.n, m.debut, m.duree_s, m.vitesse_kmh, m.power_moy, t.longueur_m, t.trace "
+                 "FROM traces_montees t JOIN montees m ON m.cle = t.cle AND m.n = t.n ORDER BY m.debut")
+        data = pd.read_sql_query(query, self.connection, parse_dates=['debut'])
+        points = len(data['trace'].iloc[0]) // 8 if len(data) else 0 # float32 (lat, lon)
+        traces = np.frombuffer(b''.join(data['trace']), dtype=np.float32).reshape(len(data), points, 2).astype(np.float64)
+        return data.drop(columns=['longueur_m', 'trace']), traces, data['longueur_m'].to_numpy(dtype=np.float64)
+
+    def counts(self):
+        """Nombre de lignes de chaque table."""
+        return {table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ('sorties', 'montees', 'sprints', 'traces_montees')}
@@ -0,0 +1,96 @@
+# rolling_stats.py
+"""
+Statistiques glissantes et par segment à partir de sommes préfixes : les
+cumuls d'un tableau (et de ses puissances) sont calculés une fois, puis toute
+somme, moyenne ou moyenne de puissance sur [début, fin) coûte O(1), quel que
+soit le nombre de fenêtres ou de segments demandés.
+
+Sert à la puissance estimée (pente glissante, lissage), au lissage de
+l'altitude, aux statistiques des montées et des sprints, et au résumé
+(puissance normalisée, meilleures moyennes 5/20/60 min).
+"""
+import numpy as np
+
+
+class PrefixStats:
+    """
+    Sommes préfixes de values (NaN ignorés) le long du dernier axe. values
+    peut avoir des dimensions en tête (ex. une grille de réglages) : chaque
+    requête rend alors un résultat par ligne. Les cumuls des puissances p
+    sont construits à la première requête qui les demande.
+    valid : masque des valeurs comptées, s'il est déjà connu (une seule
+    dimension suffit pour toute une grille) ; values est alors sans NaN.
+    """
+
+    def __init__(self, values, valid=None):
+        values = np.asarray(values, dtype=np.float64)
+        if valid is None:
+            valid = ~np.isnan(values); values = np.where(valid, values, 0.0)
+        self._values = values
+        self._counts = self._prefix(np.asarray(valid, dtype=np.float64))
+        self._sums = {}
+
+    @staticmethod
+    def _prefix(values):
+        out = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+        np.cumsum(values, axis=-1, out=out[..., 1:])
+        return out
+
+    def _sum_prefix(self, power):
+        if power not in self._sums:
+            self._sums[power] = self._prefix(self._values if power == 1 else self._values ** power)
+        return self._sums[power]
+
+    def sum(self, starts, ends, power=1):
+        """Somme de values ** power sur chaque plage [starts, ends) (0 si vide)."""
+        prefix = self._sum_prefix(power)
+        return prefix[..., ends] - prefix[..., starts]
+
+    def count(self, starts, ends):
+        """Nombre de valeurs (hors NaN) sur chaque plage."""
+        return self._counts[..., ends] - self._counts[..., starts]
+
+    def mean(self, starts, ends, power=1):
+        """Moyenne de values ** power sur chaque plage, NaN si aucune valeur."""
+        counts = self.count(starts, ends)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, self.sum(starts, ends, power) / np.where(counts > 0, counts, 1), np.nan)[()] # Scalaire pour une seule plage
+
+    def power_mean(self, starts, ends, power):
+        """Moyenne d'ordre power, (moyenne de values ** power) ** (1 / power), sur chaque plage."""
+        return np.maximum(self.mean(starts, ends, power), 0) ** (1.0 / power)
+
+    @staticmethod
+    def _window(prefix, before, after):
+        """prefix[fin] - prefix[début] des fenêtres point_windows, par tranches (sans indexation par tableau)."""
+        n = prefix.shape[-1] - 1
+        out = np.empty(prefix.shape[:-1] + (n,))
+        unclipped = max(n - after - 1, 0) # Points dont la fin i + after + 1 reste dans la sortie
+        out[..., :unclipped] = prefix[..., after + 1:after + 1 + unclipped]
+        out[..., unclipped:] = prefix[..., n:]
+        start = min(before, n) # Les points avant ont leur début en 0 (prefix nul)
+        out[..., start:] -= prefix[..., :n - start]
+        return out
+
+    def window_sum(self, before, after=0, power=1):
+        """Somme de values ** power sur la fenêtre [i - before, i + after] de chaque point (tronquée aux bords)."""
+        return self._window(self._sum_prefix(power), before, after)
+
+    def window_mean(self, before, after=0, power=1):
+        """Moyenne de values ** power sur la fenêtre de chaque point, NaN si aucune valeur."""
+        counts = self._window(self._counts, before, after)
+        sums = self.window_sum(before, after, power)
+        sums /= np.where(counts > 0, counts, np.nan) # Division sur place : une grille de réglages peut être grande
+        return sums
+
+
+def point_windows(n, before, after=0):
+    """Fenêtres [i - before, i + after] (en points, tronquées aux bords) de chaque point : (débuts, fins exclusives)."""
+    positions = np.arange(n)
+    return np.maximum(positions - before, 0), np.minimum(positions + after + 1, n)
+
+
+def time_windows(seconds, width):
+    """Fenêtres temporelles ]t - width, t] de chaque point (comme rolling(f'{width}s')) : (débuts, fins exclusives)."""
+    seconds = np.asarray(seconds, dtype=np.float64)
+    return np.searchsorted(seconds, seconds - width, side='right'), np.arange(1, len(seconds) + 1)
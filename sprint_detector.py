@@ -1,11 +1,22 @@
 # sprint_detector.py
 import pandas as pd
 import numpy as np
-import streamlit as st
+from analysis_warnings import warn
+from climb_processing import run_length_encode, as_float
+from rolling_stats import PrefixStats
+
+SPRINT_INDEX_COLUMNS = ['start', 'end', 'debut', 'debut_km', 'fin_km', 'distance_m', 'duree_s',
+                        'v_max_kmh', 'v_moy_kmh', 'pente_moy', 'accel_max', 'power_max']
 
 def detect_sprints(df, min_speed_kmh=40.0, min_gradient=-5.0, max_gradient=5.0, min_duration_sec=5, max_gap_distance_m=50, rewind_sec=10):
+    """Lignes d'affichage des sprints (voir sprint_segment_index pour les paramètres)."""
+    return format_sprints(sprint_segment_index(df, min_speed_kmh, min_gradient, max_gradient, min_duration_sec, max_gap_distance_m, rewind_sec))
+
+def sprint_segment_index(df, min_speed_kmh=40.0, min_gradient=-5.0, max_gradient=5.0, min_duration_sec=5, max_gap_distance_m=50, rewind_sec=10):
     """
     Détecte les segments de sprint (avec fusion et rembobinage V-min).
+    Retourne leur index : positions entières [start, end) dans df et
+    statistiques numériques (non formatées), une ligne par sprint.
     
     Args:
         df (pd.DataFrame): DataFrame analysé (avec pente, deltas...).
@@ -17,120 +28,86 @@ def detect_sprints(df, min_speed_kmh=40.0, min_gradient=-5.0, max_gradient=5.0,
         rewind_sec (int): Secondes à rembobiner avant le début officiel pour trouver V-min.
     """
     sprints_final = []
-    df_sprint = df.copy()
 
     # --- Vérification Colonnes ---
     required_cols = ['speed', 'distance', 'pente', 'delta_time', 'delta_speed']
-    missing_cols = [col for col in required_cols if col not in df_sprint.columns]
+    missing_cols = [col for col in required_cols if col not in df.columns]
     if missing_cols:
-        st.warning(f"Colonnes manquantes : {', '.join(missing_cols)}. Détection sprint annulée.")
-        return []
+        warn(f"Colonnes manquantes : {', '.join(missing_cols)}. Détection sprint annulée.")
+        return pd.DataFrame(columns=SPRINT_INDEX_COLUMNS)
+    if df.empty: return pd.DataFrame(columns=SPRINT_INDEX_COLUMNS)
+
+    # Tout se fait sur des positions entières dans ces tableaux (pas de copie du DataFrame)
+    index = df.index; seconds = (index - index[0]).total_seconds().to_numpy()
+    speed = as_float(df['speed']); distance = as_float(df['distance']); pente = as_float(df['pente'])
+    delta_time = as_float(df['delta_time']); delta_speed = as_float(df['delta_speed'])
+    power = as_float(df['estimated_power']) if 'estimated_power' in df.columns else None
+    speed_stats = PrefixStats(speed); pente_stats = PrefixStats(pente) # Moyennes de segments en O(1)
 
     # --- 1. Détection des Sprints Initiaux (Segments "Officiels") ---
     min_speed_ms = min_speed_kmh / 3.6
-    df_sprint['is_high_speed'] = (df_sprint['speed'] >= min_speed_ms)
-    df_sprint['high_speed_block'] = (df_sprint['is_high_speed'] != df_sprint['is_high_speed'].shift()).cumsum()
-    high_speed_segments_groups = df_sprint[df_sprint['is_high_speed']].groupby('high_speed_block')
-
-    initial_sprints_data = []
-    for block_id, segment_orig in high_speed_segments_groups:
-        segment = segment_orig.copy()
-        duration = (segment.index[-1] - segment.index[0]).total_seconds() + segment['delta_time'].iloc[-1] if not segment.empty else 0
-        if duration >= min_duration_sec:
-            avg_gradient = segment['pente'].mean()
-            if min_gradient <= avg_gradient <= max_gradient:
-                initial_sprints_data.append({
-                    'block_id': block_id,
-                    'start_time': segment.index[0], 'end_time': segment.index[-1],
-                    'start_distance': segment['distance'].iloc[0], 'end_distance': segment['distance'].iloc[-1],
-                })
-    if not initial_sprints_data: return []
+    starts, ends, is_high_speed = run_length_encode(speed >= min_speed_ms)
+    avg_gradients = pente_stats.mean(starts, ends)[is_high_speed]
+    starts, last = starts[is_high_speed], ends[is_high_speed] - 1
+    durations = seconds[last] - seconds[starts] + delta_time[last]
+    keep = (durations >= min_duration_sec) & (min_gradient <= avg_gradients) & (avg_gradients <= max_gradient)
+    starts, last = starts[keep], last[keep]
+    if len(starts) == 0: return pd.DataFrame(columns=SPRINT_INDEX_COLUMNS)
 
-    # --- 2. Logique de Fusion par DISTANCE ---
-    merged_sprints_segments = [] # Stocke les segments de DF fusionnés
-    df_sprint_blocs = pd.DataFrame(initial_sprints_data)
-    bloc_map = {}; current_merged_id = 0
-    if df_sprint_blocs.empty: return []
-
-    for i in range(len(df_sprint_blocs)):
-        current_sprint_bloc = df_sprint_blocs.iloc[i]
-        if current_sprint_bloc['block_id'] in bloc_map: continue
-        current_merged_id += 1
-        bloc_map[current_sprint_bloc['block_id']] = current_merged_id
-        
-        start_time_fusion = current_sprint_bloc['start_time']
-        end_time_fusion = current_sprint_bloc['end_time']
-        
-        j = i + 1
-        while j < len(df_sprint_blocs):
-            next_sprint_bloc = df_sprint_blocs.iloc[j]
-            gap_start_dist = next_sprint_bloc['start_distance']
-            gap_end_dist = df_sprint_blocs.iloc[j-1]['end_distance']
-            distance_gap = gap_start_dist - gap_end_dist
-            
-            if distance_gap >= 0 and distance_gap <= max_gap_distance_m:
-                end_time_fusion = next_sprint_bloc['end_time'] # Étend la fin
-                bloc_map[next_sprint_bloc['block_id']] = current_merged_id
-                j += 1
-            else:
-                break
-        
-        # Sélectionner le segment complet (incluant la récup fusionnée)
-        segment = df_sprint.loc[start_time_fusion:end_time_fusion]
-        merged_sprints_segments.append(segment)
+    # --- 2. Logique de Fusion par DISTANCE (une passe) ---
+    # Un sprint rejoint le précédent si l'écart de distance est dans [0, max_gap_distance_m]
+    gaps = distance[starts[1:]] - distance[last[:-1]]
+    new_group = np.r_[True, ~((gaps >= 0) & (gaps <= max_gap_distance_m))]
+    group_first = np.flatnonzero(new_group); group_last = np.r_[group_first[1:], len(starts)] - 1
+    # Positions par horodatage, comme df.loc[début:fin] (inclut les horodatages dupliqués)
+    official_starts = index.searchsorted(index[starts[group_first]], side='left')
+    official_ends = index.searchsorted(index[last[group_last]], side='right') - 1
 
     # --- 3. Calcul des Statistiques Finales (avec Rembobinage V-min) ---
-    for i, segment_officiel in enumerate(merged_sprints_segments):
-        
-        # 1. Définir le segment "officiel"
-        official_start_time = segment_officiel.index[0]
-        official_end_time = segment_officiel.index[-1]
+    # (une fenêtre qui déborde avant le début de la sortie commence à la position 0)
+    window_starts = index.searchsorted(index[official_starts] - pd.Timedelta(seconds=rewind_sec), side='left')
+    window_ends = index.searchsorted(index[official_starts], side='right')
+    for w_start, w_end, official_end in zip(window_starts, window_ends, official_ends):
+        # "Rembobiner" jusqu'à la vitesse minimale, puis segment FINAL de V-min à la fin officielle
+        window = speed[w_start:w_end]
+        v_min = w_start + (np.nanargmin(window) if not np.isnan(window).all() else 0)
+        p0 = index.searchsorted(index[v_min], side='left'); p1 = official_end
+        if p1 < p0: continue
 
-        # 2. "Rembobiner" pour trouver le V-min
-        search_window_start = official_start_time - pd.Timedelta(seconds=rewind_sec)
-        if search_window_start < df_sprint.index[0]:
-            search_window_start = df_sprint.index[0]
-        
-        pre_sprint_window = df_sprint.loc[search_window_start:official_start_time]
-        
-        # 3. Trouver le nouveau début
-        if not pre_sprint_window.empty:
-            v_min_start_time = pre_sprint_window['speed'].idxmin()
-        else:
-            v_min_start_time = official_start_time # Sécurité
+        duration = seconds[p1] - seconds[p0] + delta_time[p1]
+        peak_speed_kmh = np.nanmax(speed[p0:p1 + 1]) * 3.6
+        avg_speed_kmh = speed_stats.mean(p0, p1 + 1) * 3.6
+        avg_gradient = pente_stats.mean(p0, p1 + 1)
+        start_distance_km = distance[p0] / 1000
+        end_distance_km = distance[p1] / 1000
+        distance_covered = np.nansum(np.diff(distance[p0:p1 + 1]))
+        segment_power = power[p0:p1 + 1] if power is not None else None
+        max_power = np.nanmax(segment_power) if segment_power is not None and not np.isnan(segment_power).all() else np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            acceleration = np.where(delta_time[p0:p1 + 1] == 0, 0, delta_speed[p0:p1 + 1] / delta_time[p0:p1 + 1])
+        max_accel = np.nanmax(acceleration) if not np.isnan(acceleration).all() else np.nan
 
-        # 4. Créer le segment FINAL (de V-min à la fin officielle)
-        segment = df_sprint.loc[v_min_start_time:official_end_time].copy()
-        
-        # 5. Calculer les stats sur ce segment FINAL
-        if segment.empty: continue
-            
-        start_time = segment.index[0]; end_time = segment.index[-1]
-        duration = (end_time - start_time).total_seconds() + segment['delta_time'].iloc[-1]
-        peak_speed_kmh = segment['speed'].max() * 3.6
-        avg_speed_kmh = segment['speed'].mean() * 3.6
-        avg_gradient = segment['pente'].mean()
-        start_distance_km = segment['distance'].iloc[0] / 1000
-        end_distance_km = segment['distance'].iloc[-1] / 1000
-        
-        segment['delta_distance'] = segment['distance'].diff().fillna(0)
-        distance_covered = segment['delta_distance'].sum()
-        max_power = segment['estimated_power'].max() if 'estimated_power' in segment.columns and not segment['estimated_power'].isnull().all() else np.nan
-        
-        segment['acceleration'] = np.where(segment['delta_time'] == 0, 0, segment['delta_speed'] / segment['delta_time'])
-        max_accel = segment['acceleration'].max()
-        
         sprints_final.append({
-            'Début': start_time, # Timestamp de V-min (pour le graphique)
-            'Début (km)': f"{start_distance_km:.3f}", 
-            'Fin (km)': f"{end_distance_km:.3f}",
-            'Durée (s)': f"{duration:.1f}",
-            'Vitesse Max (km/h)': f"{peak_speed_kmh:.1f}",
-            'Vitesse Moy (km/h)': f"{avg_speed_kmh:.1f}",
-            'Pente Moy (%)': f"{avg_gradient:.1f}",
-            'Accel Max (m/s²)': f"{max_accel:.2f}",
-            'Distance (m)': f"{distance_covered:.0f}",
-            'Puissance Max Est. (W)': f"{max_power:.0f}" if pd.notna(max_power) else "N/A"
+            'start': p0, 'end': p1 + 1,
+            'debut': index[p0], # Timestamp de V-min (pour le graphique)
+            'debut_km': start_distance_km, 'fin_km': end_distance_km, 'distance_m': distance_covered,
+            'duree_s': duration, 'v_max_kmh': peak_speed_kmh, 'v_moy_kmh': avg_speed_kmh,
+            'pente_moy': avg_gradient, 'accel_max': max_accel, 'power_max': max_power,
         })
-        
-    return sprints_final
+
+    return pd.DataFrame(sprints_final, columns=SPRINT_INDEX_COLUMNS)
+
+def format_sprints(sprints):
+    """Lignes d'affichage (textes formatés) de l'index des sprints."""
+    return [{
+        'Début': sprint.debut, # Timestamp de V-min (pour le graphique)
+        'Début (km)': f"{sprint.debut_km:.3f}", 
+        'Fin (km)': f"{sprint.fin_km:.3f}",
+        'Durée (s)': f"{sprint.duree_s:.1f}",
+        'Vitesse Max (km/h)': f"{sprint.v_max_kmh:.1f}",
+        'Vitesse Moy (km/h)': f"{sprint.v_moy_kmh:.1f}",
+        'Pente Moy (%)': f"{sprint.pente_moy:.1f}",
+        'Accel Max (m/s²)': f"{sprint.accel_max:.2f}",
+        'Distance (m)': f"{sprint.distance_m:.0f}",
+        'Puissance Max Est. (W)': f"{sprint.power_max:.0f}" if pd.notna(sprint.power_max) else "N/A"
+    } for sprint in sprints.itertuples(index=False)]
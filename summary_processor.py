@@ -1,6 +1,32 @@
 # summary_processor.py
 import pandas as pd
 import numpy as np
+from climb_processing import as_float
+from rolling_stats import PrefixStats, time_windows
+
+NP_WINDOW_SEC = 30 # Moyenne glissante de la puissance normalisée
+BEST_EFFORTS_MIN = (5, 20, 60)
+
+def power_summary(df):
+    """
+    Métriques de puissance estimée : moyenne, max, puissance normalisée (moyenne
+    d'ordre 4 de la moyenne glissante sur NP_WINDOW_SEC) et meilleures moyennes
+    sur BEST_EFFORTS_MIN (fenêtres complètes seulement, NaN si la sortie est plus courte).
+    """
+    keys = ['power_avg_est', 'power_max_est', 'power_np_est'] + [f'power_{m}min_est' for m in BEST_EFFORTS_MIN]
+    if 'estimated_power' not in df.columns or df['estimated_power'].isnull().all() or not isinstance(df.index, pd.DatetimeIndex):
+        return dict.fromkeys(keys, np.nan)
+    power = as_float(df['estimated_power']); n = len(power)
+    seconds = np.asarray((df.index - df.index[0]) / pd.Timedelta(seconds=1))
+    stats = PrefixStats(power) # Cumuls construits une fois pour toutes les fenêtres
+    summary = {'power_avg_est': stats.mean(0, n), 'power_max_est': np.nanmax(power)}
+    rolling = stats.mean(*time_windows(seconds, NP_WINDOW_SEC))
+    summary['power_np_est'] = PrefixStats(rolling).power_mean(0, n, 4)
+    for minutes in BEST_EFFORTS_MIN:
+        complete = seconds >= minutes * 60 - 1 # ]t - durée, t] entièrement dans la sortie
+        means = stats.mean(*time_windows(seconds, minutes * 60))[complete]
+        summary[f'power_{minutes}min_est'] = np.nanmax(means) if complete.any() and not np.isnan(means).all() else np.nan
+    return summary
 
 def calculate_global_summary(df, session_data):
     """
@@ -41,13 +67,8 @@ def calculate_global_summary(df, session_data):
         summary['avg_cad'] = avg_cad
         summary['max_cad'] = max_cad
 
-        # --- Puissance Estimée ---
-        if 'estimated_power' in df.columns and not df['estimated_power'].isnull().all():
-            summary['power_avg_est'] = df['estimated_power'].mean()
-            summary['power_max_est'] = df['estimated_power'].max()
-        else:
-            summary['power_avg_est'] = np.nan
-            summary['power_max_est'] = np.nan
+        # --- Puissance Estimée (moyenne, max, normalisée, meilleures moyennes) ---
+        summary.update(power_summary(df))
             
         return summary, None # Retourne le résumé, pas d'erreur
 